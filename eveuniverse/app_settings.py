@@ -9,11 +9,39 @@ EVEUNIVERSE_BULK_METHODS_BATCH_SIZE = clean_setting(
 of Django batch methods, e.g. bulk_create and bulk_update.
 """
 
+EVEUNIVERSE_BULK_METHODS_MAX_WORKERS = clean_setting(
+    "EVEUNIVERSE_BULK_METHODS_MAX_WORKERS", 10, min_value=1
+)
+"""Maximum number of concurrent requests to ESI when fetching objects in bulk,
+e.g. with bulk_get_or_create_esi(). Set to 1 to disable parallel fetching.
+"""
+
 EVEUNIVERSE_API_SDE_URL = clean_setting(
     "EVEUNIVERSE_API_SDE_URL", "https://sde.eve-o.tech/latest"
 )
 """URL to a web site providing the SDE tables as JSON files."""
 
+EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT = clean_setting(
+    "EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT", 3600 * 24
+)
+"""Time in seconds resolved entity names are kept in the cache
+and shared between processes. Set to 0 to disable.
+"""
+
+EVEUNIVERSE_ENTITY_NAMES_MEMORY_CACHE_SIZE = clean_setting(
+    "EVEUNIVERSE_ENTITY_NAMES_MEMORY_CACHE_SIZE", 10_000
+)
+"""Max number of resolved entity names kept in the memory of each process.
+Least recently used names are discarded first. Set to 0 to disable.
+"""
+
+EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT = clean_setting(
+    "EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT", 3600 * 24 * 7
+)
+"""Time in seconds IDs which can not be resolved by ESI are remembered
+and not requested again when resolving entities. Set to 0 to disable.
+"""
+
 EVEUNIVERSE_LOAD_ASTEROID_BELTS = clean_setting(
     "EVEUNIVERSE_LOAD_ASTEROID_BELTS", False
 )
@@ -53,11 +81,37 @@ EVEUNIVERSE_LOAD_INDUSTRY_ACTIVITIES = clean_setting(
 )
 
 
+EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS = clean_setting(
+    "EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS", 4, min_value=1
+)
+"""Maximum number of regions loaded at the same time when loading the complete map.
+Each region is loaded with all its constellations and solar systems by one task.
+"""
+
 EVEUNIVERSE_LOAD_TASKS_PRIORITY = clean_setting("EVEUNIVERSE_LOAD_TASKS_PRIORITY", 6)
 """Priority of tasks for data loads.
 This priority should be below 5 to not interfere with normal task operation.
 """
 
+EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED = clean_setting(
+    "EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED", False
+)
+"""When true will store a snapshot of all market prices
+every time they have changed after an update.
+"""
+
+EVEUNIVERSE_MARKET_PRICE_HISTORY_DAYS = clean_setting(
+    "EVEUNIVERSE_MARKET_PRICE_HISTORY_DAYS", 90, min_value=1
+)
+"""Number of days snapshots of market prices are kept."""
+
+EVEUNIVERSE_MARKET_PRICE_HISTORY_FULL_RESOLUTION_DAYS = clean_setting(
+    "EVEUNIVERSE_MARKET_PRICE_HISTORY_FULL_RESOLUTION_DAYS", 7, min_value=0
+)
+"""Number of days all snapshots of market prices are kept.
+Only the last snapshot of each day is kept for older days.
+"""
+
 EVEUNIVERSE_REQUESTS_DEFAULT_TIMEOUT = clean_setting(
     "EVEUNIVERSE_REQUESTS_DEFAULT_TIMEOUT", 5
 )
@@ -68,6 +122,28 @@ EVEUNIVERSE_TASKS_TIME_LIMIT = clean_setting("EVEUNIVERSE_TASKS_TIME_LIMIT", 720
 """Global timeout for tasks in seconds to reduce task accumulation during outages."""
 
 
+EVEUNIVERSE_UPDATE_STALE_DAYS = clean_setting(
+    "EVEUNIVERSE_UPDATE_STALE_DAYS", 30, min_value=1
+)
+"""Number of days after which objects are regarded as stale
+and will be updated by the task ``update_stale_eve_objects``.
+"""
+
+EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL = clean_setting(
+    "EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL", {}
+)
+"""Number of days after which objects are regarded as stale for specific models,
+e.g. ``{"EveType": 7}``. Overrides ``EVEUNIVERSE_UPDATE_STALE_DAYS``.
+"""
+
+EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS = clean_setting(
+    "EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS", 1000, min_value=1
+)
+"""Maximum number of stale objects updated from ESI by one run
+of the task ``update_stale_eve_objects``.
+"""
+
+
 EVEUNIVERSE_USE_EVESKINSERVER = clean_setting("EVEUNIVERSE_USE_EVESKINSERVER", True)
 """When True a call to EveType.icon_url for a SKIN type will return a eveskinserver URL
 else it will return a generic SKIN icon.
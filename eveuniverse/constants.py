@@ -27,6 +27,17 @@ class EveGroupId(IntEnum):
     ALLIANCE = 32
 
 
+class EveIndustryActivityId(IntEnum):
+    """An Eve industry activity ID."""
+
+    MANUFACTURING = 1
+    TIME_EFFICIENCY_RESEARCH = 3
+    MATERIAL_EFFICIENCY_RESEARCH = 4
+    COPYING = 5
+    INVENTION = 8
+    REACTIONS = 9
+
+
 class EveRegionId(IntEnum):
     """An Eve region ID."""
 
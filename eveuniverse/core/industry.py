@@ -0,0 +1,220 @@
+"""Industry calculations for build trees and reprocessing."""
+
+import math
+from array import array
+from fractions import Fraction
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class BillOfMaterials:
+    """Graph of products, the blueprints to build them and their materials.
+
+    The graph is stored in compact arrays with one entry per buildable product.
+    Types which can not be built are regarded as raw materials.
+    When a product can be built from several blueprints,
+    the blueprint with the lowest type ID is used.
+
+    Args:
+        products: tuples with blueprint type ID, product type ID
+            and quantity produced per run
+        materials: tuples with blueprint type ID, material type ID
+            and quantity required per run
+    """
+
+    def __init__(
+        self,
+        products: Iterable[Tuple[int, int, int]],
+        materials: Iterable[Tuple[int, int, int]],
+    ) -> None:
+        blueprint_materials: Dict[int, List[Tuple[int, int]]] = {}
+        for blueprint_id, material_id, quantity in sorted(materials):
+            blueprint_materials.setdefault(blueprint_id, []).append(
+                (material_id, quantity)
+            )
+
+        self._index: Dict[int, int] = {}
+        self._blueprint_ids = array("q")
+        self._output_quantities = array("q")
+        self._offsets = array("q", [0])
+        self._material_ids = array("q")
+        self._material_quantities = array("q")
+        for blueprint_id, product_id, quantity in sorted(products):
+            if product_id in self._index or quantity <= 0:
+                continue
+            self._index[product_id] = len(self._blueprint_ids)
+            self._blueprint_ids.append(blueprint_id)
+            self._output_quantities.append(quantity)
+            for material_id, material_quantity in blueprint_materials.get(
+                blueprint_id, []
+            ):
+                self._material_ids.append(material_id)
+                self._material_quantities.append(material_quantity)
+            self._offsets.append(len(self._material_ids))
+
+        self._raw_per_unit: Dict[int, Dict[int, Fraction]] = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, type_id: int) -> bool:
+        return type_id in self._index
+
+    def blueprint_id(self, product_id: int) -> Optional[int]:
+        """Return ID of the blueprint used to build a product
+        or None if it can not be built.
+        """
+        try:
+            return self._blueprint_ids[self._index[product_id]]
+        except KeyError:
+            return None
+
+    def materials(self, product_id: int) -> Dict[int, int]:
+        """Return materials required for one run of the blueprint of a product.
+
+        Returns:
+            Mapping of material type IDs to their quantities
+            or an empty dict if the product can not be built
+        """
+        try:
+            idx = self._index[product_id]
+        except KeyError:
+            return {}
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return dict(
+            zip(self._material_ids[start:end], self._material_quantities[start:end])
+        )
+
+    def raw_materials(self, quantities: Dict[int, int]) -> Dict[int, int]:
+        """Calculate the raw materials required to build products.
+
+        Build trees are expanded recursively down to materials which can not be
+        built. Subtrees are only expanded once and then reused.
+        Quantities are calculated per unit of each product,
+        so leftovers from runs of intermediate products are shared
+        and totals are only rounded up at the end.
+        Material efficiency of blueprints is not taken into account.
+
+        Args:
+            quantities: Mapping of product type IDs to the quantities to build
+
+        Returns:
+            Mapping of raw material type IDs to their total quantities
+        """
+        totals: Dict[int, Fraction] = {}
+        for product_id, quantity in quantities.items():
+            per_unit_materials, _ = self._expand(product_id, set())
+            for material_id, per_unit in per_unit_materials.items():
+                totals[material_id] = totals.get(material_id, 0) + per_unit * quantity
+
+        return {
+            material_id: math.ceil(total)
+            for material_id, total in sorted(totals.items())
+            if total > 0
+        }
+
+    def _expand(self, type_id: int, path: Set[int]) -> Tuple[Dict[int, Fraction], bool]:
+        """Return raw materials required to build one unit of a type
+        and whether a circular build tree had to be broken to calculate them.
+
+        A type which is already being expanded on the current path
+        is regarded as raw material to break circular build trees.
+        Results which depend on such a break are not memoized,
+        because they differ depending on where the cycle has been entered.
+        """
+        if type_id in self._raw_per_unit:
+            return self._raw_per_unit[type_id], False
+
+        try:
+            idx = self._index[type_id]
+        except KeyError:
+            return {type_id: Fraction(1)}, False
+
+        if type_id in path:
+            return {type_id: Fraction(1)}, True
+
+        path.add(type_id)
+        result: Dict[int, Fraction] = {}
+        is_cycle_broken = False
+        output_quantity = self._output_quantities[idx]
+        for pos in range(self._offsets[idx], self._offsets[idx + 1]):
+            per_unit = Fraction(self._material_quantities[pos], output_quantity)
+            material_result, is_material_cycle_broken = self._expand(
+                self._material_ids[pos], path
+            )
+            is_cycle_broken |= is_material_cycle_broken
+            for material_id, material_per_unit in material_result.items():
+                result[material_id] = (
+                    result.get(material_id, 0) + material_per_unit * per_unit
+                )
+        path.discard(type_id)
+
+        if not is_cycle_broken:
+            self._raw_per_unit[type_id] = result
+        return result, is_cycle_broken
+
+
+class MaterialMatrix:
+    """Sparse matrix of types and the materials they reprocess into.
+
+    The matrix is stored in compressed row format with one row per type
+    and one column per material type.
+
+    Args:
+        rows: tuples with type ID, material type ID and quantity
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, int, int]]) -> None:
+        self._type_ids = array("q")
+        self._offsets = array("q", [0])
+        self._columns = array("q")
+        self._quantities = array("q")
+        self._material_ids: List[int] = []
+        material_columns: Dict[int, int] = {}
+        for type_id, material_id, quantity in sorted(rows):
+            if not self._type_ids or self._type_ids[-1] != type_id:
+                if self._type_ids:
+                    self._offsets.append(len(self._columns))
+                self._type_ids.append(type_id)
+            if material_id not in material_columns:
+                material_columns[material_id] = len(self._material_ids)
+                self._material_ids.append(material_id)
+            self._columns.append(material_columns[material_id])
+            self._quantities.append(quantity)
+        if self._type_ids:
+            self._offsets.append(len(self._columns))
+
+        self._index = {type_id: idx for idx, type_id in enumerate(self._type_ids)}
+
+    def __len__(self) -> int:
+        return len(self._type_ids)
+
+    def __contains__(self, type_id: int) -> bool:
+        return type_id in self._index
+
+    @property
+    def material_ids(self) -> Tuple[int, ...]:
+        """IDs of all material types in column order."""
+        return tuple(self._material_ids)
+
+    def values(self, prices: Dict[int, float]) -> Dict[int, float]:
+        """Calculate the value of the materials of all types.
+
+        Materials without a price do not add to the value.
+
+        Args:
+            prices: Mapping of material type IDs to their price
+
+        Returns:
+            Mapping of type IDs to the value of their materials
+        """
+        price_vector = array(
+            "d", (prices.get(material_id) or 0.0 for material_id in self._material_ids)
+        )
+        columns, quantities, offsets = self._columns, self._quantities, self._offsets
+        return {
+            type_id: sum(
+                quantities[pos] * price_vector[columns[pos]]
+                for pos in range(offsets[idx], offsets[idx + 1])
+            )
+            for idx, type_id in enumerate(self._type_ids)
+        }
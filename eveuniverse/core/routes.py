@@ -0,0 +1,308 @@
+"""Route calculation between solar systems on the local stargate network."""
+
+import enum
+import heapq
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from eveuniverse.helpers import is_high_sec
+
+
+class RouteFlag(str, enum.Enum):
+    """Route preference. Same as the flag parameter of the ESI routes endpoint."""
+
+    SHORTEST = "shortest"
+    SECURE = "secure"
+    INSECURE = "insecure"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class IncompleteMapError(Exception):
+    """The local map does not have enough data to reliably calculate a route."""
+
+
+_PENALTY = 50_000  # cost of entering an unwanted system, same as used by ESI
+_UNREACHABLE = -1  # jumps to a system which can not be reached
+
+
+class StargateGraph:
+    """Graph of solar systems connected by stargates.
+
+    Systems are nodes and stargates are edges. Only systems which are known
+    to have all their stargates loaded are regarded as complete.
+    A route search raises :class:`IncompleteMapError`
+    when it would need to pass through an incomplete system.
+
+    Args:
+        connections: pairs of solar system IDs connected by a stargate
+        security_status: security status for each solar system ID
+        complete_ids: IDs of solar systems with all their stargates loaded
+    """
+
+    def __init__(
+        self,
+        connections: Iterable[Tuple[int, int]],
+        security_status: Dict[int, float],
+        complete_ids: Iterable[int],
+    ) -> None:
+        adjacency: Dict[int, Set[int]] = {}
+        for origin_id, destination_id in connections:
+            adjacency.setdefault(origin_id, set()).add(destination_id)
+            adjacency.setdefault(destination_id, set()).add(origin_id)
+
+        self._adjacency = {key: tuple(value) for key, value in adjacency.items()}
+        self._security_status = dict(security_status)
+        self._complete_ids = frozenset(complete_ids)
+
+    def __len__(self) -> int:
+        return len(self._adjacency)
+
+    def __contains__(self, solar_system_id: int) -> bool:
+        return solar_system_id in self._adjacency
+
+    def is_complete(self, solar_system_id: int) -> bool:
+        """Return True when all stargates of a solar system are known, else False."""
+        return solar_system_id in self._complete_ids
+
+    def neighbors(self, solar_system_id: int) -> Tuple[int, ...]:
+        """Return IDs of all solar systems directly connected to a solar system."""
+        return self._adjacency.get(solar_system_id, ())
+
+    def route(
+        self,
+        origin_id: int,
+        destination_id: int,
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
+    ) -> Optional[List[int]]:
+        """Calculate a route between two solar systems.
+
+        Args:
+            origin_id: ID of the solar system to start from
+            destination_id: ID of the solar system to go to
+            flag: route preference, one of "shortest", "secure" or "insecure"
+            avoid: IDs of solar systems the route must not pass through
+
+        Raises:
+            IncompleteMapError: if the local map is not complete enough
+            ValueError: if the flag is not valid
+
+        Returns:
+            List of solar system IDs incl. origin and destination
+            or None if there is no route
+        """
+        flag = RouteFlag(flag)
+        avoid_ids = frozenset(avoid) if avoid else frozenset()
+        self._check_complete(origin_id)
+        self._check_complete(destination_id)
+        if origin_id == destination_id:
+            return [origin_id]
+
+        if destination_id in avoid_ids:
+            return None
+
+        if flag is RouteFlag.SHORTEST:
+            return self._route_shortest(origin_id, destination_id, avoid_ids)
+
+        return self._route_weighted(origin_id, destination_id, flag, avoid_ids)
+
+    def jumps(
+        self,
+        origin_id: int,
+        destination_id: int,
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
+    ) -> Optional[int]:
+        """Calculate the number of jumps between two solar systems.
+
+        Same as :meth:`route`, but returns the number of jumps instead of the route.
+        """
+        path = self.route(origin_id, destination_id, flag=flag, avoid=avoid)
+        return len(path) - 1 if path is not None else None
+
+    def jumps_from(
+        self,
+        origin_id: int,
+        max_jumps: Optional[int] = None,
+        targets: Optional[Iterable[int]] = None,
+    ) -> Dict[int, int]:
+        """Calculate jumps from a solar system to all reachable solar systems
+        with a single breadth first search.
+
+        Only stargates known to the graph are considered.
+
+        Args:
+            origin_id: ID of the solar system to start from
+            max_jumps: when given will not look further than this number of jumps
+            targets: when given will stop searching once all these systems are found
+
+        Returns:
+            Mapping of solar system ID to number of jumps incl. the origin
+        """
+        jumps = {origin_id: 0}
+        remaining_ids = set(targets) - {origin_id} if targets is not None else None
+        frontier = [origin_id]
+        distance = 0
+        while frontier and (max_jumps is None or distance < max_jumps):
+            if remaining_ids is not None and not remaining_ids:
+                break
+            distance += 1
+            next_frontier = []
+            for current_id in frontier:
+                for neighbor_id in self._adjacency.get(current_id, ()):
+                    if neighbor_id not in jumps:
+                        jumps[neighbor_id] = distance
+                        next_frontier.append(neighbor_id)
+                        if remaining_ids is not None:
+                            remaining_ids.discard(neighbor_id)
+            frontier = next_frontier
+
+        return jumps
+
+    def jumps_matrix(
+        self, origin_ids: Iterable[int], destination_ids: Iterable[int]
+    ) -> List[array]:
+        """Calculate jumps between each origin and each destination.
+
+        Runs one breadth first search per origin, which stops as soon
+        as all destinations are found. Jumps are the same in both directions,
+        so jumps to destinations which have been an origin before
+        are taken from the rows of those origins
+        and the search is skipped when all destinations are known.
+
+        Returns:
+            One row for each origin with the jumps to each destination
+            in the given order as compact array. Unreachable destinations are -1.
+        """
+        destination_ids = list(destination_ids)
+        columns: Dict[int, int] = {}
+        for column, destination_id in enumerate(destination_ids):
+            columns.setdefault(destination_id, column)
+
+        rows: List[array] = []
+        rows_by_origin: Dict[int, array] = {}
+        for origin_id in origin_ids:
+            if origin_id in rows_by_origin:
+                rows.append(rows_by_origin[origin_id])
+                continue
+
+            known_jumps = {origin_id: 0}
+            if origin_id in columns:
+                column = columns[origin_id]
+                for other_id, other_row in rows_by_origin.items():
+                    if other_id in columns:
+                        known_jumps[other_id] = other_row[column]
+
+            target_ids = columns.keys() - known_jumps.keys()
+            if target_ids:
+                found_jumps = self.jumps_from(origin_id, targets=target_ids)
+                known_jumps.update(
+                    (target_id, found_jumps.get(target_id, _UNREACHABLE))
+                    for target_id in target_ids
+                )
+
+            row = array("i", (known_jumps[obj] for obj in destination_ids))
+            rows_by_origin[origin_id] = row
+            rows.append(row)
+
+        return rows
+
+    def _check_complete(self, solar_system_id: int):
+        if solar_system_id not in self._complete_ids:
+            raise IncompleteMapError(
+                f"Stargates for solar system {solar_system_id} are not known"
+            )
+
+    def _route_shortest(
+        self, origin_id: int, destination_id: int, avoid_ids: frozenset
+    ) -> Optional[List[int]]:
+        """Find shortest route with a bidirectional breadth first search."""
+        parents_forward: Dict[int, Optional[int]] = {origin_id: None}
+        parents_backward: Dict[int, Optional[int]] = {destination_id: None}
+        frontier_forward = deque([origin_id])
+        frontier_backward = deque([destination_id])
+        while frontier_forward and frontier_backward:
+            if len(frontier_forward) <= len(frontier_backward):
+                meeting_id = self._expand_level(
+                    frontier_forward, parents_forward, parents_backward, avoid_ids
+                )
+            else:
+                meeting_id = self._expand_level(
+                    frontier_backward, parents_backward, parents_forward, avoid_ids
+                )
+            if meeting_id is not None:
+                path = self._unwind(parents_forward, meeting_id)
+                path.reverse()
+                path += self._unwind(parents_backward, meeting_id)[1:]
+                return path
+
+        return None
+
+    def _expand_level(
+        self,
+        frontier: deque,
+        parents: Dict[int, Optional[int]],
+        other_parents: Dict[int, Optional[int]],
+        avoid_ids: frozenset,
+    ) -> Optional[int]:
+        """Expand one level of the frontier and return ID where both searches meet."""
+        for _ in range(len(frontier)):
+            current_id = frontier.popleft()
+            self._check_complete(current_id)
+            for neighbor_id in self._adjacency.get(current_id, ()):
+                if neighbor_id in parents or neighbor_id in avoid_ids:
+                    continue
+                parents[neighbor_id] = current_id
+                if neighbor_id in other_parents:
+                    return neighbor_id
+                frontier.append(neighbor_id)
+        return None
+
+    def _route_weighted(
+        self,
+        origin_id: int,
+        destination_id: int,
+        flag: RouteFlag,
+        avoid_ids: frozenset,
+    ) -> Optional[List[int]]:
+        """Find route preferring high sec or low/null sec with Dijkstra."""
+        prefer_high_sec = flag is RouteFlag.SECURE
+        parents: Dict[int, Optional[int]] = {origin_id: None}
+        costs = {origin_id: 0}
+        queue = [(0, origin_id)]
+        while queue:
+            cost, current_id = heapq.heappop(queue)
+            if current_id == destination_id:
+                return list(reversed(self._unwind(parents, destination_id)))
+            if cost > costs[current_id]:
+                continue
+            self._check_complete(current_id)
+            for neighbor_id in self._adjacency.get(current_id, ()):
+                if neighbor_id in avoid_ids:
+                    continue
+                new_cost = cost + self._jump_cost(neighbor_id, prefer_high_sec)
+                if neighbor_id not in costs or new_cost < costs[neighbor_id]:
+                    costs[neighbor_id] = new_cost
+                    parents[neighbor_id] = current_id
+                    heapq.heappush(queue, (new_cost, neighbor_id))
+
+        return None
+
+    def _jump_cost(self, solar_system_id: int, prefer_high_sec: bool) -> int:
+        security_status = self._security_status.get(solar_system_id)
+        if security_status is None:
+            return 1
+        return 1 if is_high_sec(security_status) is prefer_high_sec else _PENALTY
+
+    @staticmethod
+    def _unwind(parents: Dict[int, Optional[int]], start_id: int) -> List[int]:
+        """Return path from given node back to the root of a search tree."""
+        path = [start_id]
+        parent_id = parents[start_id]
+        while parent_id is not None:
+            path.append(parent_id)
+            parent_id = parents[parent_id]
+        return path
@@ -0,0 +1,115 @@
+"""Read tables from a local dump of the static data export (SDE).
+
+Supports the table dumps in the format published by Fuzzwork,
+which is also used for SDE data fetched from the SDE API:
+
+- A directory with one file per table, e.g. ``mapSolarSystems.csv``.
+  Files can be CSV, bzip2 compressed CSV or JSON.
+- A SQLite conversion of the SDE, e.g. ``sqlite-latest.sqlite``.
+
+CSV files and SQLite tables are streamed row by row.
+"""
+
+import bz2
+import csv
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+_NULL_VALUES = {"", "None"}
+
+
+class SdeTableNotFound(Exception):
+    """A table does not exist in the SDE dump."""
+
+
+class SdeSource:
+    """A local dump of the SDE.
+
+    Args:
+        path: directory with table files or SQLite file
+
+    Raises:
+        FileNotFoundError: if the path does not exist
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self._path = Path(path)
+        if not self._path.exists():
+            raise FileNotFoundError(f"SDE dump not found: {self._path}")
+
+    def __str__(self) -> str:
+        return str(self._path)
+
+    @property
+    def is_sqlite(self) -> bool:
+        """Return True when this dump is a SQLite file, else False."""
+        return self._path.is_file()
+
+    def has_table(self, name: str) -> bool:
+        """Return True when a table exists in this dump, else False."""
+        if self.is_sqlite:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (name,),
+                ).fetchone()
+            finally:
+                connection.close()
+            return row is not None
+        return self._table_file(name) is not None
+
+    def iter_rows(self, name: str) -> Iterator[dict]:
+        """Iterate over all rows of a table.
+
+        Each row is a dict with the column names as keys.
+        Null values are returned as None. All other values from CSV files
+        are strings and need to be converted by the caller.
+
+        Raises:
+            SdeTableNotFound: if the table does not exist
+        """
+        if not self.has_table(name):
+            raise SdeTableNotFound(f"Table {name} not found in {self._path}")
+        if self.is_sqlite:
+            yield from self._iter_sqlite_rows(name)
+            return
+
+        path = self._table_file(name)
+        if path.suffix == ".json":  # type: ignore
+            with path.open("r", encoding="utf-8") as file:  # type: ignore
+                yield from json.load(file)
+            return
+
+        if path.suffix == ".bz2":  # type: ignore
+            file = bz2.open(path, "rt", encoding="utf-8", newline="")
+        else:
+            file = path.open("r", encoding="utf-8", newline="")  # type: ignore
+        with file:
+            for row in csv.DictReader(file):
+                yield {
+                    key: None if value in _NULL_VALUES else value
+                    for key, value in row.items()
+                }
+
+    def _table_file(self, name: str) -> Optional[Path]:
+        for suffix in (".csv", ".csv.bz2", ".json"):
+            path = self._path / f"{name}{suffix}"
+            if path.is_file():
+                return path
+        return None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self._path}?mode=ro", uri=True)
+
+    def _iter_sqlite_rows(self, name: str) -> Iterator[dict]:
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            cursor = connection.execute(f'SELECT * FROM "{name}"')
+            for row in cursor:
+                yield dict(row)
+        finally:
+            connection.close()
@@ -0,0 +1,258 @@
+"""Spatial index for fast distance queries between solar systems."""
+
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from eveuniverse.helpers import is_high_sec, meters_to_ly
+
+_GRID_CELL_SIZE_LY = 2.0
+
+
+class SolarSystemPosition(NamedTuple):
+    """Position and key properties of a solar system."""
+
+    id: int
+    x: float  # all coordinates are in light years
+    y: float
+    z: float
+    security_status: float
+    region_id: int
+
+    @property
+    def is_high_sec(self) -> bool:
+        """Return True when this solar system is in high sec, else False."""
+        return is_high_sec(self.security_status)
+
+
+class DistanceMatrix:
+    """Pairwise distances between solar systems in light years.
+
+    Only the coordinates of the solar systems are stored in compact arrays.
+    Distances are calculated on demand one row at a time,
+    so memory usage grows linear with the number of solar systems.
+    The last calculated row is kept, so that iterating over the columns
+    of a row only calculates it once.
+
+    Args:
+        ids: IDs of the solar systems in the order of rows and columns
+        positions: position for each ID or None if the position is unknown
+    """
+
+    def __init__(
+        self, ids: Iterable[int], positions: Iterable[Optional[SolarSystemPosition]]
+    ) -> None:
+        self.ids = tuple(ids)
+        self._xs = array("d")
+        self._ys = array("d")
+        self._zs = array("d")
+        for position in positions:
+            self._xs.append(position.x if position else math.nan)
+            self._ys.append(position.y if position else math.nan)
+            self._zs.append(position.z if position else math.nan)
+        self._last_row: Optional[Tuple[int, array]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, row_idx: int) -> array:
+        """Return distances from the solar system of a row to all solar systems.
+
+        Distances are NaN when the position of one of the solar systems
+        is unknown.
+        """
+        if row_idx < 0:
+            row_idx += len(self.ids)
+        if self._last_row and self._last_row[0] == row_idx:
+            return self._last_row[1]
+
+        x, y, z = self._xs[row_idx], self._ys[row_idx], self._zs[row_idx]
+        row = array(
+            "d",
+            [
+                math.hypot(x - other_x, y - other_y, z - other_z)
+                for other_x, other_y, other_z in zip(self._xs, self._ys, self._zs)
+            ],
+        )
+        self._last_row = (row_idx, row)
+        return row
+
+    def __iter__(self) -> Iterator[array]:
+        for row_idx in range(len(self.ids)):
+            yield self[row_idx]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Number of rows and columns."""
+        return len(self.ids), len(self.ids)
+
+    def distance(self, row_idx: int, column_idx: int) -> float:
+        """Return distance between the solar systems of a row and a column
+        or NaN if the position of one of them is unknown.
+        """
+        return math.hypot(
+            self._xs[row_idx] - self._xs[column_idx],
+            self._ys[row_idx] - self._ys[column_idx],
+            self._zs[row_idx] - self._zs[column_idx],
+        )
+
+
+class SpatialIndex:
+    """Index of solar system positions in a uniform grid of cubic cells.
+
+    Args:
+        rows: tuples with ID, position x, y, z in meters,
+            security status and region ID for each solar system
+        cell_size: edge length of a grid cell in light years
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[Tuple[int, float, float, float, float, int]],
+        cell_size: float = _GRID_CELL_SIZE_LY,
+    ) -> None:
+        if cell_size <= 0:
+            raise ValueError(f"Invalid cell size: {cell_size}")
+
+        self._cell_size = cell_size
+        self._positions: Dict[int, SolarSystemPosition] = {}
+        self._cells: Dict[Tuple[int, int, int], List[SolarSystemPosition]] = {}
+        for id, x, y, z, security_status, region_id in rows:
+            position = SolarSystemPosition(
+                id=id,
+                x=meters_to_ly(x),  # type: ignore
+                y=meters_to_ly(y),  # type: ignore
+                z=meters_to_ly(z),  # type: ignore
+                security_status=security_status,
+                region_id=region_id,
+            )
+            self._positions[id] = position
+            self._cells.setdefault(self._cell_key(position), []).append(position)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, solar_system_id: int) -> bool:
+        return solar_system_id in self._positions
+
+    def position(self, solar_system_id: int) -> Optional[SolarSystemPosition]:
+        """Return position of a solar system or None if it is not indexed."""
+        return self._positions.get(solar_system_id)
+
+    def distance(self, origin_id: int, destination_id: int) -> Optional[float]:
+        """Return distance between two solar systems in light years
+        or None if one of them is not indexed.
+        """
+        origin = self._positions.get(origin_id)
+        destination = self._positions.get(destination_id)
+        if not origin or not destination:
+            return None
+        return math.dist(origin[1:4], destination[1:4])
+
+    def systems_within(self, origin_id: int, distance: float) -> Dict[int, float]:
+        """Return all solar systems within a distance of a solar system.
+
+        Args:
+            origin_id: ID of the solar system in the center
+            distance: max distance in light years
+
+        Returns:
+            Mapping of solar system IDs to their distance from origin
+            in light years, not including the origin itself.
+            Empty if the origin is not indexed.
+        """
+        origin = self._positions.get(origin_id)
+        if not origin:
+            return {}
+
+        result = {}
+        origin_point = origin[1:4]
+        cell_x, cell_y, cell_z = self._cell_key(origin)
+        reach = math.ceil(distance / self._cell_size)
+        for i in range(cell_x - reach, cell_x + reach + 1):
+            for j in range(cell_y - reach, cell_y + reach + 1):
+                for k in range(cell_z - reach, cell_z + reach + 1):
+                    for other in self._cells.get((i, j, k), ()):
+                        if other.id == origin_id:
+                            continue
+                        other_distance = math.dist(origin_point, other[1:4])
+                        if other_distance <= distance:
+                            result[other.id] = other_distance
+        return result
+
+    def distance_matrix(self, ids: Iterable[int]) -> "DistanceMatrix":
+        """Return pairwise distances between solar systems in light years.
+
+        Returns:
+            Matrix with one row and column for each ID in the given order.
+            Distances for solar systems which are not indexed are NaN.
+        """
+        ids = list(ids)
+        return DistanceMatrix(ids, [self._positions.get(id) for id in ids])
+
+    def jump_route(
+        self, origin_id: int, destination_id: int, max_distance: float
+    ) -> Optional[List[int]]:
+        """Calculate a jump drive route between two solar systems.
+
+        The route has the least number of jumps. When there are several
+        such routes the one with the shortest total distance is chosen,
+        which also results in the least jump fatigue.
+        Ships can not jump into high sec, so those systems are never used.
+
+        Args:
+            origin_id: ID of the solar system to start from
+            destination_id: ID of the solar system to go to
+            max_distance: max jump range of the ship in light years
+
+        Returns:
+            List of solar system IDs incl. origin and destination
+            or None if there is no route
+        """
+        if origin_id not in self._positions:
+            return None
+
+        destination = self._positions.get(destination_id)
+        if not destination or destination.is_high_sec:
+            return None
+
+        if origin_id == destination_id:
+            return [origin_id]
+
+        parents: Dict[int, Optional[int]] = {origin_id: None}
+        costs = {origin_id: (0, 0.0)}
+        queue = [(0, 0.0, origin_id)]
+        while queue:
+            jumps, distance, current_id = heapq.heappop(queue)
+            if current_id == destination_id:
+                return list(reversed(self._unwind(parents, current_id)))
+            if (jumps, distance) > costs[current_id]:
+                continue
+            for other_id, other_distance in self.systems_within(
+                current_id, max_distance
+            ).items():
+                if self._positions[other_id].is_high_sec:
+                    continue
+                new_cost = (jumps + 1, distance + other_distance)
+                if other_id not in costs or new_cost < costs[other_id]:
+                    costs[other_id] = new_cost
+                    parents[other_id] = current_id
+                    heapq.heappush(queue, (*new_cost, other_id))
+
+        return None
+
+    @staticmethod
+    def _unwind(parents: Dict[int, Optional[int]], start_id: int) -> List[int]:
+        """Return path from given node back to the root of a search tree."""
+        path = [start_id]
+        while (parent_id := parents[path[-1]]) is not None:
+            path.append(parent_id)
+        return path
+
+    def _cell_key(self, position: SolarSystemPosition) -> Tuple[int, int, int]:
+        return (
+            math.floor(position.x / self._cell_size),
+            math.floor(position.y / self._cell_size),
+            math.floor(position.z / self._cell_size),
+        )
@@ -2,9 +2,16 @@
 
 import hashlib
 import json
-from typing import Any, Dict, Optional
+import sys
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from django.db import models
+from django.db import connections, models, router
+from django.utils.timezone import now
+
+from eveuniverse.app_settings import EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+from eveuniverse.utils import chunks
 
 
 def meters_to_ly(value: float) -> Optional[float]:
@@ -17,6 +24,14 @@ def meters_to_au(value: float) -> Optional[float]:
     return float(value) / 149_597_870_691 if value is not None else None
 
 
+def is_high_sec(security_status: float) -> bool:
+    """Return True when a security status is high sec, else False.
+
+    :meta private:
+    """
+    return round(security_status, 1) >= 0.5
+
+
 def get_or_create_esi_or_none(
     prop_name: str, dct: dict, model_class: type
 ) -> Optional[models.Model]:
@@ -35,8 +50,13 @@ class EveEntityNameResolver:
     and a performant API
     """
 
-    def __init__(self, names_map: Dict[int, str]) -> None:
+    def __init__(
+        self,
+        names_map: Dict[int, str],
+        categories_map: Optional[Dict[int, str]] = None,
+    ) -> None:
         self._names_map = names_map
+        self._categories_map = categories_map or {}
 
     def to_name(self, id: int) -> str:
         """Resolved an entity ID to a name
@@ -54,6 +74,68 @@ class EveEntityNameResolver:
 
         return name
 
+    def to_names(self, ids: Iterable[int]) -> Dict[int, str]:
+        """Resolve entity IDs to names.
+
+        Args:
+            ids: IDs of the Eve entities to resolve
+
+        Returns:
+            Mapping of entity IDs to their names.
+            Names of unknown IDs are empty strings.
+        """
+        return {id: self.to_name(id) for id in ids}
+
+    def to_category(self, id: int) -> str:
+        """Resolve an entity ID to its category.
+
+        Args:
+            id: ID of the Eve entity to resolve
+
+        Returns:
+            category for corresponding entity ID if known else an empty string
+        """
+        return self._categories_map.get(id, "")
+
+
+class InMemoryCache:
+    """Cache for objects which are expensive to build
+    in the memory of the current process.
+
+    Objects are built on first use and rebuilt
+    when they are older than the timeout or have been cleared.
+
+    Args:
+        timeout: max age of objects in seconds
+
+    :meta private:
+    """
+
+    def __init__(self, timeout: float = 3600) -> None:
+        self.timeout = timeout
+        self._objs: Dict[str, Tuple[float, Any]] = {}
+
+    def get_or_build(self, key: str, builder: Callable[[], Any]) -> Any:
+        """Return an object from the cache or build it if missing or stale."""
+        try:
+            created_at, obj = self._objs[key]
+        except KeyError:
+            pass
+        else:
+            if time.monotonic() - created_at <= self.timeout:
+                return obj
+
+        obj = builder()
+        self._objs[key] = (time.monotonic(), obj)
+        return obj
+
+    def clear(self, key: Optional[str] = None) -> None:
+        """Remove an object or all objects from the cache."""
+        if key is None:
+            self._objs.clear()
+        else:
+            self._objs.pop(key, None)
+
 
 def dict_hash(dictionary: Dict[str, Any]) -> str:
     """SHA256 hash of a dictionary.
@@ -64,3 +146,185 @@ def dict_hash(dictionary: Dict[str, Any]) -> str:
     encoded = json.dumps(dictionary, sort_keys=True).encode(encoding="utf8")
     my_hash.update(encoded)
     return my_hash.hexdigest()
+
+
+_JSON_WHITESPACE = " \t\n\r"
+_JSON_ITEM_TERMINATORS = _JSON_WHITESPACE + ",]"
+_JSON_ARRAY_TRANSITIONS = {
+    ("start", "["): "first",
+    ("first", "]"): "end",
+    ("separator", "]"): "end",
+    ("separator", ","): "item",
+}
+
+
+def iter_json_array(text_chunks: Iterable[str]) -> Iterator[Any]:
+    """Iterate over the items of a JSON array, which is received in text chunks.
+
+    Only the current item needs to be held in memory,
+    so large JSON documents can be parsed while they are downloaded.
+
+    Raises:
+        ValueError: if the text chunks are not a valid JSON array
+
+    :meta private:
+    """
+    decoder = json.JSONDecoder()
+    chunks_iter = iter(text_chunks)
+    buffer = ""
+    pos = 0
+    is_exhausted = False
+    state = "start"  # start -> first -> separator -> item -> separator ...
+    while True:
+        while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+            pos += 1
+
+        needs_more = pos == len(buffer)
+        if not needs_more and state in {"first", "item"} and buffer[pos] != "]":
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                needs_more = True  # item may be incomplete
+            else:
+                if is_exhausted or (
+                    end < len(buffer) and buffer[end] in _JSON_ITEM_TERMINATORS
+                ):
+                    yield item
+                    pos = end
+                    state = "separator"
+                    continue
+                needs_more = True  # e.g. a number could continue in next chunk
+
+        if needs_more:
+            if is_exhausted:
+                raise ValueError("Invalid or incomplete JSON array")
+            buffer = buffer[pos:]
+            pos = 0
+            try:
+                buffer += next(chunks_iter)
+            except StopIteration:
+                is_exhausted = True
+            continue
+
+        try:
+            state = _JSON_ARRAY_TRANSITIONS[(state, buffer[pos])]
+        except KeyError:
+            raise ValueError(f"Invalid JSON array at: {buffer[pos:pos + 20]}") from None
+        if state == "end":
+            return
+        pos += 1
+
+
+def pack_array(values: array) -> bytes:
+    """Pack an array into bytes in little endian byte order.
+
+    :meta private:
+    """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_array(typecode: str, data: bytes) -> array:
+    """Unpack an array from bytes in little endian byte order.
+
+    :meta private:
+    """
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def bulk_upsert(
+    manager: models.Manager,
+    objs: Iterable[models.Model],
+    *,
+    unique_fields: List[str],
+    update_fields: List[str],
+) -> None:
+    """Insert new and update existing objects in batches.
+
+    Objects are matched to existing rows by their unique fields.
+    Uses one upsert statement per batch when the database supports it,
+    else new and existing objects are written with separate bulk statements.
+    Existing rows are left unchanged when there are no fields to update.
+
+    :meta private:
+    """
+    objs = list(objs)
+    if not objs:
+        return
+
+    features = connections[router.db_for_write(manager.model)].features
+    if not getattr(features, "supports_update_conflicts", False):  # Django < 4.1
+        _bulk_create_or_update(manager, objs, unique_fields, update_fields)
+    elif not update_fields:
+        manager.bulk_create(
+            objs, batch_size=EVEUNIVERSE_BULK_METHODS_BATCH_SIZE, ignore_conflicts=True
+        )
+    else:
+        manager.bulk_create(
+            objs,
+            batch_size=EVEUNIVERSE_BULK_METHODS_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=(
+                unique_fields
+                if features.supports_update_conflicts_with_target
+                else None
+            ),
+            update_fields=update_fields,
+        )
+
+
+def _bulk_create_or_update(
+    manager: models.Manager,
+    objs: List[models.Model],
+    unique_fields: List[str],
+    update_fields: List[str],
+) -> None:
+    """Write new objects with bulk create and existing objects with bulk update."""
+    opts = manager.model._meta
+    attnames = [opts.get_field(field_name).attname for field_name in unique_fields]
+    existing_pks = _existing_pks(manager, objs, attnames)
+    new_objs = []
+    old_objs = []
+    for obj in objs:
+        pk = existing_pks.get(tuple(getattr(obj, attname) for attname in attnames))
+        if pk is None:
+            new_objs.append(obj)
+        else:
+            obj.pk = pk
+            old_objs.append(obj)
+
+    manager.bulk_create(
+        new_objs, batch_size=EVEUNIVERSE_BULK_METHODS_BATCH_SIZE, ignore_conflicts=True
+    )
+    if not old_objs or not update_fields:
+        return
+
+    timestamp = now()
+    for field_name in update_fields:
+        if getattr(opts.get_field(field_name), "auto_now", False):
+            for obj in old_objs:
+                setattr(obj, field_name, timestamp)
+    manager.bulk_update(
+        old_objs, update_fields, batch_size=EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+    )
+
+
+def _existing_pks(
+    manager: models.Manager, objs: List[models.Model], attnames: List[str]
+) -> Dict[tuple, Any]:
+    """Return the primary keys of existing objects by their unique values."""
+    existing_pks = {}
+    for objs_chunk in chunks(objs, EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+        values = {getattr(obj, attnames[0]) for obj in objs_chunk}
+        for *keys, pk in manager.filter(**{f"{attnames[0]}__in": values}).values_list(
+            *attnames, "pk"
+        ):
+            existing_pks[tuple(keys)] = pk
+
+    return existing_pks
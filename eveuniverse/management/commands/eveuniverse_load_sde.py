@@ -0,0 +1,96 @@
+"""Load data from a local SDE dump management command for Eve Universe."""
+
+import logging
+from enum import Enum
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eveuniverse import __title__
+from eveuniverse.core.sdefiles import SdeSource, SdeTableNotFound
+from eveuniverse.tools.sdeimport import SDE_MAP_MODELS, SDE_TYPE_MODELS, import_sde
+from eveuniverse.utils import LoggerAddTag
+
+from . import get_input
+
+logger = LoggerAddTag(logging.getLogger(__name__), __title__)
+
+TOKEN_TOPIC = "topic"
+
+
+class Topic(str, Enum):
+    """Topic to load data for."""
+
+    MAP = "map"
+    TYPES = "types"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load large sets of data from a local SDE dump into local database "
+        "for selected topics without accessing ESI"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help=(
+                "Path to a directory with SDE tables as CSV or JSON files "
+                "or to a SQLite conversion of the SDE"
+            ),
+        )
+        parser.add_argument(
+            TOKEN_TOPIC,
+            nargs="+",
+            choices=[o.value for o in Topic],
+            help="Topic(s) to load data for",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_true",
+            help="Do NOT prompt the user for input of any kind.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Eve Universe - SDE Data Loader")
+        self.stdout.write("==============================")
+        self.stdout.write("")
+
+        try:
+            source = SdeSource(options["path"])
+        except FileNotFoundError as ex:
+            raise CommandError(str(ex)) from ex
+
+        models = []
+        self.stdout.write(
+            f"This command will load the following data from {source} "
+            "and store it locally:"
+        )
+        if Topic.TYPES in options[TOKEN_TOPIC]:
+            self.stdout.write("- all categories, groups and types")
+            models += SDE_TYPE_MODELS
+        if Topic.MAP in options[TOKEN_TOPIC]:
+            self.stdout.write(
+                "- all regions, constellations, solar systems, planets, moons, "
+                "asteroid belts and stargates"
+            )
+            models += SDE_MAP_MODELS
+
+        self.stdout.write("")
+        self.stdout.write("Existing objects will be updated.")
+        if not options["noinput"]:
+            user_input = get_input("Are you sure you want to proceed? (Y/n)? ")
+        else:
+            user_input = "y"
+        if user_input.lower() == "n":
+            self.stdout.write(self.style.WARNING("Aborted"))
+            return
+
+        try:
+            counts = import_sde(source, models)
+        except SdeTableNotFound as ex:
+            raise CommandError(str(ex)) from ex
+
+        for model_name, count in counts.items():
+            self.stdout.write(f"{model_name}: {count:,}")
+        self.stdout.write(self.style.SUCCESS("DONE!"))
@@ -0,0 +1,101 @@
+"""Update stale objects management command for Eve Universe."""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from eveuniverse import __title__, tasks
+from eveuniverse.app_settings import EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS
+from eveuniverse.core.esitools import is_esi_online
+from eveuniverse.utils import LoggerAddTag
+
+from . import get_input
+
+logger = LoggerAddTag(logging.getLogger(__name__), __title__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Update objects from ESI, which have not been updated for some time. "
+        "The oldest objects are updated first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            choices=[
+                model_class.__name__ for model_class in tasks.stale_update_models()
+            ],
+            help="Name of model to update. Defaults to all models",
+        )
+        parser.add_argument(
+            "--max_objects",
+            type=int,
+            default=EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS,
+            help="Maximum number of objects to update",
+        )
+        parser.add_argument(
+            "--disable_esi_check",
+            action="store_true",
+            help="Disables checking that ESI is online",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_true",
+            help="Do NOT prompt the user for input of any kind.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Eve Universe - Update Stale Objects")
+        self.stdout.write("===================================")
+        self.stdout.write("")
+
+        model_names = options["model"]
+        stale_counts = {
+            model_class.__name__: model_class.objects.stale().count()  # type: ignore
+            for model_class in tasks.stale_update_models()
+            if not model_names or model_class.__name__ in model_names
+        }
+        stale_counts = {name: count for name, count in stale_counts.items() if count}
+        if not stale_counts:
+            self.stdout.write(self.style.SUCCESS("No stale objects. Nothing to do."))
+            return
+
+        self.stdout.write("Found these stale objects:")
+        for model_name, count in stale_counts.items():
+            self.stdout.write(f"{model_name}: {count:,}")
+        self.stdout.write("")
+
+        self.stdout.write("Checking ESI...", ending="")
+        if not options["disable_esi_check"] and not is_esi_online():
+            self.stdout.write(
+                "ESI does not appear to be online at this time. Please try again later."
+            )
+            self.stdout.write(self.style.WARNING("Aborted"))
+            return
+        self.stdout.write("ONLINE")
+
+        max_objects = options["max_objects"]
+        self.stdout.write(
+            f"This command will update up to {max_objects:,} "
+            "of the oldest objects from ESI."
+        )
+        if not options["noinput"]:
+            user_input = get_input("Are you sure you want to proceed? (Y/n)? ")
+        else:
+            user_input = "y"
+        if user_input.lower() == "n":
+            self.stdout.write(self.style.WARNING("Aborted"))
+            return
+
+        result = tasks.update_stale_eve_objects(
+            model_names=list(stale_counts.keys()), max_objects=max_objects
+        )
+        self.stdout.write("Updated objects:")
+        for model_name, count in result.items():
+            self.stdout.write(
+                f"{model_name}: {count:,} of {stale_counts[model_name]:,}"
+            )
+        self.stdout.write(self.style.SUCCESS("DONE!"))
@@ -1,6 +1,7 @@
 """Custom managers for Eve Universe models."""
 
 from .entities import EveEntityManager
+from .reference import EveIndustryActivityManager, EveUnitManager
 from .sde import (
     EveIndustryActivityDurationManager,
     EveIndustryActivityMaterialManager,
@@ -10,24 +11,30 @@ from .sde import (
 )
 from .universe import (
     EveAsteroidBeltManager,
+    EveMarketPriceHistoryManager,
     EveMarketPriceManager,
     EveMoonManager,
     EvePlanetManager,
+    EveSolarSystemManager,
     EveStargateManager,
     EveTypeManager,
 )
 
 __all__ = [
     "EveEntityManager",
+    "EveIndustryActivityManager",
+    "EveUnitManager",
     "EveIndustryActivityDurationManager",
     "EveIndustryActivityMaterialManager",
     "EveIndustryActivityProductManager",
     "EveIndustryActivitySkillManager",
     "EveTypeMaterialManager",
     "EveAsteroidBeltManager",
+    "EveMarketPriceHistoryManager",
     "EveMarketPriceManager",
     "EveMoonManager",
     "EvePlanetManager",
+    "EveSolarSystemManager",
     "EveStargateManager",
     "EveTypeManager",
     "EveUniverseEntityModelManager",
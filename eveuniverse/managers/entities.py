@@ -1,18 +1,29 @@
 """Managers and Querysets for EveEntity models."""
 
+import datetime as dt
 import logging
+import threading
+import time
 import warnings
-from collections import defaultdict
-from typing import Any, Iterable, Optional, Set, Tuple
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from bravado.exception import HTTPNotFound
+from django.core.cache import cache
 from django.db import models
-from django.db.utils import IntegrityError
+from django.utils.timezone import now
 
 from eveuniverse import __title__
-from eveuniverse.app_settings import EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+from eveuniverse.app_settings import (
+    EVEUNIVERSE_BULK_METHODS_BATCH_SIZE,
+    EVEUNIVERSE_BULK_METHODS_MAX_WORKERS,
+    EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT,
+    EVEUNIVERSE_ENTITY_NAMES_MEMORY_CACHE_SIZE,
+    EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT,
+)
 from eveuniverse.constants import POST_UNIVERSE_NAMES_MAX_ITEMS
-from eveuniverse.helpers import EveEntityNameResolver
+from eveuniverse.helpers import EveEntityNameResolver, bulk_upsert
 from eveuniverse.providers import esi
 from eveuniverse.utils import LoggerAddTag, chunks
 
@@ -23,6 +34,54 @@ logger = LoggerAddTag(logging.getLogger(__name__), __title__)
 _ESI_INVALID_IDS = [1]  # Will never try to resolve these invalid IDs from ESI
 
 
+class _EntityNamesMemoryCache:
+    """Thread safe LRU cache for names and categories of entities
+    in the memory of the current process.
+    """
+
+    _timeout = 300  # max age of in-process names in seconds
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Tuple[str, str]]:
+        """Return name and category for IDs found in the cache."""
+        result = {}
+        expired_at = time.monotonic() - self._timeout
+        with self._lock:
+            for id in ids:
+                try:
+                    created_at, name, category = self._entries[id]
+                except KeyError:
+                    continue
+                if created_at < expired_at:
+                    del self._entries[id]
+                    continue
+                self._entries.move_to_end(id)
+                result[id] = name, category
+        return result
+
+    def set_many(self, entries: Dict[int, Tuple[str, str]]) -> None:
+        """Add names and categories by ID to the cache."""
+        if not self._max_size:
+            return
+
+        created_at = time.monotonic()
+        with self._lock:
+            for id, (name, category) in entries.items():
+                self._entries[id] = created_at, name, category
+                self._entries.move_to_end(id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
 class EveEntityQuerySet(models.QuerySet):
     """Custom queryset for EveEntity."""
 
@@ -37,13 +96,21 @@ class EveEntityQuerySet(models.QuerySet):
 
     def valid_ids(self) -> Set[int]:
         """Determine valid Ids in this Queryset."""
-        return set(self.exclude(id__in=_ESI_INVALID_IDS).values_list("id", flat=True))
+        ids = set(self.exclude(id__in=_ESI_INVALID_IDS).values_list("id", flat=True))
+        return ids - self.model.objects._known_invalid_ids(ids)
 
 
 class EveEntityManagerBase(EveUniverseEntityModelManager):
     """Custom manager for EveEntity"""
 
-    _MAX_DEPTH = 5  # max recursion depth when resolving IDs
+    _invalid_ids_cache_key = "EVEUNIVERSE_INVALID_ENTITY_ID"
+    _names_cache_key = "EVEUNIVERSE_ENTITY_NAME"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._names_memory_cache = _EntityNamesMemoryCache(
+            EVEUNIVERSE_ENTITY_NAMES_MEMORY_CACHE_SIZE
+        )
 
     def bulk_create_esi(self, ids: Iterable[int]) -> int:
         """Resolve given IDs from ESI and update or create corresponding objects.
@@ -74,6 +141,33 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
         to_update_qs = self.filter(id__in=ids, name="")
         return to_update_qs.update_from_esi()
 
+    def bulk_get_or_create_esi(
+        self,
+        *,
+        ids: Iterable[int],
+        include_children: bool = False,
+        wait_for_children: bool = True,
+        enabled_sections: Optional[Iterable[str]] = None,
+        task_priority: Optional[int] = None,
+    ) -> models.QuerySet:
+        """Gets or creates objects in bulk.
+
+        Nonexisting objects will be resolved from ESI (blocking).
+
+        Args:
+            ids: List of valid EveEntity IDs
+            include_children: (no effect)
+            wait_for_children: (no effect)
+            enabled_sections: (no effect)
+            task_priority: (no effect)
+
+        Returns:
+            Queryset with all requested eve objects
+        """
+        ids = set(map(int, ids))
+        self.bulk_resolve_ids(ids)
+        return self.filter(id__in=ids)
+
     def _create_missing_objs(self, ids: Set[int]) -> Set[int]:
         """Create missing objs and return their IDs."""
         existing_ids = set(self.filter(id__in=ids).values_list("id", flat=True))
@@ -92,6 +186,10 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
     def bulk_resolve_names(self, ids: Iterable[int]) -> EveEntityNameResolver:
         """Resolve given IDs to names and return them.
 
+        Names are looked up in the in-process cache first, then in the cache,
+        then in the database and only the remaining IDs are resolved from ESI.
+        Each source is queried at most once for all IDs.
+
         Args:
             ids: List of valid EveEntity IDs
 
@@ -100,14 +198,73 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
             of IDs
         """
         ids = set(map(int, ids))
-        self.bulk_resolve_ids(ids)
+        entries = self._cached_names(ids)
+        missing_ids = ids - entries.keys()
+        if missing_ids:
+            db_entries = self._names_from_db(missing_ids)
+            missing_ids -= db_entries.keys()
+            if missing_ids:
+                self.bulk_resolve_ids(missing_ids)
+                db_entries.update(self._names_from_db(missing_ids))
+            self._cache_names(db_entries)
+            entries.update(db_entries)
+
         return EveEntityNameResolver(
-            {
-                row[0]: row[1]
-                for row in self.filter(id__in=ids).values_list("id", "name")
-            }
+            {id: name for id, (name, _) in entries.items()},
+            {id: category for id, (_, category) in entries.items()},
         )
 
+    def clear_names_cache(self) -> None:
+        """Clear resolved names from the in-process cache."""
+        self._names_memory_cache.clear()
+
+    @classmethod
+    def _name_key(cls, id: int) -> str:
+        return f"{cls._names_cache_key}_{id}"
+
+    def _cached_names(self, ids: Set[int]) -> Dict[int, Tuple[str, str]]:
+        """Return names and categories by ID from the in-process cache
+        and the cache.
+        """
+        entries = self._names_memory_cache.get_many(ids)
+        missing_ids = ids - entries.keys()
+        if not missing_ids or not EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT:
+            return entries
+
+        keys = {self._name_key(id): id for id in missing_ids}
+        cache_entries = {
+            keys[key]: tuple(value)
+            for key, value in cache.get_many(keys.keys()).items()
+        }
+        self._names_memory_cache.set_many(cache_entries)  # type: ignore
+        entries.update(cache_entries)  # type: ignore
+        return entries
+
+    def _names_from_db(self, ids: Set[int]) -> Dict[int, Tuple[str, str]]:
+        """Return names and categories by ID of resolved entities
+        from the database.
+        """
+        return {
+            id: (name, category or "")
+            for id, name, category in self.filter(id__in=ids)
+            .exclude(name="")
+            .values_list("id", "name", "category")
+        }
+
+    def _cache_names(self, entries: Dict[int, Tuple[str, str]]) -> None:
+        """Store names and categories by ID in the in-process cache
+        and the cache.
+        """
+        if not entries:
+            return
+
+        self._names_memory_cache.set_many(entries)
+        if EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT:
+            cache.set_many(
+                {self._name_key(id): entry for id, entry in entries.items()},
+                timeout=EVEUNIVERSE_ENTITY_NAMES_CACHE_TIMEOUT,
+            )
+
     def bulk_update_all_esi(self):
         """Update all EveEntity objects in the database from ESI.
 
@@ -246,11 +403,20 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
         """Return the name for the given Eve entity ID
         or an empty string if ID is not valid.
         """
-        if id is not None:
-            obj, _ = self.get_or_create_esi(id=int(id))
-            if obj:
-                return obj.name
-        return ""
+        if id is None:
+            return ""
+
+        id = int(id)
+        if entry := self._cached_names({id}).get(id):
+            return entry[0]
+
+        obj, _ = self.get_or_create_esi(id=id)
+        if not obj:
+            return ""
+
+        if obj.name:
+            self._cache_names({obj.id: (obj.name, obj.category or "")})
+        return obj.name
 
     def update_or_create_esi(
         self,
@@ -260,6 +426,7 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
         wait_for_children: bool = True,
         enabled_sections: Optional[Iterable[str]] = None,
         task_priority: Optional[int] = None,
+        use_etag: bool = False,
     ) -> Tuple[Any, bool]:
         """Update or create an EveEntity object by fetching it from ESI (blocking).
 
@@ -267,6 +434,7 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
             id: Eve Online ID of object
             include_children: (no effect)
             wait_for_children: (no effect)
+            use_etag: (no effect)
 
         Returns:
             A tuple consisting of the requested object and a created flag
@@ -277,13 +445,14 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
         """
         id = int(id)
         logger.info("%s: Trying to resolve ID to EveEntity with ESI", id)
-        if id in _ESI_INVALID_IDS:
+        if id in _ESI_INVALID_IDS or self._known_invalid_ids([id]):
             logger.info("%s: ID is not valid", id)
             return None, False
         try:
             result = esi.client.Universe.post_universe_names(ids=[id]).results()
         except HTTPNotFound:
             logger.info("%s: ID is not valid", id)
+            self._remember_invalid_ids([id])
             return None, False
         item = result[0]
         return self.update_or_create(
@@ -298,47 +467,166 @@ class EveEntityManagerBase(EveUniverseEntityModelManager):
         wait_for_children: bool = True,
         enabled_sections: Optional[Iterable[str]] = None,
         task_priority: Optional[int] = None,
+        use_etag: bool = False,
     ) -> None:
         """not implemented - do not use"""
         raise NotImplementedError()
 
+    def update_stale_esi(
+        self,
+        *,
+        max_age: Optional[dt.timedelta] = None,
+        max_objects: Optional[int] = None,
+        use_etag: bool = True,
+    ) -> int:
+        """Update entities from ESI, which have not been updated for some time.
+
+        The oldest entities are updated first.
+        Entities which can not be resolved are skipped
+        and only tried again when they become stale again.
+        Conditional requests are not supported for entities,
+        so ``use_etag`` is ignored.
+
+        Returns:
+            Count of updated entities
+        """
+        ids = list(
+            self.stale(max_age)
+            .exclude(id__in=_ESI_INVALID_IDS)
+            .order_by("last_updated", "id")
+            .values_list("id", flat=True)[:max_objects]
+        )
+        resolved_count, unresolved_ids = self.bulk_update_from_esi_by_id(ids)
+        if unresolved_ids:
+            # so they do not block updating other stale entities
+            self.filter(id__in=unresolved_ids).update(last_updated=now())
+        return resolved_count
+
     def update_from_esi_by_id(self, ids: Iterable[int]) -> int:
-        """Updates all Eve entity objects by id from ESI."""
+        """Updates all Eve entity objects by id from ESI.
+
+        Returns:
+            Count of updated entities
+        """
+        resolved_count, _ = self.bulk_update_from_esi_by_id(ids)
+        return resolved_count
+
+    def bulk_update_from_esi_by_id(self, ids: Iterable[int]) -> Tuple[int, Set[int]]:
+        """Update or create Eve entity objects by ID from ESI.
+
+        IDs are resolved in chunks, which are requested from ESI in parallel.
+        The entities of each chunk are written with one bulk statement.
+
+        Args:
+            ids: IDs of the entities to resolve
+
+        Returns:
+            Count of updated entities and IDs which could not be resolved
+        """
+        ids = set(int(id) for id in ids or [] if id not in _ESI_INVALID_IDS)
+        known_invalid_ids = self._known_invalid_ids(ids)
+        ids = sorted(ids - known_invalid_ids)
         if not ids:
-            return 0
-        ids = list(set((int(id) for id in ids if id not in _ESI_INVALID_IDS)))
+            return 0, known_invalid_ids
+
         logger.info("Updating %d entities from ESI", len(ids))
-        resolved_counter = 0
-        for chunk_ids in chunks(ids, POST_UNIVERSE_NAMES_MAX_ITEMS):
-            logger.debug("Trying to resolve the following IDs from ESI:\n%s", chunk_ids)
-            resolved_counter = self._resolve_entities_from_esi(chunk_ids)
-        return resolved_counter
-
-    def _resolve_entities_from_esi(self, ids: list, depth: int = 1):
-        resolved_counter = 0
+        id_chunks = list(chunks(ids, POST_UNIVERSE_NAMES_MAX_ITEMS))
+        if len(id_chunks) < 2 or EVEUNIVERSE_BULK_METHODS_MAX_WORKERS < 2:
+            resolved_count, failed_ids = self._save_resolved_entities(
+                map(self._fetch_entities_from_esi, id_chunks)
+            )
+        else:
+            max_workers = min(EVEUNIVERSE_BULK_METHODS_MAX_WORKERS, len(id_chunks))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                resolved_count, failed_ids = self._save_resolved_entities(
+                    executor.map(self._fetch_entities_from_esi, id_chunks)
+                )
+
+        self._remember_invalid_ids(failed_ids)
+        return resolved_count, failed_ids | known_invalid_ids
+
+    def _save_resolved_entities(
+        self, results: Iterable[Tuple[List[dict], Set[int]]]
+    ) -> Tuple[int, Set[int]]:
+        """Write resolved entities of each chunk as soon as it is available.
+
+        Returns:
+            Count of updated entities and IDs which could not be resolved
+        """
+        resolved_count = 0
+        failed_ids: Set[int] = set()
+        for items, chunk_failed_ids in results:
+            objs = [
+                self.model(id=item["id"], name=item["name"], category=item["category"])
+                for item in items
+            ]
+            self._bulk_upsert_entities(objs)
+            self._cache_names({obj.id: (obj.name, obj.category) for obj in objs})
+            resolved_count += len(items)
+            failed_ids |= chunk_failed_ids
+
+        if failed_ids:
+            logger.warning("Failed to resolve %d IDs", len(failed_ids))
+        return resolved_count, failed_ids
+
+    def _fetch_entities_from_esi(self, ids: List[int]) -> Tuple[List[dict], Set[int]]:
+        """Resolve IDs with ESI.
+
+        ESI fails for all IDs when at least one of them is invalid.
+        Invalid IDs are then isolated by bisecting the failed IDs,
+        which needs about two requests per invalid ID
+        and level of the search.
+
+        Returns:
+            Resolved entities and IDs which could not be resolved
+        """
         try:
             items = esi.client.Universe.post_universe_names(ids=ids).results()
         except HTTPNotFound:
-            # if API fails to resolve all IDs, we divide and conquer,
-            # trying to resolve each half of the ids separately
-            if len(ids) > 1 and depth < self._MAX_DEPTH:
-                resolved_counter += self._resolve_entities_from_esi(ids[::2], depth + 1)
-                resolved_counter += self._resolve_entities_from_esi(
-                    ids[1::2], depth + 1
-                )
-            else:
-                logger.warning("Failed to resolve invalid IDs: %s", ids)
-        else:
-            resolved_counter += len(items)
-            for item in items:
-                try:
-                    self.update_or_create(
-                        id=item["id"],
-                        defaults={"name": item["name"], "category": item["category"]},
-                    )
-                except IntegrityError:
-                    pass
-        return resolved_counter
+            if len(ids) == 1:
+                logger.info("%s: ID is not valid", ids[0])
+                return [], set(ids)
+
+            middle = len(ids) // 2
+            items_1, failed_ids_1 = self._fetch_entities_from_esi(ids[:middle])
+            items_2, failed_ids_2 = self._fetch_entities_from_esi(ids[middle:])
+            return items_1 + items_2, failed_ids_1 | failed_ids_2
+
+        return items, set(ids) - {item["id"] for item in items}
+
+    @classmethod
+    def _invalid_id_key(cls, id: int) -> str:
+        return f"{cls._invalid_ids_cache_key}_{id}"
+
+    def _known_invalid_ids(self, ids: Iterable[int]) -> Set[int]:
+        """Return IDs which are known to be invalid from the cache."""
+        if not EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT:
+            return set()
+
+        invalid_ids = set()
+        for ids_chunk in chunks(list(ids), EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+            keys = {self._invalid_id_key(id): id for id in ids_chunk}
+            invalid_ids |= {keys[key] for key in cache.get_many(keys.keys())}
+        return invalid_ids
+
+    def _remember_invalid_ids(self, ids: Iterable[int]) -> None:
+        """Store invalid IDs in the cache, so they are not requested again."""
+        if not ids or not EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT:
+            return
+
+        cache.set_many(
+            {self._invalid_id_key(id): True for id in ids},
+            timeout=EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT,
+        )
+
+    def _bulk_upsert_entities(self, objs: List[Any]) -> None:
+        """Insert new and update existing entities with their name and category."""
+        bulk_upsert(
+            self,
+            objs,
+            unique_fields=["id"],
+            update_fields=["name", "category", "last_updated"],
+        )
 
 
 EveEntityManager = EveEntityManagerBase.from_queryset(EveEntityQuerySet)
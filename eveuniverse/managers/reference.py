@@ -0,0 +1,57 @@
+"""Managers for small tables with static reference data."""
+
+from typing import Any, Dict
+
+from django.db import models
+
+from eveuniverse.helpers import InMemoryCache
+
+
+class _InMemoryLookupManager(models.Manager):
+    """A manager which keeps all objects of a small static table
+    in the memory of the current process.
+
+    All objects are loaded with one query on first lookup
+    and are reloaded when they are older than the timeout
+    or the cache has been cleared.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._memory_cache = InMemoryCache()
+
+    def all_cached(self) -> Dict[int, Any]:
+        """Return all objects by ID from the in-process cache."""
+        return self._memory_cache.get_or_build(
+            "objs", lambda: {obj.id: obj for obj in self.all()}
+        )
+
+    def get_cached(self, id: int) -> Any:
+        """Return an object from the in-process cache.
+
+        Objects not found in the cache are fetched from the database.
+
+        Raises:
+            DoesNotExist: if the object does not exist
+        """
+        objs = self.all_cached()
+        try:
+            return objs[id]
+        except KeyError:
+            pass
+
+        obj = self.get(id=id)
+        objs[id] = obj
+        return obj
+
+    def clear_cache(self) -> None:
+        """Clear the in-process cache, so it will be reloaded on next use."""
+        self._memory_cache.clear()
+
+
+class EveIndustryActivityManager(_InMemoryLookupManager):
+    """Custom manager for EveIndustryActivity."""
+
+
+class EveUnitManager(_InMemoryLookupManager):
+    """Custom manager for EveUnit."""
@@ -1,7 +1,8 @@
 """Managers and Querysets for Eve universe models."""
 
+import codecs
 import logging
-from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
@@ -10,19 +11,38 @@ from django.db import models
 
 from eveuniverse import __title__
 from eveuniverse.app_settings import EVEUNIVERSE_API_SDE_URL
+from eveuniverse.constants import EveIndustryActivityId
+from eveuniverse.core.industry import BillOfMaterials, MaterialMatrix
+from eveuniverse.helpers import InMemoryCache, bulk_upsert, iter_json_array
 from eveuniverse.utils import LoggerAddTag
 
 logger = LoggerAddTag(logging.getLogger(__name__), __title__)
 
+_SDE_CHUNK_SIZE = 65_536
 
-class _ApiCacheManager(ABC):
-    """A base class for adding ability to fetch objects from API with cache."""
+
+class _ApiCacheManager(models.Manager):
+    """A base class for managers of models with objects from an SDE table,
+    which is fetched from the API with cache.
+
+    Each row of the SDE table belongs to the type with the ``typeID`` column.
+    Subclasses define how the other columns map to model fields.
+
+    The data of an SDE table is indexed by type ID and stored in the cache
+    in a fixed number of buckets, so that a lookup for a type
+    only needs to fetch the bucket with that type from the cache.
+    """
 
     _sde_cache_timeout = 3600 * 24
     _sde_cache_key = ""
     _sde_api_route = ""
+    _sde_cache_buckets = 100
+    _sde_type_fields: Dict[str, str] = {}  # foreign keys to other types by column
+    _sde_value_fields: Dict[str, str] = {}  # other fields by column
+    _sde_has_activity = False  # whether rows have an activityID column
 
     def __init__(self) -> None:
+        super().__init__()
         if not self._sde_cache_key:
             raise ValueError("Cache key not defined")
 
@@ -30,172 +50,311 @@ class _ApiCacheManager(ABC):
             raise ValueError("API route not defined")
 
     @classmethod
-    def _response_to_cache(cls, response: requests.Response) -> dict:
-        data_all = {}
-        for row in response.json():
-            type_id = row["typeID"]
-            if type_id not in data_all:
-                data_all[type_id] = []
-            data_all[type_id].append(row)
-        cache.set(
-            key=cls._sde_cache_key,
-            value=data_all,
-            timeout=cls._sde_cache_timeout,
+    def _sde_bucket_key(cls, type_id: int) -> str:
+        return f"{cls._sde_cache_key}_{type_id % cls._sde_cache_buckets}"
+
+    @classmethod
+    def _response_to_cache(cls, response: requests.Response) -> Dict[str, dict]:
+        """Index rows from a streamed response by type ID and store them in cache.
+
+        Returns:
+            Rows by type ID for each bucket key
+        """
+        buckets: Dict[str, dict] = {
+            f"{cls._sde_cache_key}_{num}": {} for num in range(cls._sde_cache_buckets)
+        }
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+        text_chunks = (
+            decoder.decode(chunk)
+            for chunk in response.iter_content(chunk_size=_SDE_CHUNK_SIZE)
         )
-        return data_all
+        for row in iter_json_array(text_chunks):
+            type_id = row.pop("typeID")
+            bucket = buckets[cls._sde_bucket_key(type_id)]
+            if type_id not in bucket:
+                bucket[type_id] = []
+            bucket[type_id].append(row)
+
+        cache.set_many(buckets, timeout=cls._sde_cache_timeout)
+        return buckets
 
     @classmethod
-    def _fetch_sde_data_cached(cls) -> dict:
-        data = cache.get(cls._sde_cache_key)
-        if not data:
-            response = requests.get(
+    def _fetch_sde_data_cached(cls, type_ids: Iterable[int]) -> Dict[int, List[dict]]:
+        """Return rows from the SDE table for each type."""
+        type_ids = set(type_ids)
+        keys = {cls._sde_bucket_key(type_id) for type_id in type_ids}
+        buckets = cache.get_many(keys)
+        if len(buckets) < len(keys):
+            with requests.get(
                 urljoin(EVEUNIVERSE_API_SDE_URL, "latest/" + cls._sde_api_route),
                 timeout=10,
-            )
-            response.raise_for_status()
-            data = cls._response_to_cache(response)
-            cache.set(
-                key=cls._sde_cache_key,
-                value=data,
-                timeout=cls._sde_cache_timeout,
-            )
-        return data
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                buckets = cls._response_to_cache(response)
+        return {
+            type_id: buckets[cls._sde_bucket_key(type_id)].get(type_id, [])
+            for type_id in type_ids
+        }
 
-    @abstractmethod
     def update_or_create_api(self, *, eve_type) -> None:
         """Update or create objects from the API for the given eve type."""
+        self.bulk_update_or_create_api(eve_types=[eve_type])
+
+    def bulk_update_or_create_api(self, *, eve_types: Iterable[Any]) -> None:
+        """Update or create objects from the API for many eve types in bulk.
+
+        All other types referred to by these objects are fetched in bulk
+        and all objects are written with one upsert statement per batch.
+
+        Args:
+            eve_types: EveType objects to update or create the objects for
+        """
+        from eveuniverse.models import EveIndustryActivity, EveType
+
+        rows = [
+            (type_id, row)
+            for type_id, type_rows in self._fetch_sde_data_cached(
+                obj.id for obj in eve_types
+            ).items()
+            for row in type_rows
+        ]
+        if not rows:
+            return
+
+        other_type_ids = {
+            row[column] for _, row in rows for column in self._sde_type_fields.values()
+        }
+        if other_type_ids:
+            EveType.objects.bulk_get_or_create_esi(ids=other_type_ids)  # type: ignore
+
+        key_fields = ["eve_type"] + list(self._sde_type_fields.keys())
+        if self._sde_has_activity:
+            key_fields.append("activity")
+
+        objs = {}
+        for type_id, row in rows:
+            keys = {"eve_type_id": type_id}
+            for field, column in self._sde_type_fields.items():
+                keys[f"{field}_id"] = row[column]
+            if self._sde_has_activity:
+                activity = EveIndustryActivity.objects.get_cached(  # type: ignore
+                    row["activityID"]
+                )
+                keys["activity_id"] = activity.id
+            values = {
+                field: row.get(column)
+                for field, column in self._sde_value_fields.items()
+            }
+            objs[tuple(keys.values())] = (keys, values)
+
+        bulk_upsert(
+            self,
+            [self.model(**keys, **values) for keys, values in objs.values()],
+            unique_fields=key_fields,
+            update_fields=list(self._sde_value_fields.keys()),
+        )
+        self._objs_written()
+
+    def _objs_written(self) -> None:
+        """Called after objects of this model have been written to the database.
 
+        Can be overwritten to clear in-process data derived from these objects.
+        """
 
-class EveTypeMaterialManager(models.Manager, _ApiCacheManager):
+
+class EveTypeMaterialManager(_ApiCacheManager):
     """Custom manager for EveTypeMaterial."""
 
     _sde_cache_key = "EVEUNIVERSE_TYPE_MATERIALS_REQUEST"
     _sde_cache_timeout = 3600 * 24
     _sde_api_route = "invTypeMaterials.json"
+    _sde_type_fields = {"material_eve_type": "materialTypeID"}
+    _sde_value_fields = {"quantity": "quantity"}
 
-    def update_or_create_api(self, *, eve_type) -> None:
-        from eveuniverse.models import EveType
+    _price_fields = ("average_price", "adjusted_price")
 
-        type_material_data_all = self._fetch_sde_data_cached()
-        for type_material_data in type_material_data_all.get(eve_type.id, []):
-            material_eve_type, _ = EveType.objects.get_or_create_esi(  # type: ignore
-                id=type_material_data.get("materialTypeID")
-            )
-            self.update_or_create(
-                eve_type=eve_type,
-                material_eve_type=material_eve_type,
-                defaults={
-                    "quantity": type_material_data.get("quantity"),
-                },
+    def __init__(self) -> None:
+        super().__init__()
+        self._memory_cache = InMemoryCache()
+        self._reprocess_values: Dict[str, Tuple[Any, Dict[int, float]]] = {}
+
+    def material_matrix(self) -> MaterialMatrix:
+        """Return the materials of all types in the database as sparse matrix.
+
+        The matrix is built once and then kept in memory of the current process
+        until it times out or is cleared.
+        """
+        return self._memory_cache.get_or_build(
+            "material_matrix", self._build_material_matrix
+        )
+
+    def _build_material_matrix(self) -> MaterialMatrix:
+        self._reprocess_values.clear()
+        return MaterialMatrix(
+            self.values_list("eve_type_id", "material_eve_type_id", "quantity")
+        )
+
+    def clear_material_matrix(self) -> None:
+        """Clear the in-process material matrix and all reprocess values,
+        so they will be rebuilt on next use.
+        """
+        self._memory_cache.clear()
+        self._reprocess_values.clear()
+
+    def _objs_written(self) -> None:
+        self.clear_material_matrix()
+
+    def reprocess_values(
+        self,
+        type_ids: Optional[Iterable[int]] = None,
+        price_field: str = "average_price",
+    ) -> Dict[int, float]:
+        """Calculate the value of the materials a type reprocesses into,
+        based on the local market prices.
+
+        Values are for one reprocessing batch of a type
+        at full reprocessing efficiency.
+        They are calculated for all types at once and kept in memory
+        of the current process until the market prices change.
+
+        Args:
+            type_ids: IDs of types to calculate values for. Default is all types.
+            price_field: Price to use, either "average_price" or "adjusted_price"
+
+        Raises:
+            ValueError: if the price field is not valid
+
+        Returns:
+            Mapping of type IDs to the value of their materials.
+            Types without materials are not included.
+        """
+        from eveuniverse.models import EveMarketPrice
+
+        if price_field not in self._price_fields:
+            raise ValueError(f"Invalid price field: {price_field}")
+
+        matrix = self.material_matrix()
+        prices_version = tuple(
+            EveMarketPrice.objects.aggregate(
+                updated_at=models.Max("updated_at"), count=models.Count("pk")
+            ).values()
+        )
+        try:
+            version, values = self._reprocess_values[price_field]
+        except KeyError:
+            version, values = None, {}
+        if version != prices_version:
+            prices = dict(
+                EveMarketPrice.objects.filter(
+                    eve_type_id__in=matrix.material_ids
+                ).values_list("eve_type_id", price_field)
             )
+            values = matrix.values(prices)
+            self._reprocess_values[price_field] = (prices_version, values)
 
+        if type_ids is None:
+            return dict(values)
+        return {type_id: values[type_id] for type_id in type_ids if type_id in values}
 
-class EveIndustryActivityDurationManager(models.Manager, _ApiCacheManager):
+
+class EveIndustryActivityDurationManager(_ApiCacheManager):
     """Custom manager for EveIndustryActivityDuration."""
 
     _sde_cache_key = "EVEUNIVERSE_INDUSTRY_ACTIVITY_DURATIONS_REQUEST"
     _sde_cache_timeout = 3600 * 24
     _sde_api_route = "industryActivity.json"  # not related to EveIndustryActivity
-
-    def update_or_create_api(self, *, eve_type) -> None:
-        from eveuniverse.models import EveIndustryActivity
-
-        industry_activity_data_all = self._fetch_sde_data_cached()
-        for industry_activity_data in industry_activity_data_all.get(eve_type.id, []):
-            activity = EveIndustryActivity.objects.get(
-                pk=industry_activity_data.get("activityID")
-            )
-            self.update_or_create(
-                eve_type=eve_type,
-                activity=activity,
-                defaults={
-                    "time": industry_activity_data.get("time"),
-                },
-            )
+    _sde_has_activity = True
+    _sde_value_fields = {"time": "time"}
 
 
-class EveIndustryActivityMaterialManager(models.Manager, _ApiCacheManager):
+class EveIndustryActivityMaterialManager(_ApiCacheManager):
     """Custom manager for EveIndustryActivityMaterial."""
 
     _sde_cache_key = "EVEUNIVERSE_INDUSTRY_ACTIVITY_MATERIALS_REQUEST"
     _sde_cache_timeout = 3600 * 24
     _sde_api_route = "industryActivityMaterials.json"
+    _sde_type_fields = {"material_eve_type": "materialTypeID"}
+    _sde_has_activity = True
+    _sde_value_fields = {"quantity": "quantity"}
 
-    def update_or_create_api(self, *, eve_type) -> None:
-        from eveuniverse.models import EveIndustryActivity, EveType
+    def _objs_written(self) -> None:
+        from eveuniverse.models import EveIndustryActivityProduct
 
-        data_all = self._fetch_sde_data_cached()
-        activity_data = data_all.get(eve_type.id, {})
-        for industry_material_data in activity_data:
-            material_eve_type, _ = EveType.objects.get_or_create_esi(  # type: ignore
-                id=industry_material_data.get("materialTypeID")
-            )
-            activity = EveIndustryActivity.objects.get(
-                pk=industry_material_data.get("activityID")
-            )
-            self.update_or_create(
-                eve_type=eve_type,
-                material_eve_type=material_eve_type,
-                activity=activity,
-                defaults={
-                    "quantity": industry_material_data.get("quantity"),
-                },
-            )
+        # materials are part of the build graph
+        EveIndustryActivityProduct.objects.clear_bill_of_materials()  # type: ignore
 
 
-class EveIndustryActivityProductManager(models.Manager, _ApiCacheManager):
+class EveIndustryActivityProductManager(_ApiCacheManager):
     """Custom manager for EveIndustryActivityProduct."""
 
     _sde_cache_key = "EVEUNIVERSE_INDUSTRY_ACTIVITY_PRODUCTS_REQUEST"
     _sde_cache_timeout = 3600 * 24
     _sde_api_route = "industryActivityProducts.json"
+    _sde_type_fields = {"product_eve_type": "productTypeID"}
+    _sde_has_activity = True
+    _sde_value_fields = {"quantity": "quantity"}
 
-    def update_or_create_api(self, *, eve_type) -> None:
-        from eveuniverse.models import EveIndustryActivity, EveType
+    _build_activity_ids = (
+        EveIndustryActivityId.MANUFACTURING,
+        EveIndustryActivityId.REACTIONS,
+    )
 
-        data_all = self._fetch_sde_data_cached()
-        activity_data = data_all.get(eve_type.id, {})
-        for industry_products_data in activity_data:
-            product_eve_type, _ = EveType.objects.get_or_create_esi(  # type: ignore
-                id=industry_products_data.get("productTypeID")
-            )
-            activity = EveIndustryActivity.objects.get(
-                pk=industry_products_data.get("activityID")
-            )
-            self.update_or_create(
-                eve_type=eve_type,
-                product_eve_type=product_eve_type,
-                activity=activity,
-                defaults={
-                    "quantity": industry_products_data.get("quantity"),
-                },
-            )
+    def __init__(self) -> None:
+        super().__init__()
+        self._memory_cache = InMemoryCache()
+
+    def bill_of_materials(self) -> BillOfMaterials:
+        """Return the build graph of all manufacturing and reaction blueprints
+        in the database.
+
+        The graph is built once and then kept in memory of the current process
+        until it times out or is cleared.
+        """
+        return self._memory_cache.get_or_build(
+            "bill_of_materials", self._build_bill_of_materials
+        )
+
+    def clear_bill_of_materials(self) -> None:
+        """Clear the in-process build graph, so it will be rebuilt on next use."""
+        self._memory_cache.clear()
+
+    def _objs_written(self) -> None:
+        self.clear_bill_of_materials()
 
+    def raw_materials(self, quantities: Dict[int, int]) -> Dict[int, int]:
+        """Calculate the raw materials required to build products.
 
-class EveIndustryActivitySkillManager(models.Manager, _ApiCacheManager):
+        Build trees are expanded recursively from the local industry data
+        of all blueprints, which needs to be loaded before,
+        e.g. with ``EVEUNIVERSE_LOAD_INDUSTRY_ACTIVITIES``.
+
+        Args:
+            quantities: Mapping of product type IDs to the quantities to build
+
+        Returns:
+            Mapping of raw material type IDs to their total quantities
+        """
+        return self.bill_of_materials().raw_materials(quantities)
+
+    def _build_bill_of_materials(self) -> BillOfMaterials:
+        from eveuniverse.models import EveIndustryActivityMaterial
+
+        products = self.filter(activity_id__in=self._build_activity_ids).values_list(
+            "eve_type_id", "product_eve_type_id", "quantity"
+        )
+        materials = EveIndustryActivityMaterial.objects.filter(
+            activity_id__in=self._build_activity_ids
+        ).values_list("eve_type_id", "material_eve_type_id", "quantity")
+        return BillOfMaterials(products=products, materials=materials)
+
+
+class EveIndustryActivitySkillManager(_ApiCacheManager):
     """Custom manager for EveIndustryActivitySkill."""
 
     _sde_cache_key = "EVEUNIVERSE_INDUSTRY_ACTIVITY_SKILLS_REQUEST"
     _sde_cache_timeout = 3600 * 24
     _sde_api_route = "industryActivitySkills.json"
-
-    def update_or_create_api(self, *, eve_type) -> None:
-        from eveuniverse.models import EveIndustryActivity, EveType
-
-        data_all = self._fetch_sde_data_cached()
-        activity_data = data_all.get(eve_type.id, {})
-        for industry_skill_data in activity_data:
-            skill_eve_type, _ = EveType.objects.get_or_create_esi(  # type: ignore
-                id=industry_skill_data.get("skillID")
-            )
-            activity = EveIndustryActivity.objects.get(
-                pk=industry_skill_data.get("activityID")
-            )
-            self.update_or_create(
-                eve_type=eve_type,
-                skill_eve_type=skill_eve_type,
-                activity=activity,
-                defaults={
-                    "level": industry_skill_data.get("level"),
-                },
-            )
+    _sde_type_fields = {"skill_eve_type": "skillID"}
+    _sde_has_activity = True
+    _sde_value_fields = {"level": "level"}
@@ -1,29 +1,70 @@
 """Managers and Querysets for Eve universe models."""
 
+# pylint: disable = too-many-lines
 
 import datetime as dt
 import logging
+import math
+from array import array
+from bisect import bisect_left
 from collections import namedtuple
-from typing import Any, Dict, Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from bravado.exception import HTTPNotFound
+from bravado.exception import HTTPNotFound, HTTPNotModified
+from django.core.cache import cache
 from django.db import models, transaction
 from django.utils.timezone import now
 
 from eveuniverse import __title__
-from eveuniverse.app_settings import EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
-from eveuniverse.helpers import get_or_create_esi_or_none
+from eveuniverse.app_settings import (
+    EVEUNIVERSE_BULK_METHODS_BATCH_SIZE,
+    EVEUNIVERSE_BULK_METHODS_MAX_WORKERS,
+    EVEUNIVERSE_MARKET_PRICE_HISTORY_DAYS,
+    EVEUNIVERSE_MARKET_PRICE_HISTORY_FULL_RESOLUTION_DAYS,
+    EVEUNIVERSE_UPDATE_STALE_DAYS,
+    EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL,
+)
+from eveuniverse.constants import EveRegionId
+from eveuniverse.core.routes import StargateGraph
+from eveuniverse.core.spatial import DistanceMatrix, SpatialIndex
+from eveuniverse.helpers import InMemoryCache, bulk_upsert, pack_array, unpack_array
 from eveuniverse.providers import esi
-from eveuniverse.utils import LoggerAddTag
+from eveuniverse.utils import LoggerAddTag, chunks
 
 logger = LoggerAddTag(logging.getLogger(__name__), __title__)
 
 _FakeResponse = namedtuple("_FakeResponse", ["status_code"])
 
 
+def _parse_http_date(value: Optional[str]) -> Optional[dt.datetime]:
+    """Return datetime for a HTTP date header or None if it is not valid."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _map_in_parallel(func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """Return the results of calling a function for each item,
+    which are calculated in parallel threads when there are several items.
+    """
+    if len(items) < 2 or EVEUNIVERSE_BULK_METHODS_MAX_WORKERS < 2:
+        return [func(item) for item in items]
+
+    max_workers = min(EVEUNIVERSE_BULK_METHODS_MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
+
+
 class EveUniverseEntityModelManager(models.Manager):
     """Custom manager adding the ability to fetch objects from ESI."""
 
+    _supports_conditional_requests = True  # False when ESI data is post-processed
+
     def get_or_create_esi(
         self,
         *,
@@ -83,6 +124,7 @@ class EveUniverseEntityModelManager(models.Manager):
         wait_for_children: bool = True,
         enabled_sections: Optional[Iterable[str]] = None,
         task_priority: Optional[int] = None,
+        use_etag: bool = False,
     ) -> Tuple[Any, bool]:
         """updates or creates an Eve universe object by fetching it from ESI (blocking).
         Will always get/create parent objects
@@ -95,6 +137,8 @@ class EveUniverseEntityModelManager(models.Manager):
             enabled_sections: Sections to load regardless of current settings,
             e.g. `[EveType.Section.DOGMAS]` will always load dogmas for EveTypes
             task_priority: priority of started tasks
+            use_etag: when true an existing object is only updated
+            when it has changed on ESI (see :meth:`update_or_create_all_esi`)
 
         Returns:
             A tuple consisting of the requested object and a created flag
@@ -103,48 +147,228 @@ class EveUniverseEntityModelManager(models.Manager):
 
         id = int(id)
         effective_sections = determine_effective_sections(enabled_sections)
-        eve_data_obj = self._transform_esi_response_for_list_endpoints(
-            self.model, id, self._fetch_from_esi(id=id)
-        )
-        if eve_data_obj:
-            defaults = self.model._defaults_from_esi_obj(
-                eve_data_obj, effective_sections
+        if use_etag and self._can_use_etag(include_children, effective_sections):
+            eve_data_objs, etags = self._fetch_many_from_esi_if_changed(
+                [id], effective_sections
             )
-            obj, created = self.update_or_create(id=id, defaults=defaults)
+            if eve_data_objs[id] is None:
+                self._save_etags(etags)
+                return self.get(id=id), False
 
-            self.model._update_or_create_inline_objects(
-                parent_eve_data_obj=eve_data_obj,
-                parent_obj=obj,
-                wait_for_children=wait_for_children,
-                enabled_sections=effective_sections,
-                task_priority=task_priority,
+            eve_data_obj = eve_data_objs[id]
+        else:
+            etags = []
+            eve_data_obj = self._transform_esi_response_for_list_endpoints(
+                self.model, id, self._fetch_from_esi(id=id)
             )
 
-            if include_children:
-                self.model._update_or_create_children(
-                    parent_eve_data_obj=eve_data_obj,
-                    include_children=include_children,
-                    wait_for_children=wait_for_children,
-                    enabled_sections=effective_sections,
-                    task_priority=task_priority,
-                )
-
-            if not include_children and effective_sections:
-                updated_sections = (
-                    effective_sections - self.model._sections_need_children()
-                )
-            else:
-                updated_sections = effective_sections
-
-            obj.set_updated_sections(updated_sections)
+        result = self._update_or_create_from_esi_data(
+            id=id,
+            eve_data_obj=eve_data_obj,
+            include_children=include_children,
+            wait_for_children=wait_for_children,
+            effective_sections=effective_sections,
+            task_priority=task_priority,
+        )
+        self._save_etags(etags)
+        return result
 
-        else:
+    def _update_or_create_from_esi_data(
+        self,
+        *,
+        id: int,
+        eve_data_obj: dict,
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
+        task_priority: Optional[int] = None,
+    ) -> Tuple[Any, bool]:
+        """Update or create an object from already fetched ESI data."""
+        if not eve_data_obj:
             raise HTTPNotFound(
                 _FakeResponse(status_code=404),  # type: ignore
                 message=f"{self.model.__name__} object with id {id} not found",
             )
+
+        defaults = self.model._defaults_from_esi_obj(eve_data_obj, effective_sections)
+        obj, created = self.update_or_create(id=id, defaults=defaults)
+        self._bulk_update_or_create_related_objects(
+            objs=[obj],
+            eve_data_objs={obj.id: eve_data_obj},
+            include_children=include_children,
+            wait_for_children=wait_for_children,
+            effective_sections=effective_sections,
+            task_priority=task_priority,
+        )
+        obj.set_updated_sections(
+            self._updated_sections(effective_sections, include_children)
+        )
+        self._objs_written()
         return obj, created
 
+    def _bulk_update_or_create_from_esi_data(
+        self,
+        *,
+        eve_data_objs: Dict[int, dict],
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
+        task_priority: Optional[int] = None,
+    ) -> List[Any]:
+        """Update or create many objects from already fetched ESI data.
+
+        Objects are written in batches incl. their updated sections.
+        Inline objects and children are updated or created afterwards.
+
+        Returns:
+            Updated or created objects
+        """
+        for id, eve_data_obj in eve_data_objs.items():
+            if not eve_data_obj:
+                raise HTTPNotFound(
+                    _FakeResponse(status_code=404),  # type: ignore
+                    message=f"{self.model.__name__} object with id {id} not found",
+                )
+
+        objs_by_fields = self._objs_from_esi_data(
+            eve_data_objs, effective_sections, include_children
+        )
+        for field_names, objs in objs_by_fields.items():
+            self._bulk_upsert(objs, sorted(field_names))
+
+        objs = [obj for objs in objs_by_fields.values() for obj in objs]
+        self._bulk_update_or_create_related_objects(
+            objs=objs,
+            eve_data_objs=eve_data_objs,
+            include_children=include_children,
+            wait_for_children=wait_for_children,
+            effective_sections=effective_sections,
+            task_priority=task_priority,
+        )
+        self._objs_written()
+        return objs
+
+    def _objs_from_esi_data(
+        self,
+        eve_data_objs: Dict[int, dict],
+        effective_sections: Set[str],
+        include_children: bool,
+    ) -> Dict[frozenset, List[Any]]:
+        """Create unsaved objects from ESI data incl. their updated sections.
+
+        Returns:
+            Objects grouped by the names of their fields to write
+        """
+        has_sections = any(
+            field.name == "enabled_sections" for field in self.model._meta.fields
+        )
+        if has_sections:
+            existing_sections = dict(
+                self.filter(id__in=eve_data_objs.keys()).values_list(
+                    "id", "enabled_sections"
+                )
+            )
+            updated_sections = self._updated_sections(
+                effective_sections, include_children
+            )
+        else:
+            existing_sections = {}
+            updated_sections = set()
+
+        objs_by_fields: Dict[frozenset, List[Any]] = {}
+        defaults_list = self.model._defaults_from_esi_objs(
+            list(eve_data_objs.values()), effective_sections
+        )
+        for id, defaults in zip(eve_data_objs.keys(), defaults_list):
+            obj = self.model(id=id, **defaults)
+            field_names = set(defaults.keys())
+            if has_sections:
+                obj.enabled_sections = int(existing_sections.get(id, 0))
+                for section in updated_sections:
+                    if str(section) in self.model.Section.values():
+                        setattr(obj.enabled_sections, section, True)
+                field_names.add("enabled_sections")
+            objs_by_fields.setdefault(frozenset(field_names), []).append(obj)
+
+        return objs_by_fields
+
+    def _bulk_upsert(self, objs: List[Any], field_names: List[str]) -> None:
+        """Insert new and update existing objects in batches."""
+        bulk_upsert(
+            self,
+            objs,
+            unique_fields=["id"],
+            update_fields=field_names + ["last_updated"],
+        )
+
+    def _objs_written(self) -> None:
+        """Called after objects of this model have been written to the database.
+
+        Can be overwritten to clear in-process data derived from these objects.
+        """
+
+    def _update_or_create_related_objects(
+        self,
+        *,
+        obj: Any,  # pylint: disable = unused-argument
+        eve_data_obj: dict,
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
+        task_priority: Optional[int] = None,
+    ) -> None:
+        """Update or create children of an object.
+
+        Inline objects have already been written for all objects of a batch.
+        Can be overwritten to also update other objects related to the object.
+        """
+        if include_children:
+            self.model._update_or_create_children(
+                parent_eve_data_obj=eve_data_obj,
+                include_children=include_children,
+                wait_for_children=wait_for_children,
+                enabled_sections=effective_sections,
+                task_priority=task_priority,
+            )
+
+    def _bulk_update_or_create_related_objects(
+        self,
+        *,
+        objs: List[Any],
+        eve_data_objs: Dict[int, dict],
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
+        task_priority: Optional[int] = None,
+    ) -> None:
+        """Update or create inline objects of many objects together
+        and then the children of each object.
+        """
+        self.model._update_or_create_inline_objects(
+            parent_objs=objs,
+            parent_eve_data_objs=eve_data_objs,
+            wait_for_children=wait_for_children,
+            enabled_sections=effective_sections,
+            task_priority=task_priority,
+        )
+        for obj in objs:
+            self._update_or_create_related_objects(
+                obj=obj,
+                eve_data_obj=eve_data_objs[obj.id],
+                include_children=include_children,
+                wait_for_children=wait_for_children,
+                effective_sections=effective_sections,
+                task_priority=task_priority,
+            )
+
+    def _updated_sections(
+        self, effective_sections: Set[str], include_children: bool
+    ) -> Set[str]:
+        """Return sections which are complete after an update."""
+        if not include_children and effective_sections:
+            return effective_sections - self.model._sections_need_children()
+        return effective_sections
+
     @staticmethod
     def _transform_esi_response_for_list_endpoints(
         model_class, id: int, esi_data
@@ -181,6 +405,149 @@ class EveUniverseEntityModelManager(models.Manager):
         esi_data = getattr(getattr(esi.client, category), method)(**params).results()
         return esi_data
 
+    def _fetch_many_from_esi(
+        self, ids: Iterable[int], enabled_sections: Optional[Iterable[str]] = None
+    ) -> Dict[int, dict]:
+        """Fetch ESI data for many objects in parallel.
+
+        Returns:
+            Mapping of IDs to ESI data
+        """
+        ids = list(ids)
+        if self.model._is_list_only_endpoint():
+            esi_data = self._fetch_from_esi() if ids else []
+            return {
+                id: self._transform_esi_response_for_list_endpoints(
+                    self.model, id, esi_data
+                )
+                for id in ids
+            }
+
+        if len(ids) > 1:
+            logger.info(
+                "Fetching %d %s objects from ESI", len(ids), self.model.__name__
+            )
+        results = _map_in_parallel(
+            lambda id: self._fetch_from_esi(id, enabled_sections), ids
+        )
+        return dict(zip(ids, results))
+
+    def _can_use_etag(self, include_children: bool, effective_sections: Set[str]):
+        """Return True when objects can be updated with conditional requests,
+        else False.
+
+        Objects which need to load their children are always fetched,
+        because the children are taken from the response.
+        """
+        return (
+            self._supports_conditional_requests
+            and not self.model._is_list_only_endpoint()
+            and not (include_children and self.model._children(effective_sections))
+        )
+
+    def _known_etags(
+        self, ids: List[int], effective_sections: Set[str]
+    ) -> Dict[int, Any]:
+        """Return ETag objects of existing objects with all effective sections."""
+        from eveuniverse.models import EveUniverseEtag
+
+        current_ids = set(
+            self.filter(id__in=ids)
+            .filter(**self._enabled_sections_filter(effective_sections))
+            .values_list("id", flat=True)
+        )
+        return {
+            obj.object_id: obj
+            for obj in EveUniverseEtag.objects.filter(
+                model_name=self.model.__name__, object_id__in=current_ids
+            )
+        }
+
+    def _fetch_many_from_esi_if_changed(
+        self, ids: Iterable[int], effective_sections: Set[str]
+    ) -> Tuple[Dict[int, Optional[dict]], List[Any]]:
+        """Fetch ESI data for many objects with conditional requests.
+
+        Existing objects with all effective sections are not requested again
+        before their last response from ESI has expired. When they are requested,
+        ESI is asked to only return their data when it has changed.
+
+        Returns:
+            Mapping of IDs to ESI data or None when the object has not changed
+            and ETag objects, which need to be saved after the objects
+        """
+        from eveuniverse.models import EveUniverseEtag
+
+        ids = list(ids)
+        known_etags = self._known_etags(ids, effective_sections)
+        eve_data_objs: Dict[int, Optional[dict]] = {}
+        ids_to_fetch = []
+        current_time = now()
+        for id in ids:
+            etag_obj = known_etags.get(id)
+            if etag_obj and etag_obj.expires and etag_obj.expires > current_time:
+                eve_data_objs[id] = None
+            else:
+                ids_to_fetch.append(id)
+
+        def fetch(id: int) -> Tuple[Optional[dict], Any]:
+            etag_obj = known_etags.get(id)
+            return self._fetch_from_esi_if_changed(
+                id, etag_obj.etag if etag_obj else ""
+            )
+
+        results = _map_in_parallel(fetch, ids_to_fetch)
+        etags = []
+        for id, (eve_data_obj, headers) in zip(ids_to_fetch, results):
+            eve_data_objs[id] = eve_data_obj
+            etags.append(
+                EveUniverseEtag(
+                    model_name=self.model.__name__,
+                    object_id=id,
+                    etag=headers.get("ETag") or "",
+                    expires=_parse_http_date(headers.get("Expires")),
+                )
+            )
+
+        logger.info(
+            "%s: %d of %d objects have not changed on ESI",
+            self.model.__name__,
+            sum(1 for obj in eve_data_objs.values() if obj is None),
+            len(ids),
+        )
+        return eve_data_objs, etags
+
+    def _fetch_from_esi_if_changed(
+        self, id: int, etag: str
+    ) -> Tuple[Optional[dict], Any]:
+        """Make a conditional request to ESI for an object.
+
+        Returns:
+            ESI data or None when it has not changed and the response headers
+        """
+        params: Dict[str, Any] = {self.model._esi_pk(): id}
+        if etag:
+            params["_request_options"] = {"headers": {"If-None-Match": etag}}
+        category, method = self.model._esi_path_object()
+        operation = getattr(getattr(esi.client, category), method)(**params)
+        operation.request_config.also_return_response = True
+        try:
+            esi_data, response = operation.results(ignore_cache=True)
+        except HTTPNotModified as ex:
+            return None, ex.response.headers
+        return esi_data, response.headers
+
+    def _save_etags(self, etags: List[Any]) -> None:
+        """Save ETags of objects, which have been updated."""
+        from eveuniverse.models import EveUniverseEtag
+
+        bulk_upsert(
+            EveUniverseEtag.objects,
+            etags,
+            unique_fields=["model_name", "object_id"],
+            update_fields=["etag", "expires"],
+        )
+
     def update_or_create_all_esi(
         self,
         *,
@@ -188,15 +555,24 @@ class EveUniverseEntityModelManager(models.Manager):
         wait_for_children: bool = True,
         enabled_sections: Optional[Iterable[str]] = None,
         task_priority: Optional[int] = None,
+        use_etag: bool = False,
     ) -> None:
         """Update or create all objects of this class from ESI.
 
         Loading all objects can take a long time. Use with care!
 
+        When ``use_etag`` is enabled the ETag and expiry time of each response
+        from ESI are stored. Existing objects are then not requested again
+        before their response has expired and are only updated
+        when they have changed on ESI.
+        This does not apply to objects which load their children,
+        because the children are taken from the response of their parent.
+
         Args:
             include_children: if child objects should be updated/created as well (if any)
             wait_for_children: when false all objects will be loaded async, else blocking
             enabled_sections: Sections to load regardless of current settings
+            use_etag: when true only update objects which have changed on ESI
         """
         from eveuniverse.models.base import determine_effective_sections
         from eveuniverse.tasks import (
@@ -215,18 +591,20 @@ class EveUniverseEntityModelManager(models.Manager):
                 task_priority,
                 task_update_or_create_eve_object,
                 effective_sections,
+                use_etag,
             )
 
     def _update_or_create_all_esi_list_endpoint(self, effective_sections):
         esi_pk = self.model._esi_pk()
-        for eve_data_obj in self._fetch_from_esi():
-            params = {
-                "id": eve_data_obj[esi_pk],
-                "defaults": self.model._defaults_from_esi_obj(
-                    eve_data_obj=eve_data_obj, enabled_sections=effective_sections
-                ),
-            }
-            self.update_or_create(**params)
+        self._bulk_update_or_create_from_esi_data(
+            eve_data_objs={
+                eve_data_obj[esi_pk]: eve_data_obj
+                for eve_data_obj in self._fetch_from_esi()
+            },
+            include_children=False,
+            wait_for_children=True,
+            effective_sections=effective_sections,
+        )
 
     def _update_or_create_all_esi_normal(
         self,
@@ -235,19 +613,37 @@ class EveUniverseEntityModelManager(models.Manager):
         task_priority,
         task_update_or_create_eve_object,
         effective_sections,
+        use_etag=False,
     ):
         if self.model._has_esi_path_list():
             category, method = self.model._esi_path_list()
             ids = getattr(getattr(esi.client, category), method)().results()
-            for id in ids:
-                if wait_for_children:
-                    self.update_or_create_esi(
-                        id=id,
-                        include_children=include_children,
-                        wait_for_children=wait_for_children,
-                        enabled_sections=effective_sections,
-                    )
-                else:
+            if wait_for_children:
+                use_etag = use_etag and self._can_use_etag(
+                    include_children, effective_sections
+                )
+                for ids_chunk in chunks(ids, EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+                    if use_etag:
+                        eve_data_objs, etags = self._fetch_many_from_esi_if_changed(
+                            ids_chunk, effective_sections
+                        )
+                        eve_data_objs = {
+                            id: eve_data_obj
+                            for id, eve_data_obj in eve_data_objs.items()
+                            if eve_data_obj is not None
+                        }
+                    else:
+                        eve_data_objs, etags = self._fetch_many_from_esi(ids_chunk), []
+                    if eve_data_objs:
+                        self._bulk_update_or_create_from_esi_data(
+                            eve_data_objs=eve_data_objs,
+                            include_children=include_children,
+                            wait_for_children=wait_for_children,
+                            effective_sections=effective_sections,
+                        )
+                    self._save_etags(etags)
+            else:
+                for id in ids:
                     params: Dict[str, Any] = {
                         "kwargs": {
                             "model_name": self.model.__name__,
@@ -258,6 +654,8 @@ class EveUniverseEntityModelManager(models.Manager):
                             "task_priority": task_priority,
                         },
                     }
+                    if use_etag:
+                        params["kwargs"]["use_etag"] = True
                     if task_priority:
                         params["priority"] = task_priority
                     task_update_or_create_eve_object.apply_async(**params)  # type: ignore
@@ -300,21 +698,291 @@ class EveUniverseEntityModelManager(models.Manager):
             .filter(**enabled_sections_filter)
             .values_list("id", flat=True)
         )
-        for id in ids.difference(existing_ids):
-            self.update_or_create_esi(
-                id=int(id),
+        missing_ids = ids.difference(existing_ids)
+        if missing_ids:
+            self._bulk_update_or_create_from_esi_data(
+                eve_data_objs=self._fetch_many_from_esi(sorted(missing_ids)),
                 include_children=include_children,
                 wait_for_children=wait_for_children,
-                enabled_sections=effective_sections,
+                effective_sections=effective_sections,
                 task_priority=task_priority,
             )
 
         return self.filter(id__in=ids)
 
+    def update_or_create_tree_esi(
+        self, *, ids: Iterable[int], enabled_sections: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """Update or create objects incl. all their children from ESI in bulk (blocking).
+
+        The tree is loaded level by level in load order,
+        e.g. a region, then its constellations, then their solar systems.
+        The objects of each level are fetched from ESI in parallel
+        and written in batches, so that a whole tree is loaded
+        with few database transactions and without starting any tasks.
+
+        Args:
+            ids: Eve Online IDs of the root objects
+            enabled_sections: Sections to load regardless of current settings
+
+        Returns:
+            Number of updated or created objects per model
+        """
+        from eveuniverse.models.base import determine_effective_sections
+
+        effective_sections = determine_effective_sections(enabled_sections)
+        counts: Dict[str, int] = {}
+        self._update_or_create_tree_esi(
+            sorted(set(map(int, ids))), effective_sections, counts
+        )
+        return counts
+
+    def _update_or_create_tree_esi(
+        self, ids: List[int], effective_sections: Set[str], counts: Dict[str, int]
+    ) -> None:
+        children = self.model._children(effective_sections)
+        has_sections = any(
+            field.name == "enabled_sections" for field in self.model._meta.fields
+        )
+        for ids_chunk in chunks(ids, EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+            eve_data_objs = self._fetch_many_from_esi(ids_chunk, effective_sections)
+            self._bulk_update_or_create_from_esi_data(
+                eve_data_objs=eve_data_objs,
+                include_children=False,
+                wait_for_children=True,
+                effective_sections=effective_sections,
+            )
+            counts[self.model.__name__] = counts.get(self.model.__name__, 0) + len(
+                eve_data_objs
+            )
+            for key, child_class in children.items():
+                child_ids = [
+                    child_id
+                    for eve_data_obj in eve_data_objs.values()
+                    for child_id in self.model._child_ids(eve_data_obj, key)
+                ]
+                if child_ids:
+                    child_model_class = self.model.get_model_class(child_class)
+                    child_model_class.objects._update_or_create_tree_esi(
+                        child_ids, effective_sections, counts
+                    )
+
+            # sections which need children are only complete now
+            completed_sections = [
+                section
+                for section in self.model._sections_need_children()
+                if str(section) in effective_sections
+            ]
+            if has_sections and completed_sections:
+                mask = 0
+                for section in completed_sections:
+                    mask |= getattr(self.model.enabled_sections, section).mask
+                self.filter(id__in=ids_chunk).update(
+                    enabled_sections=models.F("enabled_sections").bitor(mask)
+                )
+            self._objs_written()
+
+    def stale(self, max_age: Optional[dt.timedelta] = None) -> models.QuerySet:
+        """Return objects which have not been updated from ESI for some time.
+
+        Args:
+            max_age: Objects last updated before this time are stale.
+                Defaults to the days defined for this model in the settings.
+        """
+        if max_age is None:
+            days = EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL.get(
+                self.model.__name__, EVEUNIVERSE_UPDATE_STALE_DAYS
+            )
+            max_age = dt.timedelta(days=days)
+        return self.filter(last_updated__lt=now() - max_age)
+
+    def update_stale_esi(
+        self,
+        *,
+        max_age: Optional[dt.timedelta] = None,
+        max_objects: Optional[int] = None,
+        use_etag: bool = True,
+    ) -> int:
+        """Update objects from ESI, which have not been updated for some time.
+
+        Stale objects are updated in pages ordered by their last update,
+        so the oldest objects are always updated first.
+        Each object is updated with the sections it was loaded with,
+        but its children are not loaded.
+        Objects which no longer exist on ESI are skipped
+        and only tried again when they become stale again.
+
+        Args:
+            max_age: Objects last updated before this time are stale.
+                Defaults to the days defined for this model in the settings.
+            max_objects: Maximum number of objects to update,
+                e.g. to limit the number of requests to ESI per run
+            use_etag: when true unchanged objects are not written again
+                (see :meth:`update_or_create_all_esi`)
+
+        Returns:
+            Number of updated objects
+        """
+        stale_qs = self.stale(max_age)
+        if self.model._is_list_only_endpoint():
+            return self._update_stale_list_endpoint(stale_qs)
+
+        has_sections = any(
+            field.name == "enabled_sections" for field in self.model._meta.fields
+        )
+        fields = ["id", "last_updated"] + (["enabled_sections"] if has_sections else [])
+        total = stale_qs.count()
+        if max_objects is not None:
+            total = min(total, max_objects)
+
+        updated_count = 0
+        processed_count = 0
+        page_qs = stale_qs.order_by("last_updated", "id")
+        while processed_count < total:
+            page_size = min(
+                EVEUNIVERSE_BULK_METHODS_BATCH_SIZE, total - processed_count
+            )
+            page = list(page_qs.values_list(*fields)[:page_size])
+            if not page:
+                break
+
+            updated_count += self._update_stale_page(page, has_sections, use_etag)
+            processed_count += len(page)
+            last_updated, last_id = page[-1][1], page[-1][0]
+            page_qs = page_qs.filter(
+                models.Q(last_updated__gt=last_updated)
+                | models.Q(last_updated=last_updated, id__gt=last_id)
+            )
+            logger.info(
+                "%s: Updated %d of %d stale objects",
+                self.model.__name__,
+                processed_count,
+                total,
+            )
+
+        return updated_count
+
+    def _update_stale_list_endpoint(self, stale_qs: models.QuerySet) -> int:
+        """Update all objects of a list endpoint when some of them are stale.
+
+        Returns:
+            Number of stale objects
+        """
+        from eveuniverse.models.base import determine_effective_sections
+
+        stale_count = stale_qs.count()
+        if stale_count:
+            self._update_or_create_all_esi_list_endpoint(determine_effective_sections())
+        return stale_count
+
+    def _update_stale_page(
+        self, page: List[tuple], has_sections: bool, use_etag: bool
+    ) -> int:
+        """Update a page of stale objects grouped by their sections.
+
+        Returns:
+            Number of updated objects
+        """
+        from eveuniverse.models.base import determine_effective_sections
+
+        ids_by_mask: Dict[int, List[int]] = {}
+        for row in page:
+            mask = int(row[2]) if has_sections else 0
+            ids_by_mask.setdefault(mask, []).append(row[0])
+
+        updated_count = 0
+        for mask, ids in ids_by_mask.items():
+            sections = {
+                str(section)
+                for section in self.model.Section
+                if mask & getattr(self.model.enabled_sections, section).mask
+            }
+            updated_count += self._update_stale_objects(
+                ids, determine_effective_sections(sections), use_etag
+            )
+
+        return updated_count
+
+    def _update_stale_objects(
+        self, ids: List[int], effective_sections: Set[str], use_etag: bool
+    ) -> int:
+        """Update existing objects from ESI without their children.
+
+        Returns:
+            Number of updated objects
+        """
+        if use_etag and self._can_use_etag(False, effective_sections):
+            try:
+                eve_data_objs, etags = self._fetch_many_from_esi_if_changed(
+                    ids, effective_sections
+                )
+            except HTTPNotFound:
+                return self._update_stale_objects_one_by_one(
+                    ids, effective_sections, use_etag
+                )
+
+            unchanged_ids = [id for id, obj in eve_data_objs.items() if obj is None]
+            eve_data_objs = {
+                id: obj for id, obj in eve_data_objs.items() if obj is not None
+            }
+        else:
+            try:
+                eve_data_objs, etags = self._fetch_many_from_esi(ids), []
+            except HTTPNotFound:
+                return self._update_stale_objects_one_by_one(
+                    ids, effective_sections, use_etag
+                )
+
+            unchanged_ids = []
+
+        if eve_data_objs:
+            self._bulk_update_or_create_from_esi_data(
+                eve_data_objs=eve_data_objs,
+                include_children=False,
+                wait_for_children=True,
+                effective_sections=effective_sections,
+            )
+        if unchanged_ids:
+            self.filter(id__in=unchanged_ids).update(last_updated=now())
+        self._save_etags(etags)
+        return len(ids)
+
+    def _update_stale_objects_one_by_one(
+        self, ids: List[int], effective_sections: Set[str], use_etag: bool
+    ) -> int:
+        """Update existing objects from ESI one by one
+        and skip objects which no longer exist.
+
+        Returns:
+            Number of updated objects
+        """
+        updated_count = 0
+        for id in ids:
+            try:
+                self.update_or_create_esi(
+                    id=id, enabled_sections=effective_sections, use_etag=use_etag
+                )
+            except HTTPNotFound:
+                logger.warning(
+                    "%s: Object with ID %d no longer exists on ESI",
+                    self.model.__name__,
+                    id,
+                )
+                # so it does not block updating other stale objects
+                self.filter(id=id).update(last_updated=now())
+            else:
+                if use_etag:
+                    self.filter(id=id).update(last_updated=now())
+                updated_count += 1
+
+        return updated_count
+
 
 class EvePlanetManager(EveUniverseEntityModelManager):
     """:meta private:"""
 
+    _supports_conditional_requests = False
+
     def _fetch_from_esi(
         self, id: Optional[int] = None, enabled_sections: Optional[Iterable[str]] = None
     ) -> dict:
@@ -332,7 +1000,9 @@ class EvePlanetManager(EveUniverseEntityModelManager):
             raise ValueError("system_id not found in moon response - data error")
 
         system_id = esi_data["system_id"]
-        solar_system_data = EveSolarSystem.objects._fetch_from_esi(id=system_id)  # type: ignore
+        solar_system_data = EveSolarSystem.objects._fetch_from_esi_cached(  # type: ignore
+            id=system_id
+        )
         if "planets" not in solar_system_data:
             raise ValueError("planets not found in solar system response - data error")
 
@@ -355,6 +1025,8 @@ class EvePlanetManager(EveUniverseEntityModelManager):
 class EvePlanetChildrenManager(EveUniverseEntityModelManager):
     """:meta private:"""
 
+    _supports_conditional_requests = False
+
     def __init__(self) -> None:
         super().__init__()
         self._my_property_name = None
@@ -377,7 +1049,9 @@ class EvePlanetChildrenManager(EveUniverseEntityModelManager):
             raise ValueError("system_id not found in moon response - data error")
 
         system_id = esi_data["system_id"]
-        solar_system_data = EveSolarSystem.objects._fetch_from_esi(id=system_id)  # type: ignore
+        solar_system_data = EveSolarSystem.objects._fetch_from_esi_cached(  # type: ignore
+            id=system_id
+        )
         if "planets" not in solar_system_data:
             raise ValueError("planets not found in solar system response - data error")
 
@@ -412,91 +1086,310 @@ class EveMoonManager(EvePlanetChildrenManager):
         self._my_property_name = "moons"
 
 
+class EveSolarSystemManager(EveUniverseEntityModelManager):
+    """Custom manager for EveSolarSystem."""
+
+    _esi_data_cache_timeout = 600  # max age of cached ESI data in seconds
+    _esi_data_cache_key = "EVEUNIVERSE_SOLAR_SYSTEM_ESI_DATA"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._memory_cache = InMemoryCache()
+
+    def _fetch_from_esi(
+        self,
+        id: Optional[int] = None,
+        _enabled_sections: Optional[Iterable[str]] = None,
+    ) -> dict:
+        """Fetch a solar system from ESI and keep its data in the cache for a while,
+        so it can be reused when loading its planets, moons and asteroid belts.
+        """
+        esi_data = super()._fetch_from_esi(id=id)
+        if id is not None:
+            cache.set(
+                f"{self._esi_data_cache_key}_{id}",
+                esi_data,
+                timeout=self._esi_data_cache_timeout,
+            )
+        return esi_data
+
+    def _fetch_from_esi_cached(self, id: int) -> dict:
+        """Return data of a solar system from the cache
+        or fetch it from ESI if it is not cached.
+        """
+        esi_data = cache.get(f"{self._esi_data_cache_key}_{id}")
+        if esi_data is None:
+            esi_data = self._fetch_from_esi(id=id)
+        return esi_data
+
+    def stargate_graph(self) -> StargateGraph:
+        """Return the stargate network of all solar systems in the database.
+
+        The graph is built once and then kept in memory of the current process
+        until it times out or is cleared.
+        """
+        return self._memory_cache.get_or_build(
+            "stargate_graph", self._build_stargate_graph
+        )
+
+    def clear_stargate_graph(self) -> None:
+        """Clear the in-process stargate graph, so it will be rebuilt on next use."""
+        self._memory_cache.clear("stargate_graph")
+
+    def spatial_index(self) -> SpatialIndex:
+        """Return a spatial index of all solar systems in the database
+        with known coordinates, except those in wormhole space or Pochven.
+
+        The index is built once and then kept in memory of the current process
+        until it times out or is cleared.
+        """
+        return self._memory_cache.get_or_build(
+            "spatial_index", self._build_spatial_index
+        )
+
+    def clear_spatial_index(self) -> None:
+        """Clear the in-process spatial index, so it will be rebuilt on next use."""
+        self._memory_cache.clear("spatial_index")
+
+    def _objs_written(self) -> None:
+        self.clear_stargate_graph()
+        self.clear_spatial_index()
+
+    def systems_within_ly(self, origin_id: int, light_years: float) -> Dict[int, float]:
+        """Find all solar systems within a distance of a solar system.
+
+        Solar systems in wormhole space and Pochven are never included.
+
+        Args:
+            origin_id: Eve ID of the solar system in the center
+            light_years: Max distance from the origin in light years
+
+        Returns:
+            Mapping of solar system IDs to their distance from origin in light years,
+            not including the origin itself
+        """
+        return self.spatial_index().systems_within(int(origin_id), light_years)
+
+    def distance_matrix(self, ids: Iterable[int]) -> DistanceMatrix:
+        """Calculate pairwise distances between solar systems in light years.
+
+        Distances are calculated on demand, so large matrices
+        e.g. for all solar systems in known space can be used
+        without holding all distances in memory.
+
+        Args:
+            ids: Eve IDs of solar systems
+
+        Returns:
+            Matrix with one row and column for each ID in the given order.
+            Distances to solar systems in wormhole space or Pochven are NaN.
+        """
+        return self.spatial_index().distance_matrix(map(int, ids))
+
+    def jumps_within(self, origin_id: int, max_jumps: int) -> Dict[int, int]:
+        """Calculate jumps to all solar systems within reach of a solar system.
+
+        Calculated from the stargates in the local database only.
+
+        Args:
+            origin_id: Eve ID of the solar system to start from
+            max_jumps: Maximum number of jumps from the origin
+
+        Returns:
+            Mapping of solar system IDs to jumps from origin incl. the origin itself
+        """
+        return self.stargate_graph().jumps_from(int(origin_id), max_jumps=max_jumps)
+
+    def jumps_matrix(
+        self, origin_ids: Iterable[int], destination_ids: Iterable[int]
+    ) -> List[array]:
+        """Calculate jumps between many origins and destinations at once.
+
+        Calculated from the stargates in the local database only.
+
+        Args:
+            origin_ids: Eve IDs of solar systems to start from
+            destination_ids: Eve IDs of solar systems to go to
+
+        Returns:
+            One row for each origin with the jumps to each destination
+            in the given order as compact array.
+            Destinations that can not be reached are -1.
+        """
+        return self.stargate_graph().jumps_matrix(
+            origin_ids=map(int, origin_ids), destination_ids=map(int, destination_ids)
+        )
+
+    def jump_route(
+        self, origin_id: int, destination_id: int, light_years: float
+    ) -> Optional[List[int]]:
+        """Calculate a jump drive route for capital ships between two solar systems.
+
+        The route has the least number of jumps and among those
+        the shortest total distance to minimize jump fatigue.
+        High sec, wormhole space and Pochven systems are never used.
+
+        Args:
+            origin_id: Eve ID of the solar system to start from
+            destination_id: Eve ID of the solar system to go to
+            light_years: Max jump range of the ship in light years
+
+        Returns:
+            List of solar system IDs incl. origin and destination
+            or None if no route can be found
+        """
+        return self.spatial_index().jump_route(
+            int(origin_id), int(destination_id), light_years
+        )
+
+    def _build_stargate_graph(self) -> StargateGraph:
+        from eveuniverse.models import EveStargate
+
+        connections = []
+        incomplete_ids = set()
+        for origin_id, destination_id in EveStargate.objects.values_list(
+            "eve_solar_system_id", "destination_eve_solar_system_id"
+        ):
+            if destination_id is None:
+                incomplete_ids.add(origin_id)
+            else:
+                connections.append((origin_id, destination_id))
+
+        security_status = dict(self.values_list("id", "security_status"))
+        enabled_sections_filter = self._enabled_sections_filter(
+            [self.model.Section.STARGATES]
+        )
+        complete_ids = set(
+            self.filter(**enabled_sections_filter).values_list("id", flat=True)
+        )
+        graph = StargateGraph(
+            connections=connections,
+            security_status=security_status,
+            complete_ids=complete_ids - incomplete_ids,
+        )
+        logger.info("Built stargate graph with %d solar systems", len(graph))
+        return graph
+
+    def _build_spatial_index(self) -> SpatialIndex:
+        rows = (
+            self.filter(
+                position_x__isnull=False,
+                position_y__isnull=False,
+                position_z__isnull=False,
+            )
+            .exclude(id__range=(31_000_000, 31_999_999))  # wormhole space
+            .exclude(eve_constellation__eve_region_id=EveRegionId.POCHVEN)
+            .values_list(
+                "id",
+                "position_x",
+                "position_y",
+                "position_z",
+                "security_status",
+                "eve_constellation__eve_region_id",
+            )
+        )
+        index = SpatialIndex(rows)
+        logger.info("Built spatial index with %d solar systems", len(index))
+        return index
+
+
 class EveStargateManager(EveUniverseEntityModelManager):
     """For special handling of relations
 
     :meta private:
     """
 
-    def update_or_create_esi(
+    def _update_or_create_related_objects(
         self,
         *,
-        id: int,
-        include_children: bool = False,
-        wait_for_children: bool = True,
-        enabled_sections: Optional[Iterable[str]] = None,
+        obj: Any,
+        eve_data_obj: dict,
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
         task_priority: Optional[int] = None,
-    ) -> Tuple[Any, bool]:
-        """updates or creates an EveStargate object by fetching it from ESI (blocking).
-        Will always get/create parent objects
-
-        Args:
-            id: Eve Online ID of object
-            include_children: (no effect)
-            wait_for_children: (no effect)
-
-        Returns:
-            A tuple consisting of the requested object and a created flag
-        """
-        obj, created = super().update_or_create_esi(
-            id=int(id),
+    ) -> None:
+        """Also links this stargate and its destination stargate with each other."""
+        super()._update_or_create_related_objects(
+            obj=obj,
+            eve_data_obj=eve_data_obj,
             include_children=include_children,
             wait_for_children=wait_for_children,
+            effective_sections=effective_sections,
             task_priority=task_priority,
         )
-        if obj:
-            if obj.destination_eve_stargate is not None:
-                obj.destination_eve_stargate.destination_eve_stargate = obj
+        if obj.destination_eve_stargate is None:
+            # destination might have been written in the same batch
+            destination_id = eve_data_obj.get("destination", {}).get("stargate_id")
+            if destination_id:
+                obj.destination_eve_stargate = self.filter(id=destination_id).first()
+                if obj.destination_eve_stargate is not None:
+                    obj.save(update_fields=["destination_eve_stargate"])
+
+        if obj.destination_eve_stargate is not None:
+            obj.destination_eve_stargate.destination_eve_stargate = obj
+
+            if obj.eve_solar_system is not None:
+                obj.destination_eve_stargate.destination_eve_solar_system = (
+                    obj.eve_solar_system
+                )
+            obj.destination_eve_stargate.save()
 
-                if obj.eve_solar_system is not None:
-                    obj.destination_eve_stargate.destination_eve_solar_system = (
-                        obj.eve_solar_system
-                    )
-                obj.destination_eve_stargate.save()
+    def _objs_written(self) -> None:
+        from eveuniverse.models import EveSolarSystem
 
-        return obj, created
+        EveSolarSystem.objects.clear_stargate_graph()  # type: ignore
 
 
 class EveTypeManager(EveUniverseEntityModelManager):
     """:meta private:"""
 
-    def update_or_create_esi(
+    def _bulk_update_or_create_related_objects(
         self,
         *,
-        id: int,
-        include_children: bool = False,
-        wait_for_children: bool = True,
-        enabled_sections: Optional[Iterable[str]] = None,
+        objs: List[Any],
+        eve_data_objs: Dict[int, dict],
+        include_children: bool,
+        wait_for_children: bool,
+        effective_sections: Set[str],
         task_priority: Optional[int] = None,
-    ) -> Tuple[Any, bool]:
-        from eveuniverse.models.base import determine_effective_sections
-
-        effective_sections = determine_effective_sections(enabled_sections)
-        obj, created = super().update_or_create_esi(
-            id=id,
+    ) -> None:
+        """Also loads data for enabled sections from the SDE API
+        for all objects at once.
+        """
+        super()._bulk_update_or_create_related_objects(
+            objs=objs,
+            eve_data_objs=eve_data_objs,
             include_children=include_children,
             wait_for_children=wait_for_children,
-            enabled_sections=effective_sections,
+            effective_sections=effective_sections,
             task_priority=task_priority,
         )
-        if effective_sections:
-            if self.model.Section.TYPE_MATERIALS in effective_sections:
-                from eveuniverse.models import EveTypeMaterial
-
-                EveTypeMaterial.objects.update_or_create_api(eve_type=obj)  # type: ignore
-            if self.model.Section.INDUSTRY_ACTIVITIES in effective_sections:
-                from eveuniverse.models import (
-                    EveIndustryActivityDuration,
-                    EveIndustryActivityMaterial,
-                    EveIndustryActivityProduct,
-                    EveIndustryActivitySkill,
-                )
+        self._update_or_create_api_objects(objs, effective_sections)
 
-                EveIndustryActivityDuration.objects.update_or_create_api(eve_type=obj)  # type: ignore
-                EveIndustryActivityProduct.objects.update_or_create_api(eve_type=obj)  # type: ignore
-                EveIndustryActivitySkill.objects.update_or_create_api(eve_type=obj)  # type: ignore
-                EveIndustryActivityMaterial.objects.update_or_create_api(eve_type=obj)  # type: ignore
-        return obj, created
+    def _update_or_create_api_objects(
+        self, objs: List[Any], effective_sections: Set[str]
+    ) -> None:
+        """Update or create objects from the SDE API for enabled sections."""
+        if not effective_sections:
+            return
+
+        if self.model.Section.TYPE_MATERIALS in effective_sections:
+            from eveuniverse.models import EveTypeMaterial
+
+            EveTypeMaterial.objects.bulk_update_or_create_api(eve_types=objs)  # type: ignore
+        if self.model.Section.INDUSTRY_ACTIVITIES in effective_sections:
+            from eveuniverse.models import (
+                EveIndustryActivityDuration,
+                EveIndustryActivityMaterial,
+                EveIndustryActivityProduct,
+                EveIndustryActivitySkill,
+            )
+
+            EveIndustryActivityDuration.objects.bulk_update_or_create_api(eve_types=objs)  # type: ignore
+            EveIndustryActivityProduct.objects.bulk_update_or_create_api(eve_types=objs)  # type: ignore
+            EveIndustryActivitySkill.objects.bulk_update_or_create_api(eve_types=objs)  # type: ignore
+            EveIndustryActivityMaterial.objects.bulk_update_or_create_api(eve_types=objs)  # type: ignore
 
 
 class EveMarketPriceManager(models.Manager):
@@ -506,12 +1399,17 @@ class EveMarketPriceManager(models.Manager):
         """Updates market prices from ESI. Will only create new price objects
         for EveTypes that already exist in the database.
 
+        Only prices which have changed are written to the database.
+        The update time of stale prices which have not changed is refreshed,
+        so the update time of a price object is the time
+        it was last updated from ESI.
+
         Args:
             minutes_until_stale: only prices older then given minutes are regarding
             as stale and will be updated. Will use default (60) if not specified.
 
         Returns:
-            Count of updated types
+            Count of types with new or changed prices
         """
         from eveuniverse.models import EveType
 
@@ -530,34 +1428,183 @@ class EveMarketPriceManager(models.Manager):
         with transaction.atomic():
             existing_types_ids = set(EveType.objects.values_list("id", flat=True))
             relevant_prices_ids = set(entries_2.keys()).intersection(existing_types_ids)
-            deadline = now() - dt.timedelta(minutes=minutes_until_stale)
-            current_prices_ids = set(
-                self.filter(updated_at__gt=deadline).values_list(
-                    "eve_type_id", flat=True
-                )
+            current_prices, current_prices_ids = self._current_prices(
+                deadline=now() - dt.timedelta(minutes=minutes_until_stale)
             )
             need_updating_ids = relevant_prices_ids.difference(current_prices_ids)
-            if not need_updating_ids:
+            market_prices = []
+            unchanged_ids = []
+            for type_id in need_updating_ids:
+                entry = entries_2[type_id]
+                prices = (entry.get("adjusted_price"), entry.get("average_price"))
+                if current_prices.get(type_id) == prices:
+                    unchanged_ids.append(type_id)
+                else:
+                    market_prices.append(
+                        self.model(
+                            eve_type_id=type_id,
+                            adjusted_price=prices[0],
+                            average_price=prices[1],
+                        )
+                    )
+
+            if unchanged_ids:
+                self.filter(eve_type_id__in=unchanged_ids).update(updated_at=now())
+
+            if not market_prices:
                 logger.info("Market prices are up to date")
                 return 0
 
-            logger.info(
-                "Updating market prices for %s types...", len(need_updating_ids)
-            )
-            self.filter(eve_type_id__in=need_updating_ids).delete()
-            market_prices = [
-                self.model(
-                    eve_type=get_or_create_esi_or_none("type_id", entry, EveType),
-                    adjusted_price=entry.get("adjusted_price"),
-                    average_price=entry.get("average_price"),
-                )
-                for type_id, entry in entries_2.items()
-                if type_id in need_updating_ids
-            ]
-            self.bulk_create(
-                market_prices, batch_size=EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+            logger.info("Updating market prices for %s types...", len(market_prices))
+            bulk_upsert(
+                self,
+                market_prices,
+                unique_fields=["eve_type"],
+                update_fields=["adjusted_price", "average_price", "updated_at"],
             )
             logger.info(
-                "Completed updating market prices for %s types.", len(need_updating_ids)
+                "Completed updating market prices for %s types.", len(market_prices)
             )
             return len(market_prices)
+
+    def _current_prices(
+        self, deadline: dt.datetime
+    ) -> Tuple[Dict[int, Tuple[Optional[float], Optional[float]]], Set[int]]:
+        """Return the current prices by type ID
+        and the IDs of types with prices updated after the deadline.
+        """
+        current_prices = {}
+        current_prices_ids = set()
+        for type_id, adjusted_price, average_price, updated_at in self.values_list(
+            "eve_type_id", "adjusted_price", "average_price", "updated_at"
+        ):
+            current_prices[type_id] = (adjusted_price, average_price)
+            if updated_at > deadline:
+                current_prices_ids.add(type_id)
+
+        return current_prices, current_prices_ids
+
+
+class EveMarketPriceHistoryManager(models.Manager):
+    """Custom manager for EveMarketPriceHistory."""
+
+    _price_fields = {
+        "adjusted_price": "adjusted_prices",
+        "average_price": "average_prices",
+    }
+
+    def create_from_market_prices(self) -> Any:
+        """Create a snapshot of all current market prices.
+
+        Returns:
+            Created snapshot
+        """
+        from eveuniverse.models import EveMarketPrice
+
+        type_ids = array("q")
+        adjusted_prices = array("d")
+        average_prices = array("d")
+        for type_id, adjusted_price, average_price in EveMarketPrice.objects.order_by(
+            "eve_type_id"
+        ).values_list("eve_type_id", "adjusted_price", "average_price"):
+            type_ids.append(type_id)
+            adjusted_prices.append(
+                adjusted_price if adjusted_price is not None else math.nan
+            )
+            average_prices.append(
+                average_price if average_price is not None else math.nan
+            )
+
+        return self.create(
+            created_at=now(),
+            type_ids=pack_array(type_ids),
+            adjusted_prices=pack_array(adjusted_prices),
+            average_prices=pack_array(average_prices),
+        )
+
+    def price_series(
+        self,
+        type_ids: Iterable[int],
+        price_field: str = "average_price",
+        since: Optional[dt.datetime] = None,
+    ) -> Tuple[List[dt.datetime], Dict[int, array]]:
+        """Return the price history for many types at once.
+
+        Args:
+            type_ids: IDs of types to return prices for
+            price_field: Price to return, either "average_price" or "adjusted_price"
+            since: Only return prices from snapshots created since this time
+
+        Raises:
+            ValueError: if the price field is not valid
+
+        Returns:
+            Creation times of all snapshots in ascending order
+            and for each type an array of prices with one price per snapshot.
+            Missing prices are NaN.
+        """
+        try:
+            price_column = self._price_fields[price_field]
+        except KeyError:
+            raise ValueError(f"Invalid price field: {price_field}") from None
+
+        type_ids = sorted(set(type_ids))
+        qs = self.order_by("created_at")
+        if since:
+            qs = qs.filter(created_at__gte=since)
+
+        timestamps = []
+        series = {type_id: array("d") for type_id in type_ids}
+        for created_at, packed_type_ids, packed_prices in qs.values_list(
+            "created_at", "type_ids", price_column
+        ).iterator():
+            snapshot_type_ids = unpack_array("q", packed_type_ids)
+            prices = unpack_array("d", packed_prices)
+            timestamps.append(created_at)
+            for type_id in type_ids:
+                pos = bisect_left(snapshot_type_ids, type_id)
+                if pos < len(snapshot_type_ids) and snapshot_type_ids[pos] == type_id:
+                    series[type_id].append(prices[pos])
+                else:
+                    series[type_id].append(math.nan)
+
+        return timestamps, series
+
+    def purge(self) -> int:
+        """Delete snapshots which are older then the retention period
+        and keep only the last snapshot of each day
+        for days older then the full resolution period.
+
+        Returns:
+            Count of deleted snapshots
+        """
+        current_time = now()
+        deleted_count, _ = self.filter(
+            created_at__lt=current_time
+            - dt.timedelta(days=EVEUNIVERSE_MARKET_PRICE_HISTORY_DAYS)
+        ).delete()
+
+        last_ids_by_day = {}
+        obsolete_ids = []
+        for pk, created_at in (
+            self.filter(
+                created_at__lt=current_time
+                - dt.timedelta(
+                    days=EVEUNIVERSE_MARKET_PRICE_HISTORY_FULL_RESOLUTION_DAYS
+                )
+            )
+            .order_by("created_at")
+            .values_list("pk", "created_at")
+        ):
+            day = created_at.date()
+            if day in last_ids_by_day:
+                obsolete_ids.append(last_ids_by_day[day])
+            last_ids_by_day[day] = pk
+
+        for ids in chunks(obsolete_ids, EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+            count, _ = self.filter(pk__in=ids).delete()
+            deleted_count += count
+
+        if deleted_count:
+            logger.info("Deleted %d market price snapshots", deleted_count)
+        return deleted_count
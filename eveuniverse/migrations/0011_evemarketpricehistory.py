@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eveuniverse", "0010_alter_eveindustryactivityduration_eve_type_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EveMarketPriceHistory",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(db_index=True)),
+                ("type_ids", models.BinaryField()),
+                ("adjusted_prices", models.BinaryField()),
+                ("average_prices", models.BinaryField()),
+            ],
+        ),
+    ]
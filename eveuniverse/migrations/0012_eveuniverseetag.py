@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eveuniverse", "0011_evemarketpricehistory"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EveUniverseEtag",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=50)),
+                ("object_id", models.PositiveIntegerField()),
+                ("etag", models.CharField(default="", max_length=100)),
+                ("expires", models.DateTimeField(default=None, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="eveuniverseetag",
+            constraint=models.UniqueConstraint(
+                fields=("model_name", "object_id"), name="fpk_eveuniverseetag"
+            ),
+        ),
+    ]
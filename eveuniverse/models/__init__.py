@@ -2,6 +2,7 @@
 
 from .base import EveUniverseEntityModel
 from .entities import EveEntity
+from .esi import EveUniverseEtag
 from .sde import (
     EveIndustryActivity,
     EveIndustryActivityDuration,
@@ -22,6 +23,7 @@ from .universe_1 import (
     EveGroup,
     EveMarketGroup,
     EveMarketPrice,
+    EveMarketPriceHistory,
     EveRace,
     EveType,
     EveTypeDogmaAttribute,
@@ -61,6 +63,7 @@ __all__ = [
     "EveIndustryActivitySkill",
     "EveMarketGroup",
     "EveMarketPrice",
+    "EveMarketPriceHistory",
     "EveMoon",
     "EvePlanet",
     "EveRace",
@@ -77,4 +80,5 @@ __all__ = [
     "EveTypeMaterial",
     "EveUnit",
     "EveUniverseEntityModel",
+    "EveUniverseEtag",
 ]
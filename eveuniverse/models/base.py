@@ -1,10 +1,22 @@
 """Base models for Eve Universe."""
 
 import enum
-from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from django.apps import apps
-from django.db import models
+from django.db import models, transaction
 
 from eveuniverse.app_settings import (
     EVEUNIVERSE_LOAD_ASTEROID_BELTS,
@@ -19,6 +31,7 @@ from eveuniverse.app_settings import (
     EVEUNIVERSE_LOAD_STATIONS,
     EVEUNIVERSE_LOAD_TYPE_MATERIALS,
 )
+from eveuniverse.helpers import bulk_upsert
 from eveuniverse.managers.universe import EveUniverseEntityModelManager
 
 _NAMES_MAX_LENGTH = 100
@@ -139,12 +152,24 @@ class EveUniverseBaseModel(models.Model):
     def _esi_field_mappings(
         cls, enabled_sections: Optional[Set[str]] = None
     ) -> Dict[str, _EsiFieldMapping]:
-        """Return ESI field mappings for this model."""
+        """Return ESI field mappings for this model.
+
+        Mappings are only computed once for each model and set of effective sections.
+        The returned dict is shared and must not be modified.
+        """
+        effective_sections = frozenset(determine_effective_sections(enabled_sections))
+        return cls._esi_field_mappings_for_sections(effective_sections)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _esi_field_mappings_for_sections(
+        cls, effective_sections: FrozenSet[str]
+    ) -> Dict[str, _EsiFieldMapping]:
         explicit_field_mappings = cls._eve_universe_meta_attr("field_mappings")
         functional_pk = cls._eve_universe_meta_attr("functional_pk")
         parent_fk = cls._eve_universe_meta_attr("parent_fk")
         dont_create_related = cls._eve_universe_meta_attr("dont_create_related")
-        disabled_fields = cls._disabled_fields(enabled_sections)
+        disabled_fields = cls._disabled_fields(set(effective_sections))
 
         field_mappings: Dict[str, _EsiFieldMapping] = {}
         relevant_fields = [
@@ -234,67 +259,125 @@ class EveUniverseBaseModel(models.Model):
         """Return defaults from an esi data object
         for update/creating objects of this model.
         """
-        defaults: Dict[str, Any] = {}
-        for field_name, field_mapping in cls._esi_field_mappings(
-            enabled_sections
-        ).items():
-            if field_mapping.is_pk:
-                continue
+        return cls._defaults_from_esi_objs([eve_data_obj], enabled_sections)[0]
 
-            if not isinstance(field_mapping.esi_name, tuple):
-                esi_value = cls._esi_value_from_tuple(eve_data_obj, field_mapping)
-            else:
-                esi_value = cls._esi_value_from_non_tuple(eve_data_obj, field_mapping)
+    @classmethod
+    def _defaults_from_esi_objs(
+        cls, eve_data_objs: List[dict], enabled_sections: Optional[Set[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Return defaults from many esi data objects
+        for update/creating objects of this model.
 
-            if esi_value is not None:
+        Foreign keys are resolved for all objects at once
+        and returned as IDs, e.g. ``eve_group_id``.
+        """
+        getters = cls._esi_value_getters(
+            frozenset(determine_effective_sections(enabled_sections))
+        )
+        rows = [
+            [
+                (field_name, field_mapping, getter(obj))
+                for field_name, field_mapping, getter in getters
+            ]
+            for obj in eve_data_objs
+        ]
+        fk_ids_existing = cls._gather_ids_from_fk_rows(rows)
+        defaults_list = []
+        for row in rows:
+            defaults: Dict[str, Any] = {}
+            for field_name, field_mapping, esi_value in row:
+                if esi_value is None:
+                    continue
                 if field_mapping.is_fk:
-                    value = cls._gather_value_from_fk(field_mapping, esi_value)
-
+                    existing_ids = fk_ids_existing[field_mapping.related_model]
+                    defaults[f"{field_name}_id"] = (
+                        esi_value if esi_value in existing_ids else None
+                    )
                 else:
-                    if field_mapping.is_charfield and esi_value is None:
-                        value = ""
-                    else:
-                        value = esi_value
+                    defaults[field_name] = esi_value
+            defaults_list.append(defaults)
 
-                defaults[field_name] = value
+        return defaults_list
 
-        return defaults
+    @classmethod
+    def _gather_ids_from_fk_rows(
+        cls, rows: List[List[Tuple[str, _EsiFieldMapping, Any]]]
+    ) -> Dict[Any, Set[int]]:
+        """Return existing IDs of related objects by related model
+        for all foreign keys in the rows. Missing related objects are created
+        when the mapping requires it.
+        """
+        fk_ids_wanted: Dict[Any, Set[int]] = {}
+        fk_ids_to_create: Dict[Any, Set[int]] = {}
+        for row in rows:
+            for _, field_mapping, esi_value in row:
+                if field_mapping.is_fk and esi_value is not None:
+                    related_model = field_mapping.related_model
+                    fk_ids_wanted.setdefault(related_model, set()).add(esi_value)
+                    if field_mapping.create_related:
+                        fk_ids_to_create.setdefault(related_model, set()).add(esi_value)
+
+        return {
+            related_model: cls._gather_ids_from_fk(
+                related_model, ids, fk_ids_to_create.get(related_model, set())
+            )
+            for related_model, ids in fk_ids_wanted.items()
+        }
 
-    @staticmethod
-    def _esi_value_from_tuple(
-        eve_data_obj: dict, field_mapping: _EsiFieldMapping
-    ) -> Optional[Any]:
-        if field_mapping.esi_name in eve_data_obj:
-            return eve_data_obj[field_mapping.esi_name]
-        return None
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _esi_value_getters(
+        cls, effective_sections: FrozenSet[str]
+    ) -> Tuple[Tuple[str, _EsiFieldMapping, Callable[[dict], Any]], ...]:
+        """Return field name, mapping and a getter for the ESI value
+        of each non-pk field of this model.
+        """
+        return tuple(
+            (field_name, field_mapping, cls._esi_value_getter(field_mapping.esi_name))
+            for field_name, field_mapping in cls._esi_field_mappings_for_sections(
+                effective_sections
+            ).items()
+            if not field_mapping.is_pk
+        )
 
     @staticmethod
-    def _esi_value_from_non_tuple(
-        eve_data_obj: dict, field_mapping: _EsiFieldMapping
-    ) -> Optional[Any]:
-        if (
-            field_mapping.esi_name[0] in eve_data_obj
-            and field_mapping.esi_name[1] in eve_data_obj[field_mapping.esi_name[0]]
-        ):
-            return eve_data_obj[field_mapping.esi_name[0]][field_mapping.esi_name[1]]
+    def _esi_value_getter(esi_name) -> Callable[[dict], Any]:
+        """Return a function, which fetches a value from an ESI data object."""
+        if not isinstance(esi_name, tuple):
+            return lambda eve_data_obj: eve_data_obj.get(esi_name)
+
+        outer_name, inner_name = esi_name
+
+        def getter(eve_data_obj: dict) -> Any:
+            inner_obj = eve_data_obj.get(outer_name)
+            return inner_obj.get(inner_name) if inner_obj else None
 
-        return None
+        return getter
 
     @staticmethod
-    def _gather_value_from_fk(field_mapping, esi_value):
-        parent_class = field_mapping.related_model
-        try:
-            value = parent_class.objects.get(id=esi_value)
-        except parent_class.DoesNotExist:
-            value = None
-            if field_mapping.create_related:
-                try:
-                    value = parent_class.objects.update_or_create_esi(
-                        id=esi_value, include_children=False, wait_for_children=True
-                    )[0]
-                except AttributeError:
-                    pass
-        return value
+    def _gather_ids_from_fk(
+        related_model, ids: Set[int], ids_to_create: Set[int]
+    ) -> Set[int]:
+        """Return IDs of related objects which exist,
+        after fetching missing objects from ESI if requested.
+        """
+        if hasattr(related_model.objects, "all_cached"):
+            existing_ids = ids & related_model.objects.all_cached().keys()
+        else:
+            existing_ids = set()
+        if ids - existing_ids:
+            existing_ids |= set(
+                related_model.objects.filter(id__in=ids - existing_ids).values_list(
+                    "id", flat=True
+                )
+            )
+        missing_ids = ids_to_create - existing_ids
+        if missing_ids and hasattr(related_model.objects, "bulk_get_or_create_esi"):
+            created_objs = related_model.objects.bulk_get_or_create_esi(
+                ids=missing_ids, include_children=False, wait_for_children=True
+            )
+            existing_ids |= set(created_objs.values_list("id", flat=True))
+        return existing_ids
 
 
 class EveUniverseEntityModel(EveUniverseBaseModel):
@@ -380,9 +463,7 @@ class EveUniverseEntityModel(EveUniverseBaseModel):
 
         for key, child_class in cls._children(enabled_sections).items():
             if key in parent_eve_data_obj and parent_eve_data_obj[key]:
-                for obj in parent_eve_data_obj[key]:
-                    # TODO: Refactor this hack
-                    id = obj["planet_id"] if key == "planets" else obj
+                for id in cls._child_ids(parent_eve_data_obj, key):
                     if wait_for_children:
                         child_model_class = cls.get_model_class(child_class)
                         child_model_class.objects.update_or_create_esi(  # type: ignore
@@ -408,71 +489,211 @@ class EveUniverseEntityModel(EveUniverseBaseModel):
                             params["priority"] = task_priority
                         task_update_or_create_eve_object.apply_async(**params)  # type: ignore
 
+    @staticmethod
+    def _child_ids(parent_eve_data_obj: dict, key: str) -> List[int]:
+        """Return IDs of the children for a key in the ESI data of a parent."""
+        # TODO: Refactor this hack
+        return [
+            obj["planet_id"] if key == "planets" else obj
+            for obj in parent_eve_data_obj.get(key) or []
+        ]
+
     @classmethod
     def _update_or_create_inline_objects(
         cls,
         *,
-        parent_eve_data_obj: dict,
-        parent_obj,
+        parent_objs: List[Any],
+        parent_eve_data_objs: Dict[int, dict],
         wait_for_children: bool,
         enabled_sections: Set[str],
         task_priority: Optional[int] = None,
     ) -> None:
         """Updates or create eve objects that are returned "inline" from ESI
-        for the parent eve objects as defined for this parent model (if any).
+        for many parent eve objects as defined for this parent model (if any).
+
+        The inline objects of all parents are written together.
+
+        Args:
+            parent_objs: Parent objects
+            parent_eve_data_objs: Mapping of parent IDs to their ESI data
         """
         from eveuniverse.tasks import (
-            update_or_create_inline_object as task_update_or_create_inline_object,
+            update_or_create_inline_objects as task_update_or_create_inline_objects,
         )
 
         inline_objects = cls._inline_objects(enabled_sections)
-        if not inline_objects:
+        if not inline_objects or not parent_objs:
             return
 
-        if not parent_eve_data_obj or not parent_obj:
-            raise ValueError(
-                f"{cls.__name__}: Tried to create inline object "
-                "from empty parent object"
+        inline_eve_data = {}
+        for parent_obj in parent_objs:
+            parent_eve_data_obj = parent_eve_data_objs.get(parent_obj.id)
+            if not parent_eve_data_obj:
+                raise ValueError(
+                    f"{cls.__name__}: Tried to create inline object "
+                    "from empty parent object"
+                )
+            inline_eve_data[parent_obj.id] = {
+                inline_field: parent_eve_data_obj.get(inline_field) or []
+                for inline_field in inline_objects
+            }
+
+        if wait_for_children:
+            cls._update_or_create_inline_objects_for_parents(
+                parent_objs=inline_eve_data, enabled_sections=enabled_sections
             )
+            return
+
+        params: Dict[str, Any] = {
+            "kwargs": {
+                "parent_model_name": cls.__name__,
+                "parent_objs": [list(item) for item in inline_eve_data.items()],
+                "enabled_sections": list(enabled_sections),
+            }
+        }
+        if task_priority:
+            params["priority"] = task_priority
+        task_update_or_create_inline_objects.apply_async(**params)  # type: ignore
 
-        for inline_field, inline_model_name in inline_objects.items():
-            if (
-                inline_field not in parent_eve_data_obj
-                or not parent_eve_data_obj[inline_field]
+    @classmethod
+    def _update_or_create_inline_objects_for_parents(
+        cls, *, parent_objs: Dict[int, dict], enabled_sections: Set[str]
+    ) -> None:
+        """Update or create all inline objects for many parent objects in bulk.
+
+        Args:
+            parent_objs: Mapping of parent IDs to their ESI data
+        """
+        for inline_field, inline_model_name in cls._inline_objects(
+            enabled_sections
+        ).items():
+            cls._bulk_update_or_create_inline_objects(
+                parent_objs=parent_objs,
+                inline_field=inline_field,
+                inline_model_name=inline_model_name,
+                enabled_sections=enabled_sections,
+            )
+
+    @classmethod
+    def _bulk_update_or_create_inline_objects(
+        cls,
+        *,
+        parent_objs: Dict[int, dict],
+        inline_field: str,
+        inline_model_name: str,
+        enabled_sections: Set[str],
+    ) -> None:
+        """Update or create inline objects for many parent objects in bulk
+        and delete inline objects which no longer exist for those parents.
+
+        Args:
+            parent_objs: Mapping of parent IDs to their ESI data
+        """
+        if not parent_objs:
+            return
+
+        parent_fk, parent2_model_name, other_pk_info = cls._identify_parent(
+            inline_model_name
+        )
+        rows = [
+            (parent_id, eve_data_obj)
+            for parent_id, parent_eve_data_obj in parent_objs.items()
+            for eve_data_obj in parent_eve_data_obj.get(inline_field) or []
+        ]
+        inline_model_class = cls.get_model_class(inline_model_name)
+        defaults_list = inline_model_class._defaults_from_esi_objs(
+            [eve_data_obj for _, eve_data_obj in rows], enabled_sections
+        )
+        objs, other_key = cls._new_inline_objs(
+            inline_model_class=inline_model_class,
+            rows=rows,
+            defaults_list=defaults_list,
+            parent_fk=parent_fk,
+            other_pk_info=other_pk_info,
+            parent2_model_name=parent2_model_name,
+        )
+        update_fields = sorted(
+            {field_name for defaults in defaults_list for field_name in defaults}
+        )
+        with transaction.atomic():
+            inline_model_class.objects.filter(
+                cls._stale_inline_objects_filter(
+                    parent_objs.keys(), objs.keys(), parent_fk, other_key
+                )
+            ).delete()
+            bulk_upsert(
+                inline_model_class.objects,
+                objs.values(),
+                unique_fields=[parent_fk, other_pk_info["name"]],
+                update_fields=update_fields,
+            )
+
+    @classmethod
+    def _new_inline_objs(
+        cls,
+        *,
+        inline_model_class,
+        rows: List[Tuple[int, dict]],
+        defaults_list: List[Dict[str, Any]],
+        parent_fk: str,
+        other_pk_info: dict,
+        parent2_model_name: str,
+    ) -> Tuple[Dict[Tuple[int, Any], Any], str]:
+        """Create unsaved inline objects from pairs of parent ID and ESI data.
+
+        Rows without a valid other value are skipped.
+
+        Returns:
+            Inline objects by parent ID and other value and the key of other values
+        """
+        other_values = [
+            eve_data_obj.get(other_pk_info["esi_name"]) for _, eve_data_obj in rows
+        ]
+        if other_pk_info["is_fk"]:
+            other_key = f"{other_pk_info['name']}_id"
+            other_ids = {value for value in other_values if value is not None}
+            existing_ids = cls._gather_ids_from_fk(
+                cls.get_model_class(parent2_model_name), other_ids, other_ids
+            )
+        else:
+            other_key = other_pk_info["name"]
+            existing_ids = None
+
+        objs = {}
+        for row, other_value, defaults in zip(rows, other_values, defaults_list):
+            if other_value is None or (
+                existing_ids is not None and other_value not in existing_ids
             ):
                 continue
+            objs[(row[0], other_value)] = inline_model_class(
+                **{f"{parent_fk}_id": row[0], other_key: other_value, **defaults}
+            )
+
+        return objs, other_key
+
+    @staticmethod
+    def _stale_inline_objects_filter(
+        parent_ids: Iterable[int],
+        keys: Iterable[Tuple[int, Any]],
+        parent_fk: str,
+        other_key: str,
+    ) -> models.Q:
+        """Return filter for inline objects of the parents,
+        which are not in the given pairs of parent ID and other value.
+        """
+        other_values_by_parent: Dict[int, Set[Any]] = {
+            parent_id: set() for parent_id in parent_ids
+        }
+        for parent_id, other_value in keys:
+            other_values_by_parent[parent_id].add(other_value)
 
-            parent_fk, parent2_model_name, other_pk_info = cls._identify_parent(
-                inline_model_name
+        stale_filter = models.Q()
+        for parent_id, values in other_values_by_parent.items():
+            stale_filter |= models.Q(**{f"{parent_fk}_id": parent_id}) & ~models.Q(
+                **{f"{other_key}__in": values}
             )
 
-            for eve_data_obj in parent_eve_data_obj[inline_field]:
-                if wait_for_children:
-                    cls._update_or_create_inline_object(
-                        parent_obj_id=parent_obj.id,
-                        parent_fk=parent_fk,
-                        eve_data_obj=eve_data_obj,
-                        other_pk_info=other_pk_info,
-                        parent2_model_name=parent2_model_name,
-                        inline_model_name=inline_model_name,
-                        enabled_sections=enabled_sections,
-                    )
-                else:
-                    params: Dict[str, Any] = {
-                        "kwargs": {
-                            "parent_obj_id": parent_obj.id,
-                            "parent_fk": parent_fk,
-                            "eve_data_obj": eve_data_obj,
-                            "other_pk_info": other_pk_info,
-                            "parent2_model_name": parent2_model_name,
-                            "inline_model_name": inline_model_name,
-                            "parent_model_name": type(parent_obj).__name__,
-                            "enabled_sections": list(enabled_sections),
-                        }
-                    }
-                    if task_priority:
-                        params["priority"] = task_priority
-                    task_update_or_create_inline_object.apply_async(**params)  # type: ignore
+        return stale_filter
 
     @classmethod
     def _identify_parent(cls, inline_model_name: str) -> tuple:
@@ -553,6 +774,10 @@ class EveUniverseEntityModel(EveUniverseBaseModel):
     def _has_esi_path_list(cls) -> bool:
         return bool(cls._eve_universe_meta_attr("esi_path_list"))
 
+    @classmethod
+    def _has_esi_path_object(cls) -> bool:
+        return bool(cls._eve_universe_meta_attr("esi_path_object"))
+
     @classmethod
     def _esi_path_list(cls) -> Tuple[str, str]:
         return cls._esi_path("list")
@@ -0,0 +1,33 @@
+"""ESI related models for Eve Universe."""
+
+from django.db import models
+
+
+class EveUniverseEtag(models.Model):
+    """ETag and expiry time of the last ESI response for an Eve Universe object.
+
+    Used for conditional requests to ESI when updating objects.
+    """
+
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    etag = models.CharField(max_length=100, default="")
+    expires = models.DateTimeField(default=None, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model_name", "object_id"], name="fpk_eveuniverseetag"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.model_name}-{self.object_id}"
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}("
+            f"model_name='{self.model_name}', object_id={self.object_id}, "
+            f"etag='{self.etag}', expires={self.expires}"
+            ")"
+        )
@@ -4,6 +4,7 @@ from django.db import models
 
 from eveuniverse.managers import (
     EveIndustryActivityDurationManager,
+    EveIndustryActivityManager,
     EveIndustryActivityMaterialManager,
     EveIndustryActivityProductManager,
     EveIndustryActivitySkillManager,
@@ -21,6 +22,8 @@ class EveIndustryActivity(EveUniverseInlineModel):
     description = models.CharField(max_length=100)
     name = models.CharField(max_length=30)
 
+    objects = EveIndustryActivityManager()
+
     class _EveUniverseMeta:
         load_order = 101
 
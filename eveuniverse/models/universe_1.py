@@ -12,7 +12,12 @@ from django.db import models
 from eveuniverse.app_settings import EVEUNIVERSE_USE_EVESKINSERVER
 from eveuniverse.constants import EveCategoryId
 from eveuniverse.core import dotlan, eveimageserver, eveitems, eveskinserver
-from eveuniverse.managers import EveMarketPriceManager, EveTypeManager
+from eveuniverse.managers import (
+    EveMarketPriceHistoryManager,
+    EveMarketPriceManager,
+    EveTypeManager,
+    EveUnitManager,
+)
 
 from .base import (
     _NAMES_MAX_LENGTH,
@@ -247,7 +252,7 @@ class EveUnit(EveUniverseEntityModel):
     display_name = models.CharField(max_length=50, default="")
     description = models.TextField(default="")
 
-    objects = models.Manager()
+    objects = EveUnitManager()
 
     class _EveUniverseMeta:
         esi_pk = "unit_id"
@@ -390,6 +395,27 @@ class EveMarketPrice(models.Model):
         )
 
 
+class EveMarketPriceHistory(models.Model):
+    """A snapshot of all market prices at one point in time.
+
+    Prices are stored as packed arrays of 64-bit values in little endian byte order,
+    which are sorted by type ID. Missing prices are stored as NaN.
+    """
+
+    created_at = models.DateTimeField(db_index=True)
+    type_ids = models.BinaryField()
+    adjusted_prices = models.BinaryField()
+    average_prices = models.BinaryField()
+
+    objects = EveMarketPriceHistoryManager()
+
+    def __str__(self) -> str:
+        return f"{self.created_at}"
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(pk={self.pk}, created_at={self.created_at})"
+
+
 class EveRace(EveUniverseEntityModel):
     """A race in Eve Online"""
 
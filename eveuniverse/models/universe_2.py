@@ -5,7 +5,7 @@
 import math
 import re
 from collections import namedtuple
-from typing import Iterable, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from bitfield import BitField
 from django.db import models
@@ -13,10 +13,13 @@ from django.utils.functional import cached_property
 
 from eveuniverse.constants import EveGroupId, EveRegionId
 from eveuniverse.core import dotlan, evesdeapi
+from eveuniverse.core.routes import IncompleteMapError, RouteFlag
+from eveuniverse.helpers import is_high_sec
 from eveuniverse.managers import (
     EveAsteroidBeltManager,
     EveMoonManager,
     EvePlanetManager,
+    EveSolarSystemManager,
     EveStargateManager,
 )
 from eveuniverse.providers import esi
@@ -245,6 +248,8 @@ class EveSolarSystem(EveUniverseEntityModel):
         ),  # no index, because MySQL does not support it for bitwise operations
     )  # type: ignore
 
+    objects = EveSolarSystemManager()
+
     class _EveUniverseMeta:
         esi_pk = "system_id"
         esi_path_list = "Universe.get_universe_systems"
@@ -274,7 +279,7 @@ class EveSolarSystem(EveUniverseEntityModel):
     @property
     def is_high_sec(self) -> bool:
         """Return True when this solar system is in high sec, else False."""
-        return round(self.security_status, 1) >= 0.5
+        return is_high_sec(self.security_status)
 
     @property
     def is_low_sec(self) -> bool:
@@ -346,12 +351,17 @@ class EveSolarSystem(EveUniverseEntityModel):
         )
 
     def route_to(
-        self, destination: "EveSolarSystem"
+        self,
+        destination: "EveSolarSystem",
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
     ) -> Optional[List["EveSolarSystem"]]:
         """Calculates the shortest route between the current and the given solar system
 
         Args:
             destination: Other solar system to use in calculation
+            flag: route preference, one of "shortest", "secure" or "insecure"
+            avoid: IDs of solar systems the route must not pass through
 
         Returns:
             List of solar system objects incl. origin and destination
@@ -365,20 +375,33 @@ class EveSolarSystem(EveUniverseEntityModel):
         ):
             return None
 
-        path_ids = self._calc_route_esi(self.id, destination.id)
+        path_ids = self._calc_route(destination.id, flag=flag, avoid=avoid)
         if path_ids is None:
             return None
 
+        existing_ids = set(
+            EveSolarSystem.objects.filter(id__in=path_ids).values_list("id", flat=True)
+        )
+        solar_systems = EveSolarSystem.objects.bulk_get_or_create_esi(  # type: ignore
+            ids=path_ids
+        ).in_bulk()
         return [
-            EveSolarSystem.objects.get_or_create_esi(id=solar_system_id)  # type: ignore
+            (solar_systems[solar_system_id], solar_system_id not in existing_ids)
             for solar_system_id in path_ids
         ]
 
-    def jumps_to(self, destination: "EveSolarSystem") -> Optional[int]:
+    def jumps_to(
+        self,
+        destination: "EveSolarSystem",
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
+    ) -> Optional[int]:
         """Calculates the shortest route between the current and the given solar system
 
         Args:
             destination: Other solar system to use in calculation
+            flag: route preference, one of "shortest", "secure" or "insecure"
+            avoid: IDs of solar systems the route must not pass through
 
         Returns:
             Number of total jumps
@@ -392,26 +415,52 @@ class EveSolarSystem(EveUniverseEntityModel):
         ):
             return None
 
-        path_ids = self._calc_route_esi(self.id, destination.id)
+        path_ids = self._calc_route(destination.id, flag=flag, avoid=avoid)
         return len(path_ids) - 1 if path_ids is not None else None
 
+    def _calc_route(
+        self,
+        destination_id: int,
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
+    ) -> Optional[List[int]]:
+        """returns the shortest route from this to the given solar system.
+
+        Route is calculated from the local stargate graph
+        and only fetched from ESI when the local map is incomplete.
+        """
+        graph = EveSolarSystem.objects.stargate_graph()  # type: ignore
+        try:
+            return graph.route(self.id, destination_id, flag=flag, avoid=avoid)
+        except IncompleteMapError:
+            return self._calc_route_esi(self.id, destination_id, flag=flag, avoid=avoid)
+
     @staticmethod
-    def _calc_route_esi(origin_id: int, destination_id: int) -> Optional[List[int]]:
+    def _calc_route_esi(
+        origin_id: int,
+        destination_id: int,
+        flag: str = RouteFlag.SHORTEST,
+        avoid: Optional[Iterable[int]] = None,
+    ) -> Optional[List[int]]:
         """returns the shortest route between two given solar systems.
 
         Route is calculated by ESI
 
         Args:
             destination_id: ID of the other solar system to use in calculation
+            flag: route preference, one of "shortest", "secure" or "insecure"
+            avoid: IDs of solar systems the route must not pass through
 
         Returns:
             List of solar system IDs incl. origin and destination
             or None if no route can be found (e.g. if one system is in WH space)
         """
-
+        params = {"flag": str(RouteFlag(flag))}
+        if avoid:
+            params["avoid"] = list(avoid)
         try:
             return esi.client.Routes.get_route_origin_destination(
-                origin=origin_id, destination=destination_id
+                origin=origin_id, destination=destination_id, **params
             ).results()
         except OSError:  # FIXME: ESI is supposed to return 404,
             # but django-esi is actually returning an OSError
@@ -610,22 +659,39 @@ class EveStation(EveUniverseEntityModel):
     def _update_or_create_inline_objects(
         cls,
         *,
-        parent_eve_data_obj: dict,
-        parent_obj,
+        parent_objs: List[Any],
+        parent_eve_data_objs: Dict[int, dict],
         wait_for_children: bool,
         enabled_sections: Iterable[str],
         task_priority: Optional[int] = None,
     ) -> None:
         """updates_or_creates station service objects for EveStations"""
 
-        if "services" in parent_eve_data_obj:
-            services = []
-            for service_name in parent_eve_data_obj["services"]:
-                service, _ = EveStationService.objects.get_or_create(name=service_name)
-                services.append(service)
-
-            if services:
-                parent_obj.services.add(*services)
+        service_names_by_station = {
+            obj.id: set(parent_eve_data_objs.get(obj.id, {}).get("services") or [])
+            for obj in parent_objs
+        }
+        service_names = set().union(*service_names_by_station.values())
+        if not service_names:
+            return
+
+        services = EveStationService.objects.filter(name__in=service_names)
+        missing_names = service_names - {service.name for service in services}
+        if missing_names:
+            EveStationService.objects.bulk_create(
+                [EveStationService(name=name) for name in missing_names],
+                ignore_conflicts=True,
+            )
+            services = EveStationService.objects.filter(name__in=service_names)
+
+        for parent_obj in parent_objs:
+            parent_obj.services.add(
+                *[
+                    service
+                    for service in services
+                    if service.name in service_names_by_station[parent_obj.id]
+                ]
+            )
 
 
 class EveStationService(models.Model):
@@ -1,16 +1,30 @@
 """Tasks for Eve Universe."""
 
 import logging
-from typing import Iterable, List, Optional
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from celery import shared_task
 from celery_once import QueueOnce as BaseQueueOnce
 from django.db.utils import OperationalError
 
 from . import __title__
-from .app_settings import EVEUNIVERSE_LOAD_TASKS_PRIORITY, EVEUNIVERSE_TASKS_TIME_LIMIT
+from .app_settings import (
+    EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS,
+    EVEUNIVERSE_LOAD_TASKS_PRIORITY,
+    EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED,
+    EVEUNIVERSE_TASKS_TIME_LIMIT,
+    EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS,
+)
 from .constants import POST_UNIVERSE_NAMES_MAX_ITEMS, EveCategoryId
-from .models import EveCategory, EveEntity, EveMarketPrice, EveRegion, EveType
+from .models import (
+    EveCategory,
+    EveEntity,
+    EveMarketPrice,
+    EveMarketPriceHistory,
+    EveRegion,
+    EveType,
+)
 from .models.base import EveUniverseEntityModel, determine_effective_sections
 from .providers import esi
 from .utils import LoggerAddTag, chunks
@@ -67,6 +81,7 @@ def update_or_create_eve_object(
     wait_for_children=True,
     enabled_sections: Optional[List[str]] = None,
     task_priority: Optional[int] = None,
+    use_etag: bool = False,
 ) -> None:
     """Update or create an eve object from ESI.
 
@@ -80,6 +95,7 @@ def update_or_create_eve_object(
         enabled_sections: Sections to load regardless of current settings,
         e.g. `[EveType.Section.DOGMAS]` will always load dogmas for EveTypes
         task_priority: priority of started tasks
+        use_etag: when true only update an existing object when it has changed on ESI
     """
     logger.info("Updating/Creating %s with ID %s", model_name, id)
     model_class = EveUniverseEntityModel.get_model_class(model_name)
@@ -89,6 +105,7 @@ def update_or_create_eve_object(
         wait_for_children=wait_for_children,
         enabled_sections=enabled_sections,
         task_priority=task_priority,
+        use_etag=use_etag,
     )
 
 
@@ -103,7 +120,11 @@ def update_or_create_inline_object(
     parent_model_name: str,
     enabled_sections: Optional[List[str]] = None,
 ) -> None:
-    """Task for updating or creating a single inline object from ESI"""
+    """Task for updating or creating a single inline object from ESI.
+
+    Kept for tasks queued by earlier versions.
+    Please use ``update_or_create_inline_objects()`` instead.
+    """
     logger.info(
         "Updating/Creating inline object %s for %s wit ID %s",
         inline_model_name,
@@ -122,6 +143,100 @@ def update_or_create_inline_object(
     )
 
 
+@shared_task(**_TASK_ESI_DEFAULTS)
+def update_or_create_inline_objects(
+    parent_model_name: str,
+    parent_objs: List[Tuple[int, dict]],
+    enabled_sections: Optional[List[str]] = None,
+) -> None:
+    """Task for updating or creating all inline objects of parent objects in bulk.
+
+    Args:
+        parent_model_name: Name of the parent model, e.g. ``"EveType"``
+        parent_objs: Pairs of parent ID and the inline fields of its ESI data,
+            e.g. ``[[603, {"dogma_attributes": [...]}]]``
+        enabled_sections: Sections to load regardless of current settings
+    """
+    logger.info(
+        "Updating/Creating inline objects for %d %s objects",
+        len(parent_objs),
+        parent_model_name,
+    )
+    model_class = EveUniverseEntityModel.get_model_class(parent_model_name)
+    model_class._update_or_create_inline_objects_for_parents(  # type: ignore
+        parent_objs={
+            int(parent_id): parent_eve_data_obj
+            for parent_id, parent_eve_data_obj in parent_objs
+        },
+        enabled_sections=set(enabled_sections) if enabled_sections else set(),
+    )
+
+
+@shared_task(**_TASK_ESI_DEFAULTS_ONCE)
+def update_stale_eve_objects(
+    model_names: Optional[List[str]] = None, max_objects: Optional[int] = None
+) -> Dict[str, int]:
+    """Update Eve universe objects, which have not been updated for some time.
+
+    Meant to be run periodically to keep all objects up-to-date
+    without reloading everything at once.
+    The budget of objects is shared evenly between all models
+    and budget not used by one model is given to the other models,
+    so a large backlog of one model can not starve the others.
+    The oldest objects of each model are updated first.
+    The number of days after which objects are stale can be configured per model
+    with ``EVEUNIVERSE_UPDATE_STALE_DAYS`` and ``EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL``.
+
+    Args:
+        model_names: Names of models to update, e.g. ``["EveType"]``.
+            Defaults to all models.
+        max_objects: Maximum number of objects to update in this run over all models.
+            Defaults to ``EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS``.
+
+    Returns:
+        Number of updated objects per model
+    """
+    model_classes = [
+        model_class
+        for model_class in stale_update_models()
+        if not model_names or model_class.__name__ in model_names
+    ]
+    remaining = max_objects or EVEUNIVERSE_UPDATE_STALE_MAX_OBJECTS
+    result: Dict[str, int] = {}
+    while remaining > 0 and model_classes:
+        # models which use their full share might have more stale objects
+        next_model_classes = []
+        for num, model_class in enumerate(model_classes):
+            if remaining <= 0:
+                break
+            share = math.ceil(remaining / (len(model_classes) - num))
+            updated_count = model_class.objects.update_stale_esi(  # type: ignore
+                max_objects=share
+            )
+            if updated_count:
+                name = model_class.__name__
+                logger.info("%s: Updated %d stale objects", name, updated_count)
+                result[name] = result.get(name, 0) + updated_count
+                remaining -= updated_count
+            if updated_count >= share:
+                next_model_classes.append(model_class)
+        model_classes = next_model_classes
+
+    return result
+
+
+def stale_update_models() -> list:
+    """Return all model classes which can be updated by
+    :func:`update_stale_eve_objects` in load order.
+    """
+    return [
+        model_class
+        for model_class in EveUniverseEntityModel.all_models()
+        if issubclass(model_class, EveUniverseEntityModel)
+        and model_class._has_esi_path_object()
+    ]
+
+
 # EveEntity objects
 
 
@@ -157,6 +272,11 @@ def load_map(enabled_sections: Optional[List[str]] = None) -> None:
     """Load the complete Eve map with all regions, constellation and solar systems
     and additional related entities if they are enabled.
 
+    Regions are loaded one after the other in several parallel lanes,
+    so that no more than ``EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS`` regions
+    are loaded at the same time.
+    A region which fails to load does not stop the other regions of its lane.
+
     Args:
         enabled_sections: Sections to load regardless of current settings
     """
@@ -166,18 +286,63 @@ def load_map(enabled_sections: Optional[List[str]] = None) -> None:
         ", ".join(determine_effective_sections(enabled_sections)),
     )
     category, method = EveRegion._esi_path_list()
-    all_ids = getattr(getattr(esi.client, category), method)().results()
-    for id in all_ids:
-        update_or_create_eve_object.delay(
-            model_name="EveRegion",
-            id=id,
-            include_children=True,
-            wait_for_children=False,
-            enabled_sections=enabled_sections,
-            task_priority=EVEUNIVERSE_LOAD_TASKS_PRIORITY,
+    all_ids = sorted(getattr(getattr(esi.client, category), method)().results())
+    for lane in range(EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS):
+        lane_ids = all_ids[lane::EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS]
+        if lane_ids:
+            _load_map_lane.apply_async(
+                args=[lane_ids, enabled_sections],
+                priority=EVEUNIVERSE_LOAD_TASKS_PRIORITY,
+            )  # type: ignore
+
+
+@shared_task(bind=True, **_TASK_ESI_DEFAULTS)
+def _load_map_lane(
+    self, ids: List[int], enabled_sections: Optional[List[str]] = None
+) -> None:
+    """Load the first region of a lane and then start the task for the next one.
+
+    A region which fails with a database error is retried like other ESI tasks.
+    A region which still fails to load is logged and skipped.
+    """
+    id, *next_ids = ids
+    try:
+        load_region(id, enabled_sections)
+    except OperationalError:
+        if self.request.retries < self.retry_kwargs["max_retries"]:
+            raise  # will be retried with the same region
+        logger.exception("Failed to load region with ID %s", id)
+    except Exception:  # pylint: disable = broad-exception-caught
+        logger.exception("Failed to load region with ID %s", id)
+    if next_ids:
+        _load_map_lane.apply_async(
+            args=[next_ids, enabled_sections], priority=EVEUNIVERSE_LOAD_TASKS_PRIORITY
         )  # type: ignore
 
 
+@shared_task(**_TASK_ESI_DEFAULTS_ONCE)
+def load_region(id: int, enabled_sections: Optional[List[str]] = None) -> None:
+    """Load a region with all its constellations and solar systems
+    and additional related entities if they are enabled.
+
+    All objects of the region are fetched from ESI in parallel
+    and written in bulk by this task.
+
+    Args:
+        id: Eve Online ID of the region
+        enabled_sections: Sections to load regardless of current settings
+    """
+    logger.info("Loading region with ID %s", id)
+    counts = EveRegion.objects.update_or_create_tree_esi(  # type: ignore
+        ids=[id], enabled_sections=enabled_sections
+    )
+    logger.info(
+        "Loaded region with ID %s: %s",
+        id,
+        ", ".join(f"{count} {name}" for name, count in counts.items()),
+    )
+
+
 @shared_task(**_TASK_ESI_DEFAULTS_ONCE)
 def load_all_types(enabled_sections: Optional[List[str]] = None) -> None:
     """Load all eve types.
@@ -304,5 +469,13 @@ def load_eve_types(
 @shared_task(**_TASK_ESI_DEFAULTS_ONCE)
 def update_market_prices(minutes_until_stale: Optional[int] = None):
     """Updates market prices from ESI.
-    see EveMarketPrice.objects.update_from_esi() for details"""
-    EveMarketPrice.objects.update_from_esi(minutes_until_stale)  # type: ignore
+    see EveMarketPrice.objects.update_from_esi() for details
+
+    When enabled, also stores a snapshot of the prices in the price history.
+    """
+    updated_count = EveMarketPrice.objects.update_from_esi(  # type: ignore
+        minutes_until_stale
+    )
+    if EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED and updated_count:
+        EveMarketPriceHistory.objects.create_from_market_prices()  # type: ignore
+        EveMarketPriceHistory.objects.purge()  # type: ignore
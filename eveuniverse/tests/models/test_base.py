@@ -36,6 +36,14 @@ from eveuniverse.models import (
     EveUnit,
 )
 from eveuniverse.models.base import EveUniverseBaseModel
+from eveuniverse.utils import NoSocketsTestCase
+
+from ..testdata.esi import EsiClientStub
+from ..testdata.factories_2 import (
+    EveGroupFactory,
+    EveSolarSystemFactory,
+    EveTypeFactory,
+)
 
 
 class TestEveUniverseBaseModelGetModelClass(TestCase):
@@ -118,3 +126,57 @@ class TestEveUniverseBaseModel(TestCase):
         self.assertIsNone(
             EveUniverseBaseModel._eve_universe_meta_attr("undefined_param")
         )
+
+
+@patch("eveuniverse.models.base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+@patch("eveuniverse.models.base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+@patch("eveuniverse.managers.universe.esi")
+class TestEveUniverseBaseModelDefaultsFromEsi(NoSocketsTestCase):
+    def test_should_resolve_existing_foreign_keys_with_one_query(self, mock_esi):
+        # given
+        group_1 = EveGroupFactory()
+        group_2 = EveGroupFactory()
+        eve_data_objs = [
+            {"type_id": 1, "name": "Alpha", "group_id": group_1.id},
+            {"type_id": 2, "name": "Bravo", "group_id": group_2.id},
+            {"type_id": 3, "name": "Charlie", "group_id": group_1.id},
+        ]
+        # when
+        with self.assertNumQueries(1):
+            result = EveType._defaults_from_esi_objs(eve_data_objs)
+        # then
+        self.assertEqual(
+            [obj["eve_group_id"] for obj in result],
+            [group_1.id, group_2.id, group_1.id],
+        )
+        self.assertEqual(result[0]["name"], "Alpha")
+
+    def test_should_fetch_missing_foreign_keys_from_esi(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        eve_data_objs = [
+            {"type_id": 1, "name": "Alpha", "group_id": 10},
+            {"type_id": 2, "name": "Bravo", "group_id": 10},
+        ]
+        # when
+        result = EveType._defaults_from_esi_objs(eve_data_objs)
+        # then
+        self.assertEqual([obj["eve_group_id"] for obj in result], [10, 10])
+        self.assertTrue(EveGroup.objects.filter(id=10).exists())
+
+    def test_should_not_fetch_foreign_keys_which_must_not_be_created(self, mock_esi):
+        # given
+        solar_system = EveSolarSystemFactory()
+        eve_data_obj = {
+            "stargate_id": 1,
+            "name": "Alpha",
+            "system_id": solar_system.id,
+            "type_id": EveTypeFactory().id,
+            "destination": {"stargate_id": 2, "system_id": 3},
+        }
+        # when
+        result = EveStargate._defaults_from_esi_obj(eve_data_obj)
+        # then
+        self.assertEqual(result["eve_solar_system_id"], solar_system.id)
+        self.assertIsNone(result["destination_eve_stargate_id"])
+        self.assertIsNone(result["destination_eve_solar_system_id"])
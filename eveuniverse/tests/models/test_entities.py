@@ -1,8 +1,13 @@
 """Eve Entity tests."""
 
+import datetime as dt
 from typing import Dict
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from eveuniverse.managers.entities import _EntityNamesMemoryCache
 from eveuniverse.models import EveEntity
 from eveuniverse.utils import NoSocketsTestCase
 
@@ -772,6 +777,21 @@ class TestEveEntityBulkResolveIds(NoSocketsTestCase):
         self.assertEqual(obj.name, "Bruce Wayne")
         self.assertEqual(obj.category, EveEntity.CATEGORY_CHARACTER)
 
+    def test_should_get_or_create_objs_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(
+            id=1001, name="Bruce Wayne", category=EveEntity.CATEGORY_CHARACTER
+        )
+
+        # when
+        result = EveEntity.objects.bulk_get_or_create_esi(ids=[1001, 2001])
+
+        # then
+        self.assertEqual({obj.id for obj in result}, {1001, 2001})
+        obj = EveEntity.objects.get(id=2001)
+        self.assertEqual(obj.name, "Wayne Technologies")
+
     def test_should_resolve_and_create_new_objs_with_old_api(self, mock_esi):
         # given
         mock_esi.client = EsiClientStub()
@@ -827,3 +847,273 @@ class TestEveEntityUpdateFromEsiById(NoSocketsTestCase):
         result = EveEntity.objects.update_from_esi_by_id(ids=None)
         # then
         self.assertEqual(result, 0)
+
+
+@patch(MANAGERS_PATH + ".esi")
+class TestEveEntityBulkUpdateFromEsiById(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @patch(MANAGERS_PATH + ".POST_UNIVERSE_NAMES_MAX_ITEMS", 1)
+    def test_should_resolve_all_chunks_and_count_them(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Dummy")
+        # when
+        result = EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 2001, 3001])
+        # then
+        self.assertEqual(result, (3, set()))
+        self.assertEqual(EveEntity.objects.get(id=1001).name, "Bruce Wayne")
+        obj = EveEntity.objects.get(id=2001)
+        self.assertEqual(obj.name, "Wayne Technologies")
+        self.assertEqual(obj.category, EveEntity.CATEGORY_CORPORATION)
+        self.assertTrue(EveEntity.objects.filter(id=3001).exists())
+
+    def test_should_return_ids_which_could_not_be_resolved(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 2001, 9999])
+        # then
+        self.assertEqual(result, (2, {9999}))
+        self.assertFalse(EveEntity.objects.filter(id=9999).exists())
+
+    def test_should_write_entities_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        with self.assertNumQueries(1):
+            EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 2001, 3001])
+        # then
+        self.assertEqual(EveEntity.objects.count(), 3)
+
+    def test_should_isolate_invalid_ids_by_bisecting(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        endpoint = Mock(wraps=mock_esi.client.Universe.post_universe_names)
+        # when
+        with patch.object(mock_esi.client.Universe, "post_universe_names", endpoint):
+            result = EveEntity.objects.bulk_update_from_esi_by_id(
+                ids=[1001, 1002, 2001, 3001, 9999]
+            )
+        # then
+        self.assertEqual(result, (4, {9999}))
+        self.assertListEqual(
+            [kwargs["ids"] for _, kwargs in endpoint.call_args_list],
+            [
+                [1001, 1002, 2001, 3001, 9999],
+                [1001, 1002],
+                [2001, 3001, 9999],
+                [2001],
+                [3001, 9999],
+                [3001],
+                [9999],
+            ],
+        )
+
+    def test_should_not_request_known_invalid_ids_again(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 9999])
+        endpoint = Mock(wraps=mock_esi.client.Universe.post_universe_names)
+        # when
+        with patch.object(mock_esi.client.Universe, "post_universe_names", endpoint):
+            result = EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 9999])
+        # then
+        self.assertEqual(result, (1, {9999}))
+        self.assertEqual(endpoint.call_count, 1)
+        _, kwargs = endpoint.call_args
+        self.assertListEqual(kwargs["ids"], [1001])
+
+    def test_should_remember_invalid_id_from_single_request(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveEntity.objects.update_or_create_esi(id=9999)
+        endpoint = Mock(wraps=mock_esi.client.Universe.post_universe_names)
+        # when
+        with patch.object(mock_esi.client.Universe, "post_universe_names", endpoint):
+            obj, created = EveEntity.objects.update_or_create_esi(id=9999)
+        # then
+        self.assertIsNone(obj)
+        self.assertFalse(created)
+        self.assertFalse(endpoint.called)
+
+    @patch(MANAGERS_PATH + ".EVEUNIVERSE_INVALID_ENTITY_IDS_TIMEOUT", 0)
+    def test_should_request_invalid_ids_again_when_disabled(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveEntity.objects.bulk_update_from_esi_by_id(ids=[9999])
+        endpoint = Mock(wraps=mock_esi.client.Universe.post_universe_names)
+        # when
+        with patch.object(mock_esi.client.Universe, "post_universe_names", endpoint):
+            result = EveEntity.objects.bulk_update_from_esi_by_id(ids=[9999])
+        # then
+        self.assertEqual(result, (0, {9999}))
+        self.assertTrue(endpoint.called)
+
+    @patch("eveuniverse.helpers.connections")
+    def test_should_write_entities_without_upsert_support(
+        self, mock_connections, mock_esi
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        mock_connections.__getitem__.return_value.features.supports_update_conflicts = (
+            False
+        )
+        create_eve_entity(id=1001, name="Dummy")
+        # when
+        result = EveEntity.objects.bulk_update_from_esi_by_id(ids=[1001, 2001])
+        # then
+        self.assertEqual(result, (2, set()))
+        self.assertEqual(EveEntity.objects.get(id=1001).name, "Bruce Wayne")
+        self.assertEqual(EveEntity.objects.get(id=2001).name, "Wayne Technologies")
+
+
+@patch(MANAGERS_PATH + ".esi")
+class TestEveEntityResolveNamesWithCache(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        EveEntity.objects.clear_names_cache()
+        self.addCleanup(cache.clear)
+        self.addCleanup(EveEntity.objects.clear_names_cache)
+
+    def test_should_resolve_names_and_categories_from_all_sources(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(
+            id=1001, name="Bruce Wayne", category=EveEntity.CATEGORY_CHARACTER
+        )
+        endpoint = Mock(wraps=mock_esi.client.Universe.post_universe_names)
+        # when
+        with patch.object(mock_esi.client.Universe, "post_universe_names", endpoint):
+            resolver = EveEntity.objects.bulk_resolve_names([1001, 2001, 3001])
+        # then
+        self.assertDictEqual(
+            resolver.to_names([1001, 2001, 3001]),
+            {
+                1001: "Bruce Wayne",
+                2001: "Wayne Technologies",
+                3001: "Wayne Enterprises",
+            },
+        )
+        self.assertEqual(resolver.to_category(2001), EveEntity.CATEGORY_CORPORATION)
+        self.assertEqual(endpoint.call_count, 1)
+        self.assertEqual(endpoint.call_args.kwargs["ids"], [2001, 3001])
+
+    def test_should_resolve_names_from_memory_without_queries(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Bruce Wayne")
+        EveEntity.objects.bulk_resolve_names([1001])
+        # when
+        with self.assertNumQueries(0):
+            resolver = EveEntity.objects.bulk_resolve_names([1001])
+        # then
+        self.assertEqual(resolver.to_name(1001), "Bruce Wayne")
+
+    def test_should_share_resolved_names_between_processes(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Bruce Wayne")
+        EveEntity.objects.bulk_resolve_names([1001])
+        EveEntity.objects.clear_names_cache()
+        EveEntity.objects.all().delete()
+        # when
+        resolver = EveEntity.objects.bulk_resolve_names([1001])
+        # then
+        self.assertEqual(resolver.to_name(1001), "Bruce Wayne")
+
+    def test_should_cache_names_resolved_from_esi(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveEntity.objects.bulk_update_from_esi_by_id([1001])
+        EveEntity.objects.clear_names_cache()
+        EveEntity.objects.all().delete()
+        # when
+        resolver = EveEntity.objects.bulk_resolve_names([1001])
+        # then
+        self.assertEqual(resolver.to_name(1001), "Bruce Wayne")
+        self.assertEqual(resolver.to_category(1001), EveEntity.CATEGORY_CHARACTER)
+
+    def test_should_not_cache_unknown_names(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="")
+        # when
+        resolver = EveEntity.objects.bulk_resolve_names([1001, 9999])
+        # then
+        self.assertEqual(resolver.to_name(1001), "Bruce Wayne")
+        self.assertEqual(resolver.to_name(9999), "")
+        self.assertIsNone(cache.get(EveEntity.objects._name_key(9999)))
+
+    def test_should_resolve_single_name_from_cache(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveEntity.objects.resolve_name(1001)
+        EveEntity.objects.all().delete()
+        # when
+        with self.assertNumQueries(0):
+            result = EveEntity.objects.resolve_name(1001)
+        # then
+        self.assertEqual(result, "Bruce Wayne")
+
+    def test_should_discard_least_recently_used_names(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Bruce Wayne")
+        create_eve_entity(id=1002, name="Peter Parker")
+        create_eve_entity(id=2001, name="Wayne Technologies")
+        memory_cache = _EntityNamesMemoryCache(max_size=2)
+        with patch.object(EveEntity.objects, "_names_memory_cache", memory_cache):
+            EveEntity.objects.bulk_resolve_names([1001])
+            EveEntity.objects.bulk_resolve_names([1002])
+            EveEntity.objects.bulk_resolve_names([1001])
+            EveEntity.objects.bulk_resolve_names([2001])
+        # when
+        result = memory_cache.get_many([1001, 1002, 2001])
+        # then
+        self.assertSetEqual(set(result.keys()), {1001, 2001})
+
+
+@patch(MANAGERS_PATH + ".esi")
+class TestEveEntityUpdateStaleEsi(NoSocketsTestCase):
+    def test_should_update_oldest_stale_entities(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Dummy 1")
+        create_eve_entity(id=1002, name="Dummy 2")
+        create_eve_entity(id=2001, name="Dummy 3")
+        EveEntity.objects.filter(id=1001).update(
+            last_updated=now() - dt.timedelta(days=50)
+        )
+        EveEntity.objects.filter(id=1002).update(
+            last_updated=now() - dt.timedelta(days=40)
+        )
+        # when
+        result = EveEntity.objects.update_stale_esi(max_objects=1)
+        # then
+        self.assertEqual(result, 1)
+        self.assertEqual(EveEntity.objects.get(id=1001).name, "Bruce Wayne")
+        self.assertEqual(EveEntity.objects.get(id=1002).name, "Dummy 2")
+        self.assertEqual(EveEntity.objects.get(id=2001).name, "Dummy 3")
+
+    def test_should_move_past_entities_which_can_not_be_resolved(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        create_eve_entity(id=1001, name="Dummy 1")
+        create_eve_entity(id=9999)
+        EveEntity.objects.filter(id=1001).update(
+            last_updated=now() - dt.timedelta(days=40)
+        )
+        EveEntity.objects.filter(id=9999).update(
+            last_updated=now() - dt.timedelta(days=50)
+        )
+        result_1 = EveEntity.objects.update_stale_esi(max_objects=1)
+        # when
+        result_2 = EveEntity.objects.update_stale_esi(max_objects=1)
+        # then
+        self.assertEqual(result_1, 0)
+        self.assertEqual(result_2, 1)
+        self.assertEqual(EveEntity.objects.get(id=1001).name, "Bruce Wayne")
+        self.assertFalse(EveEntity.objects.stale().exists())
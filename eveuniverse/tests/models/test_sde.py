@@ -1,18 +1,21 @@
 from unittest.mock import patch
 
 import requests_mock
+from django.core.cache import cache
 
 from eveuniverse.models import (
     EveIndustryActivityDuration,
     EveIndustryActivityMaterial,
     EveIndustryActivityProduct,
     EveIndustryActivitySkill,
+    EveMarketPrice,
     EveType,
     EveTypeMaterial,
 )
 from eveuniverse.utils import NoSocketsTestCase
 
 from ..testdata.esi import EsiClientStub
+from ..testdata.factories_2 import EveTypeFactory
 from ..testdata.sde import cache_content, sde_data, type_materials_cache_content
 
 MODELS_PATH = "eveuniverse.models.base"
@@ -20,6 +23,7 @@ MANAGERS_PATH = "eveuniverse.managers"
 
 
 def get_cache_content(cache_key):
+    cache_key, _ = cache_key.rsplit("_", 1)
     table_name = {
         "EVEUNIVERSE_INDUSTRY_ACTIVITY_MATERIALS_REQUEST": "industry_activity_materials",
         "EVEUNIVERSE_INDUSTRY_ACTIVITY_PRODUCTS_REQUEST": "industry_activity_products",
@@ -30,6 +34,14 @@ def get_cache_content(cache_key):
     return cache_content(table=table_name)
 
 
+def get_many_cache_content(cache_keys):
+    return {cache_key: get_cache_content(cache_key) for cache_key in cache_keys}
+
+
+def get_many_returns(content):
+    return lambda cache_keys: {cache_key: content for cache_key in cache_keys}
+
+
 @patch(MANAGERS_PATH + ".sde.EVEUNIVERSE_API_SDE_URL", "https://sde.eve-o.tech/latest")
 @patch(MANAGERS_PATH + ".sde.cache")
 @patch(MANAGERS_PATH + ".universe.esi")
@@ -38,8 +50,8 @@ class TestEveTypeMaterial(NoSocketsTestCase):
     def test_should_create_new_instance(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
@@ -51,7 +63,7 @@ class TestEveTypeMaterial(NoSocketsTestCase):
         EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveTypeMaterial.objects.filter(eve_type_id=603).values_list(
@@ -78,8 +90,10 @@ class TestEveTypeMaterial(NoSocketsTestCase):
     def test_should_use_cache_if_available(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = type_materials_cache_content()
-        mock_cache.set.return_value = None
+        mock_cache.get_many.side_effect = get_many_returns(
+            type_materials_cache_content()
+        )
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
@@ -91,7 +105,7 @@ class TestEveTypeMaterial(NoSocketsTestCase):
         EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveTypeMaterial.objects.filter(eve_type_id=603).values_list(
@@ -106,8 +120,8 @@ class TestEveTypeMaterial(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
@@ -119,7 +133,7 @@ class TestEveTypeMaterial(NoSocketsTestCase):
         EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveTypeMaterial.objects.filter(eve_type_id=603).values_list(
@@ -134,8 +148,8 @@ class TestEveTypeMaterial(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
@@ -146,7 +160,7 @@ class TestEveTypeMaterial(NoSocketsTestCase):
             eve_type, _ = EveType.objects.update_or_create_esi(id=603)
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveTypeMaterial.objects.filter(eve_type_id=603).values_list(
@@ -161,8 +175,8 @@ class TestEveTypeMaterial(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
@@ -173,7 +187,7 @@ class TestEveTypeMaterial(NoSocketsTestCase):
             eve_type, _ = EveType.objects.update_or_create_esi(id=603)
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveTypeMaterial.objects.filter(eve_type_id=603).values_list(
@@ -184,6 +198,215 @@ class TestEveTypeMaterial(NoSocketsTestCase):
         )
 
 
+@patch(MANAGERS_PATH + ".sde.EVEUNIVERSE_API_SDE_URL", "https://sde.eve-o.tech/latest")
+@patch(MANAGERS_PATH + ".universe.esi")
+@requests_mock.Mocker()
+class TestEveTypeMaterialCache(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_should_store_rows_in_buckets_by_type(self, mock_esi, requests_mocker):
+        # given
+        mock_esi.client = EsiClientStub()
+        requests_mocker.register_uri(
+            "GET",
+            url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
+            json=sde_data["type_materials"],
+        )
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        # when
+        EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
+        # then
+        bucket = cache.get("EVEUNIVERSE_TYPE_MATERIALS_REQUEST_3")
+        self.assertIn(603, bucket)
+        self.assertTrue(all(type_id % 100 == 3 for type_id in bucket.keys()))
+        self.assertEqual(len(bucket[603]), 7)
+        self.assertNotIn("typeID", bucket[603][0])
+        self.assertIsNotNone(cache.get("EVEUNIVERSE_TYPE_MATERIALS_REQUEST_99"))
+        self.assertIsNone(cache.get("EVEUNIVERSE_TYPE_MATERIALS_REQUEST"))
+
+    def test_should_fetch_from_api_only_once(self, mock_esi, requests_mocker):
+        # given
+        mock_esi.client = EsiClientStub()
+        requests_mocker.register_uri(
+            "GET",
+            url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
+            json=sde_data["type_materials"],
+        )
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_type_1, _ = EveType.objects.get_or_create_esi(id=603)
+            eve_type_2, _ = EveType.objects.get_or_create_esi(id=34)
+        # when
+        EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type_1)
+        EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type_2)
+        # then
+        self.assertEqual(requests_mocker.call_count, 1)
+        self.assertEqual(EveTypeMaterial.objects.filter(eve_type_id=603).count(), 7)
+
+    def test_should_fetch_from_api_again_when_bucket_is_missing(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        requests_mocker.register_uri(
+            "GET",
+            url="https://sde.eve-o.tech/latest/invTypeMaterials.json",
+            json=sde_data["type_materials"],
+        )
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
+        cache.delete("EVEUNIVERSE_TYPE_MATERIALS_REQUEST_3")
+        # when
+        EveTypeMaterial.objects.update_or_create_api(eve_type=eve_type)
+        # then
+        self.assertEqual(requests_mocker.call_count, 2)
+        self.assertIsNotNone(cache.get("EVEUNIVERSE_TYPE_MATERIALS_REQUEST_3"))
+
+
+@patch(MANAGERS_PATH + ".sde.EVEUNIVERSE_API_SDE_URL", "https://sde.eve-o.tech/latest")
+@patch(MANAGERS_PATH + ".universe.esi")
+@requests_mock.Mocker()
+class TestBulkUpdateOrCreateApi(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    @staticmethod
+    def _register_uris(requests_mocker):
+        for route, table in [
+            ("invTypeMaterials.json", "type_materials"),
+            ("industryActivityMaterials.json", "industry_activity_materials"),
+        ]:
+            requests_mocker.register_uri(
+                "GET",
+                url=f"https://sde.eve-o.tech/latest/{route}",
+                json=sde_data[table],
+            )
+
+    def test_should_create_type_materials_for_many_types(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_types = list(
+                EveType.objects.bulk_get_or_create_esi(ids=[603, 608, 621, 34])
+            )
+        # when
+        with patch.object(
+            EveType.objects,
+            "bulk_get_or_create_esi",
+            wraps=EveType.objects.bulk_get_or_create_esi,
+        ) as spy:
+            EveTypeMaterial.objects.bulk_update_or_create_api(eve_types=eve_types)
+        # then
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(requests_mocker.call_count, 1)
+        self.assertSetEqual(
+            set(EveTypeMaterial.objects.values_list("eve_type_id", flat=True)),
+            {603, 608, 621},
+        )
+        obj = EveTypeMaterial.objects.get(eve_type_id=603, material_eve_type_id=34)
+        self.assertEqual(obj.quantity, 21111)
+
+    def test_should_update_existing_objects(self, mock_esi, requests_mocker):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+            material_eve_type, _ = EveType.objects.get_or_create_esi(id=34)
+        EveTypeMaterial.objects.create(
+            eve_type=eve_type, material_eve_type=material_eve_type, quantity=1
+        )
+        # when
+        EveTypeMaterial.objects.bulk_update_or_create_api(eve_types=[eve_type])
+        # then
+        obj = EveTypeMaterial.objects.get(eve_type_id=603, material_eve_type_id=34)
+        self.assertEqual(obj.quantity, 21111)
+        self.assertEqual(EveTypeMaterial.objects.filter(eve_type_id=603).count(), 7)
+
+    def test_should_create_industry_materials_without_upsert_support(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        eve_type, _ = EveType.objects.get_or_create_esi(id=950)
+        # when
+        with patch("eveuniverse.helpers.connections") as mock_connections:
+            mock_connections.__getitem__.return_value.features = object()
+            EveIndustryActivityMaterial.objects.bulk_update_or_create_api(
+                eve_types=[eve_type]
+            )
+        # then
+        self.assertSetEqual(
+            set(
+                EveIndustryActivityMaterial.objects.filter(eve_type_id=950).values_list(
+                    "material_eve_type_id", "activity_id", "quantity"
+                )
+            ),
+            {(34, 1, 32000), (35, 1, 6000), (36, 1, 2500), (37, 1, 500)},
+        )
+
+    def test_should_rebuild_material_matrix_after_writing(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        with patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", False):
+            eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        self.addCleanup(EveTypeMaterial.objects.clear_material_matrix)
+        old_matrix = EveTypeMaterial.objects.material_matrix()
+        # when
+        EveTypeMaterial.objects.bulk_update_or_create_api(eve_types=[eve_type])
+        # then
+        new_matrix = EveTypeMaterial.objects.material_matrix()
+        self.assertIsNot(new_matrix, old_matrix)
+        self.assertIn(603, EveTypeMaterial.objects.reprocess_values())
+
+    def test_should_rebuild_bill_of_materials_after_writing(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        eve_type, _ = EveType.objects.get_or_create_esi(id=950)
+        self.addCleanup(EveIndustryActivityProduct.objects.clear_bill_of_materials)
+        old_graph = EveIndustryActivityProduct.objects.bill_of_materials()
+        # when
+        EveIndustryActivityMaterial.objects.bulk_update_or_create_api(
+            eve_types=[eve_type]
+        )
+        # then
+        new_graph = EveIndustryActivityProduct.objects.bill_of_materials()
+        self.assertIsNot(new_graph, old_graph)
+
+    def test_should_load_type_materials_once_when_loading_types_in_bulk(
+        self, mock_esi, requests_mocker
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        self._register_uris(requests_mocker)
+        # when
+        with patch.object(
+            EveTypeMaterial.objects,
+            "bulk_update_or_create_api",
+            wraps=EveTypeMaterial.objects.bulk_update_or_create_api,
+        ) as spy, patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_TYPE_MATERIALS", True):
+            EveType.objects.bulk_get_or_create_esi(ids=[603, 608])
+        # then
+        _, kwargs = spy.call_args_list[0]  # later calls are for the material types
+        self.assertSetEqual({obj.id for obj in kwargs["eve_types"]}, {603, 608})
+        self.assertSetEqual(
+            set(EveTypeMaterial.objects.values_list("eve_type_id", flat=True)),
+            {603, 608},
+        )
+
+
 @patch(MANAGERS_PATH + ".sde.cache")
 @patch(MANAGERS_PATH + ".universe.esi")
 @requests_mock.Mocker()
@@ -191,8 +414,8 @@ class TestEveIndustryActivityDuration(NoSocketsTestCase):
     def test_should_create_new_instance(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivity.json",
@@ -205,7 +428,7 @@ class TestEveIndustryActivityDuration(NoSocketsTestCase):
         )
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityDuration.objects.filter(eve_type_id=950).values_list(
@@ -229,8 +452,10 @@ class TestEveIndustryActivityDuration(NoSocketsTestCase):
     def test_should_use_cache_if_available(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = cache_content("industry_activity_durations")
-        mock_cache.set.return_value = None
+        mock_cache.get_many.side_effect = get_many_returns(
+            cache_content("industry_activity_durations")
+        )
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivity.json",
@@ -241,7 +466,7 @@ class TestEveIndustryActivityDuration(NoSocketsTestCase):
         EveIndustryActivityDuration.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityDuration.objects.filter(eve_type_id=950).values_list(
@@ -259,8 +484,8 @@ class TestEveIndustryActivityMaterial(NoSocketsTestCase):
     def test_should_create_new_instance(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivityMaterials.json",
@@ -272,7 +497,7 @@ class TestEveIndustryActivityMaterial(NoSocketsTestCase):
         )
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityMaterial.objects.filter(
@@ -302,8 +527,10 @@ class TestEveIndustryActivityMaterial(NoSocketsTestCase):
     def test_should_use_cache_if_available(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = cache_content("industry_activity_materials")
-        mock_cache.set.return_value = None
+        mock_cache.get_many.side_effect = get_many_returns(
+            cache_content("industry_activity_materials")
+        )
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivityMaterials.json",
@@ -314,7 +541,7 @@ class TestEveIndustryActivityMaterial(NoSocketsTestCase):
         EveIndustryActivityMaterial.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityMaterial.objects.filter(
@@ -332,8 +559,8 @@ class TestEveIndustryActivityProduct(NoSocketsTestCase):
     def test_should_create_new_instance(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivityProducts.json",
@@ -345,7 +572,7 @@ class TestEveIndustryActivityProduct(NoSocketsTestCase):
         )
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityProduct.objects.filter(
@@ -362,8 +589,10 @@ class TestEveIndustryActivityProduct(NoSocketsTestCase):
     def test_should_use_cache_if_available(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = cache_content("industry_activity_products")
-        mock_cache.set.return_value = None
+        mock_cache.get_many.side_effect = get_many_returns(
+            cache_content("industry_activity_products")
+        )
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivityProducts.json",
@@ -374,7 +603,7 @@ class TestEveIndustryActivityProduct(NoSocketsTestCase):
         EveIndustryActivityProduct.objects.update_or_create_api(eve_type=eve_type)
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivityProduct.objects.filter(
@@ -385,6 +614,127 @@ class TestEveIndustryActivityProduct(NoSocketsTestCase):
         )
 
 
+class TestEveTypeMaterialReprocessValues(NoSocketsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for type_id in [1, 2, 3, 10, 20, 30]:
+            EveTypeFactory(id=type_id)
+        for type_id, material_id, quantity in [
+            (1, 10, 2),
+            (1, 20, 3),
+            (2, 20, 1),
+            (2, 30, 5),
+        ]:
+            EveTypeMaterial.objects.create(
+                eve_type_id=type_id, material_eve_type_id=material_id, quantity=quantity
+            )
+        EveMarketPrice.objects.create(
+            eve_type_id=10, average_price=5.0, adjusted_price=4.0
+        )
+        EveMarketPrice.objects.create(
+            eve_type_id=20, average_price=7.0, adjusted_price=6.0
+        )
+
+    def setUp(self) -> None:
+        EveTypeMaterial.objects.clear_material_matrix()
+        self.addCleanup(EveTypeMaterial.objects.clear_material_matrix)
+
+    def test_should_return_values_for_all_types(self):
+        # when
+        result = EveTypeMaterial.objects.reprocess_values()
+        # then
+        self.assertDictEqual(result, {1: 31.0, 2: 7.0})
+
+    def test_should_return_values_for_some_types(self):
+        # when
+        result = EveTypeMaterial.objects.reprocess_values([2, 3])
+        # then
+        self.assertDictEqual(result, {2: 7.0})
+
+    def test_should_use_other_price_field(self):
+        # when
+        result = EveTypeMaterial.objects.reprocess_values(price_field="adjusted_price")
+        # then
+        self.assertDictEqual(result, {1: 26.0, 2: 6.0})
+
+    def test_should_raise_error_for_invalid_price_field(self):
+        with self.assertRaises(ValueError):
+            EveTypeMaterial.objects.reprocess_values(price_field="invalid")
+
+    def test_should_reuse_values_while_prices_are_unchanged(self):
+        # given
+        EveTypeMaterial.objects.reprocess_values()
+        # when
+        with self.assertNumQueries(1):
+            result = EveTypeMaterial.objects.reprocess_values()
+        # then
+        self.assertDictEqual(result, {1: 31.0, 2: 7.0})
+
+    def test_should_recalculate_values_when_prices_change(self):
+        # given
+        EveTypeMaterial.objects.reprocess_values()
+        EveMarketPrice.objects.create(eve_type_id=30, average_price=1.0)
+        # when
+        result = EveTypeMaterial.objects.reprocess_values()
+        # then
+        self.assertDictEqual(result, {1: 31.0, 2: 12.0})
+
+
+class TestEveIndustryActivityProductRawMaterials(NoSocketsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # product 10 from blueprint 1: 2x 20 + 1x 30
+        # product 20 from blueprint 2: 3x 30
+        for type_id in [1, 2, 3, 10, 20, 30]:
+            EveTypeFactory(id=type_id)
+        for blueprint_id, product_id, activity_id in [(1, 10, 1), (2, 20, 9)]:
+            EveIndustryActivityProduct.objects.create(
+                eve_type_id=blueprint_id,
+                product_eve_type_id=product_id,
+                activity_id=activity_id,
+                quantity=1,
+            )
+        EveIndustryActivityProduct.objects.create(  # copying is ignored
+            eve_type_id=3, product_eve_type_id=30, activity_id=5, quantity=1
+        )
+        for blueprint_id, material_id, quantity in [(1, 20, 2), (1, 30, 1), (2, 30, 3)]:
+            EveIndustryActivityMaterial.objects.create(
+                eve_type_id=blueprint_id,
+                material_eve_type_id=material_id,
+                activity_id=1 if blueprint_id == 1 else 9,
+                quantity=quantity,
+            )
+
+    def setUp(self) -> None:
+        EveIndustryActivityProduct.objects.clear_bill_of_materials()
+        self.addCleanup(EveIndustryActivityProduct.objects.clear_bill_of_materials)
+
+    def test_should_return_raw_materials(self):
+        # when
+        result = EveIndustryActivityProduct.objects.raw_materials({10: 2})
+        # then
+        self.assertDictEqual(result, {30: 14})
+
+    def test_should_build_graph_only_once(self):
+        # given
+        EveIndustryActivityProduct.objects.raw_materials({10: 1})
+        # when
+        with self.assertNumQueries(0):
+            result = EveIndustryActivityProduct.objects.raw_materials({20: 1})
+        # then
+        self.assertDictEqual(result, {30: 3})
+
+    def test_should_rebuild_graph_after_clear(self):
+        # given
+        EveIndustryActivityProduct.objects.raw_materials({10: 1})
+        EveIndustryActivityMaterial.objects.filter(eve_type_id=2).update(quantity=4)
+        # when
+        EveIndustryActivityProduct.objects.clear_bill_of_materials()
+        result = EveIndustryActivityProduct.objects.raw_materials({20: 1})
+        # then
+        self.assertDictEqual(result, {30: 4})
+
+
 @patch(MANAGERS_PATH + ".sde.cache")
 @patch(MANAGERS_PATH + ".universe.esi")
 @requests_mock.Mocker()
@@ -392,8 +742,8 @@ class TestEveIndustryActivitySkill(NoSocketsTestCase):
     def test_should_create_new_instance(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = None
-        mock_cache.set.return_value = None
+        mock_cache.get_many.return_value = {}
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivitySkills.json",
@@ -405,7 +755,7 @@ class TestEveIndustryActivitySkill(NoSocketsTestCase):
         )
         # then
         self.assertTrue(requests_mocker.called)
-        self.assertTrue(mock_cache.set.called)
+        self.assertTrue(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivitySkill.objects.filter(
@@ -418,8 +768,10 @@ class TestEveIndustryActivitySkill(NoSocketsTestCase):
     def test_should_use_cache_if_avaliable(self, mock_esi, mock_cache, requests_mocker):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = cache_content("industry_activity_skills")
-        mock_cache.set.return_value = None
+        mock_cache.get_many.side_effect = get_many_returns(
+            cache_content("industry_activity_skills")
+        )
+        mock_cache.set_many.return_value = None
         requests_mocker.register_uri(
             "GET",
             url="https://sde.eve-o.tech/latest/industryActivitySkills.json",
@@ -431,7 +783,7 @@ class TestEveIndustryActivitySkill(NoSocketsTestCase):
         )
         # then
         self.assertFalse(requests_mocker.called)
-        self.assertFalse(mock_cache.set.called)
+        self.assertFalse(mock_cache.set_many.called)
         self.assertSetEqual(
             set(
                 EveIndustryActivitySkill.objects.filter(
@@ -576,7 +928,9 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     def test_should_create_type_with_type_materials_global(self, mock_esi, mock_cache):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = type_materials_cache_content()
+        mock_cache.get_many.side_effect = get_many_returns(
+            type_materials_cache_content()
+        )
         # when
         obj, created = EveType.objects.update_or_create_esi(id=603)
         # then
@@ -596,7 +950,9 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = type_materials_cache_content()
+        mock_cache.get_many.side_effect = get_many_returns(
+            type_materials_cache_content()
+        )
         # when
         obj, created = EveType.objects.update_or_create_esi(
             id=603, enabled_sections=[EveType.Section.TYPE_MATERIALS]
@@ -633,7 +989,9 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = type_materials_cache_content()
+        mock_cache.get_many.side_effect = get_many_returns(
+            type_materials_cache_content()
+        )
         EveType.objects.update_or_create_esi(id=603)
         # when
         obj, created = EveType.objects.get_or_create_esi(
@@ -657,7 +1015,9 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get.return_value = type_materials_cache_content()
+        mock_cache.get_many.side_effect = get_many_returns(
+            type_materials_cache_content()
+        )
         EveType.objects.update_or_create_esi(
             id=603, enabled_sections=[EveType.Section.TYPE_MATERIALS]
         )
@@ -686,7 +1046,7 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get = get_cache_content
+        mock_cache.get_many = get_many_cache_content
         # when
         obj, created = EveType.objects.update_or_create_esi(
             id=950,
@@ -706,7 +1066,7 @@ class TestEveTypeWithSections(NoSocketsTestCase):
     ):
         # given
         mock_esi.client = EsiClientStub()
-        mock_cache.get = get_cache_content
+        mock_cache.get_many = get_many_cache_content
         # when
         obj, created = EveType.objects.update_or_create_esi(
             id=950, enabled_sections=[EveType.Section.INDUSTRY_ACTIVITIES]
@@ -1,8 +1,9 @@
 import datetime as dt
+import math
 import unittest
 from unittest.mock import Mock, patch
 
-from bravado.exception import HTTPNotFound
+from bravado.exception import HTTPNotFound, HTTPNotModified
 from django.test.utils import override_settings
 from django.utils.timezone import now
 
@@ -21,6 +22,7 @@ from eveuniverse.models import (
     EveGroup,
     EveMarketGroup,
     EveMarketPrice,
+    EveMarketPriceHistory,
     EveMoon,
     EvePlanet,
     EveRace,
@@ -29,11 +31,19 @@ from eveuniverse.models import (
     EveStar,
     EveStargate,
     EveStation,
+    EveStationService,
     EveType,
+    EveUniverseEtag,
 )
 from eveuniverse.utils import NoSocketsTestCase
 
 from ..testdata.esi import BravadoOperationStub, EsiClientStub
+from ..testdata.factories_2 import (
+    EveCategoryFactory,
+    EveSolarSystemFactory,
+    EveStargateFactory,
+    EveTypeFactory,
+)
 
 unittest.util._MAX_LENGTH = 1000
 MODELS_PATH = "eveuniverse.models.base"
@@ -337,6 +347,77 @@ class TestBulkGetOrCreateEsi(NoSocketsTestCase):
         result = EveCategory.objects.bulk_get_or_create_esi(ids=[2, 3])
         self.assertEqual({x.id for x in result}, {2, 3})
 
+    def test_should_fetch_missing_objects_in_parallel(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        with patch(MANAGERS_PATH + ".EVEUNIVERSE_BULK_METHODS_MAX_WORKERS", 4):
+            result = EveCategory.objects.bulk_get_or_create_esi(ids=[1, 2, 3, 4, 6])
+        # then
+        self.assertEqual({x.id for x in result}, {1, 2, 3, 4, 6})
+        self.assertEqual(EveCategory.objects.get(id=6).name, "Ship")
+
+    def test_should_fetch_missing_objects_sequentially(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        with patch(MANAGERS_PATH + ".EVEUNIVERSE_BULK_METHODS_MAX_WORKERS", 1):
+            result = EveCategory.objects.bulk_get_or_create_esi(ids=[2, 3])
+        # then
+        self.assertEqual({x.id for x in result}, {2, 3})
+
+    def test_should_raise_when_fetching_an_object_fails(self, mock_esi):
+        # given
+        mock_esi.client.Universe.get_universe_categories_category_id.side_effect = (
+            HTTPNotFound(Mock(**{"response.status_code": 404}))
+        )
+        # when/then
+        with self.assertRaises(HTTPNotFound):
+            EveCategory.objects.bulk_get_or_create_esi(ids=[2, 3])
+        self.assertFalse(EveCategory.objects.exists())
+
+    def test_should_fetch_list_endpoint_only_once(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        mock_esi.client.Universe.get_universe_races = Mock(
+            wraps=mock_esi.client.Universe.get_universe_races
+        )
+        # when
+        result = EveRace.objects.bulk_get_or_create_esi(ids=[1, 8])
+        # then
+        self.assertEqual({x.id for x in result}, {1, 8})
+        self.assertEqual(mock_esi.client.Universe.get_universe_races.call_count, 1)
+
+    def test_should_write_inline_objects_of_all_objects_together(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        with patch.object(
+            EveType,
+            "_update_or_create_inline_objects_for_parents",
+            wraps=EveType._update_or_create_inline_objects_for_parents,
+        ) as spy:
+            EveType.objects.bulk_get_or_create_esi(
+                ids=[603, 608], enabled_sections=[EveType.Section.DOGMAS]
+            )
+        # then
+        self.assertEqual(spy.call_count, 1)
+        _, kwargs = spy.call_args
+        self.assertSetEqual(set(kwargs["parent_objs"].keys()), {603, 608})
+        self.assertTrue(EveType.objects.get(id=603).dogma_attributes.exists())
+        self.assertTrue(EveType.objects.get(id=608).dogma_attributes.exists())
+
+    def test_should_link_stargates_when_loaded_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        EveStargate.objects.bulk_get_or_create_esi(ids=[50016283, 50016284])
+        # then
+        akidagi = EveStargate.objects.get(id=50016284)
+        enaluri = EveStargate.objects.get(id=50016283)
+        self.assertEqual(akidagi.destination_eve_stargate, enaluri)
+        self.assertEqual(enaluri.destination_eve_stargate, akidagi)
+
 
 @patch(MANAGERS_PATH + ".esi")
 class TestEveConstellation(NoSocketsTestCase):
@@ -576,6 +657,419 @@ class TestEveMarketPriceManager(NoSocketsTestCase):
         self.assertEqual(float(obj.market_price.adjusted_price), 306988.09)
         self.assertEqual(float(obj.market_price.average_price), 306292.67)
 
+    def test_should_only_refresh_stale_prices_which_have_not_changed(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        mocked_update_at = now() - dt.timedelta(minutes=65)
+        with patch("django.utils.timezone.now", Mock(return_value=mocked_update_at)):
+            EveMarketPrice.objects.create(
+                eve_type=EveType.objects.get(id=603),
+                adjusted_price=306988.09,
+                average_price=306292.67,
+            )
+        # when
+        result = EveMarketPrice.objects.update_from_esi(minutes_until_stale=60)
+        # then
+        self.assertEqual(result, 0)
+        obj = EveMarketPrice.objects.get(eve_type_id=603)
+        self.assertEqual(obj.adjusted_price, 306988.09)
+        self.assertGreater(obj.updated_at, mocked_update_at)
+
+    def test_should_create_prices_without_fetching_types(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        with self.assertNumQueries(5):  # savepoint, types, prices, upsert, release
+            result = EveMarketPrice.objects.update_from_esi()
+        # then
+        self.assertEqual(result, 1)
+
+    def test_should_update_prices_without_upsert_support(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        mocked_update_at = now() - dt.timedelta(minutes=65)
+        with patch("django.utils.timezone.now", Mock(return_value=mocked_update_at)):
+            EveMarketPrice.objects.create(
+                eve_type=EveType.objects.get(id=603), adjusted_price=2, average_price=3
+            )
+        # when
+        with patch("eveuniverse.helpers.connections") as mock_connections:
+            mock_connections.__getitem__.return_value.features = Mock(
+                spec=["supports_transactions"]
+            )
+            result = EveMarketPrice.objects.update_from_esi(minutes_until_stale=60)
+        # then
+        self.assertEqual(result, 1)
+        obj = EveMarketPrice.objects.get(eve_type_id=603)
+        self.assertEqual(obj.adjusted_price, 306988.09)
+        self.assertGreater(obj.updated_at, mocked_update_at)
+
+
+class TestEveMarketPriceHistoryManager(NoSocketsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for type_id in [1, 2, 3]:
+            EveTypeFactory(id=type_id)
+
+    def _create_snapshot(self, created_at: dt.datetime, prices: dict):
+        EveMarketPrice.objects.all().delete()
+        for type_id, (adjusted_price, average_price) in prices.items():
+            EveMarketPrice.objects.create(
+                eve_type_id=type_id,
+                adjusted_price=adjusted_price,
+                average_price=average_price,
+            )
+        with patch(MANAGERS_PATH + ".now", Mock(return_value=created_at)):
+            return EveMarketPriceHistory.objects.create_from_market_prices()
+
+    def test_should_return_price_series_for_many_types(self):
+        # given
+        time_1 = now() - dt.timedelta(hours=2)
+        time_2 = now() - dt.timedelta(hours=1)
+        self._create_snapshot(time_1, {1: (10.0, 11.0), 2: (20.0, 21.0)})
+        self._create_snapshot(time_2, {1: (12.0, 13.0), 2: (22.0, None)})
+        # when
+        timestamps, series = EveMarketPriceHistory.objects.price_series([1, 2, 3])
+        # then
+        self.assertListEqual(timestamps, [time_1, time_2])
+        self.assertListEqual(list(series[1]), [11.0, 13.0])
+        self.assertEqual(series[2][0], 21.0)
+        self.assertTrue(math.isnan(series[2][1]))
+        self.assertTrue(all(math.isnan(value) for value in series[3]))
+
+    def test_should_return_price_series_since(self):
+        # given
+        time_1 = now() - dt.timedelta(hours=2)
+        time_2 = now() - dt.timedelta(hours=1)
+        self._create_snapshot(time_1, {1: (10.0, 11.0)})
+        self._create_snapshot(time_2, {1: (12.0, 13.0)})
+        # when
+        timestamps, series = EveMarketPriceHistory.objects.price_series(
+            [1], price_field="adjusted_price", since=time_2
+        )
+        # then
+        self.assertListEqual(timestamps, [time_2])
+        self.assertListEqual(list(series[1]), [12.0])
+
+    def test_should_raise_error_for_invalid_price_field(self):
+        with self.assertRaises(ValueError):
+            EveMarketPriceHistory.objects.price_series([1], price_field="invalid")
+
+    @patch(MANAGERS_PATH + ".EVEUNIVERSE_MARKET_PRICE_HISTORY_DAYS", 30)
+    @patch(MANAGERS_PATH + ".EVEUNIVERSE_MARKET_PRICE_HISTORY_FULL_RESOLUTION_DAYS", 7)
+    def test_should_purge_old_snapshots(self):
+        # given
+        today = now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self._create_snapshot(today - dt.timedelta(days=31), {1: (1, 1)})  # expired
+        self._create_snapshot(  # older and same day as old_2
+            today - dt.timedelta(days=10, hours=2), {1: (1, 1)}
+        )
+        old_2 = self._create_snapshot(
+            today - dt.timedelta(days=10, hours=1), {1: (1, 1)}
+        )
+        recent_1 = self._create_snapshot(today - dt.timedelta(hours=2), {1: (1, 1)})
+        recent_2 = self._create_snapshot(today - dt.timedelta(hours=1), {1: (1, 1)})
+        # when
+        result = EveMarketPriceHistory.objects.purge()
+        # then
+        self.assertEqual(result, 2)
+        self.assertSetEqual(
+            set(EveMarketPriceHistory.objects.values_list("pk", flat=True)),
+            {old_2.pk, recent_1.pk, recent_2.pk},
+        )
+
+
+class _ConditionalCategoryEndpoint:
+    """Simulate ESI endpoint for categories, which supports ETags."""
+
+    def __init__(self, name: str = "Celestial", etag: str = '"abc"') -> None:
+        self.name = name
+        self.etag = etag
+        self.expires = now() + dt.timedelta(hours=1)
+        self.calls = []
+
+    def __call__(self, category_id, _request_options=None):
+        self.calls.append(_request_options)
+        headers = {
+            "ETag": self.etag,
+            "Expires": self.expires.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        }
+        if_none_match = (_request_options or {}).get("headers", {}).get("If-None-Match")
+        if if_none_match == self.etag:
+            operation = Mock()
+            operation.results.side_effect = HTTPNotModified(
+                Mock(status_code=304, headers=headers)
+            )
+            return operation
+
+        data = {
+            "category_id": category_id,
+            "groups": [5, 6],
+            "name": self.name,
+            "published": True,
+        }
+        return BravadoOperationStub(data, headers=headers)
+
+
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_GRAPHICS", False)
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_DOGMAS", False)
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+@patch(MANAGERS_PATH + ".esi")
+class TestEveUniverseEntityModelManagerWithEtag(NoSocketsTestCase):
+    def test_should_create_object_and_store_etag(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        # when
+        obj, created = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        # then
+        self.assertTrue(created)
+        self.assertEqual(obj.name, "Celestial")
+        etag = EveUniverseEtag.objects.get(model_name="EveCategory", object_id=2)
+        self.assertEqual(etag.etag, '"abc"')
+        self.assertEqual(etag.expires, endpoint.expires.replace(microsecond=0))
+        self.assertListEqual(endpoint.calls, [None])
+
+    def test_should_not_request_object_before_expiry(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        endpoint.name = "Changed"
+        # when
+        obj, created = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        # then
+        self.assertFalse(created)
+        self.assertEqual(obj.name, "Celestial")
+        self.assertEqual(len(endpoint.calls), 1)
+
+    def test_should_not_update_object_when_not_modified(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        obj, _ = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        last_updated = obj.last_updated
+        EveUniverseEtag.objects.update(expires=now() - dt.timedelta(minutes=1))
+        # when
+        obj, created = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        # then
+        self.assertFalse(created)
+        self.assertEqual(obj.last_updated, last_updated)
+        self.assertEqual(endpoint.calls[1], {"headers": {"If-None-Match": '"abc"'}})
+        etag = EveUniverseEtag.objects.get(model_name="EveCategory", object_id=2)
+        self.assertGreater(etag.expires, now())
+
+    def test_should_update_object_when_modified(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        EveUniverseEtag.objects.update(expires=now() - dt.timedelta(minutes=1))
+        endpoint.name = "Changed"
+        endpoint.etag = '"def"'
+        # when
+        obj, _ = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        # then
+        self.assertEqual(obj.name, "Changed")
+        etag = EveUniverseEtag.objects.get(model_name="EveCategory", object_id=2)
+        self.assertEqual(etag.etag, '"def"')
+
+    def test_should_always_request_object_when_loading_children(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client = EsiClientStub()
+        with patch.object(
+            mock_esi.client.Universe, "get_universe_categories_category_id", endpoint
+        ):
+            EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+            # when
+            EveCategory.objects.update_or_create_esi(
+                id=2, include_children=True, use_etag=True
+            )
+        # then
+        self.assertEqual(len(endpoint.calls), 2)
+
+    def test_should_update_all_objects_which_have_changed(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        mock_esi.client.Universe.get_universe_categories.return_value = (
+            BravadoOperationStub([2, 3])
+        )
+        EveCategory.objects.update_or_create_all_esi(use_etag=True)
+        EveUniverseEtag.objects.filter(object_id=3).update(
+            expires=now() - dt.timedelta(minutes=1)
+        )
+        endpoint.name = "Changed"
+        endpoint.etag = '"def"'
+        # when
+        EveCategory.objects.update_or_create_all_esi(use_etag=True)
+        # then
+        self.assertEqual(EveCategory.objects.get(id=2).name, "Celestial")
+        self.assertEqual(EveCategory.objects.get(id=3).name, "Changed")
+        self.assertEqual(len(endpoint.calls), 3)
+
+
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_GRAPHICS", False)
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_DOGMAS", False)
+@patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+@patch(MANAGERS_PATH + ".esi")
+class TestEveUniverseEntityModelManagerUpdateStale(NoSocketsTestCase):
+    @staticmethod
+    def _make_stale(model_class, days: int, **kwargs):
+        model_class.objects.filter(**kwargs).update(
+            last_updated=now() - dt.timedelta(days=days)
+        )
+
+    def test_should_return_stale_objects(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        for id in [2, 3, 4]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        self._make_stale(EveCategory, 10, id=2)
+        self._make_stale(EveCategory, 40, id=3)
+        # when
+        result = EveCategory.objects.stale()
+        # then
+        self.assertQuerysetEqual(result, [3], transform=lambda obj: obj.id)
+
+    @patch(
+        MANAGERS_PATH + ".EVEUNIVERSE_UPDATE_STALE_DAYS_BY_MODEL", {"EveCategory": 5}
+    )
+    def test_should_return_stale_objects_for_days_by_model(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        for id in [2, 3, 4]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        self._make_stale(EveCategory, 10, id=2)
+        self._make_stale(EveCategory, 40, id=3)
+        # when
+        result = EveCategory.objects.stale()
+        # then
+        self.assertQuerysetEqual(
+            result, [2, 3], transform=lambda obj: obj.id, ordered=False
+        )
+
+    def test_should_update_oldest_stale_objects_first(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        for id in [2, 3, 4]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        EveCategory.objects.update(name="Dummy")
+        self._make_stale(EveCategory, 40, id=2)
+        self._make_stale(EveCategory, 50, id=3)
+        self._make_stale(EveCategory, 60, id=4)
+        # when
+        result = EveCategory.objects.update_stale_esi(max_objects=2, use_etag=False)
+        # then
+        self.assertEqual(result, 2)
+        self.assertEqual(EveCategory.objects.get(id=2).name, "Dummy")
+        self.assertEqual(EveCategory.objects.get(id=3).name, "Station")
+        self.assertEqual(EveCategory.objects.get(id=4).name, "Material")
+        self.assertQuerysetEqual(
+            EveCategory.objects.stale(), [2], transform=lambda obj: obj.id
+        )
+
+    def test_should_update_stale_objects_in_pages(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        for id in [2, 3, 4]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        self._make_stale(EveCategory, 40)
+        # when
+        with patch(MANAGERS_PATH + ".EVEUNIVERSE_BULK_METHODS_BATCH_SIZE", 2):
+            result = EveCategory.objects.update_stale_esi(use_etag=False)
+        # then
+        self.assertEqual(result, 3)
+        self.assertFalse(EveCategory.objects.stale().exists())
+
+    def test_should_keep_sections_of_stale_objects(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveType.objects.update_or_create_esi(
+            id=603, enabled_sections=[EveType.Section.DOGMAS]
+        )
+        eve_type = EveType.objects.get(id=603)
+        eve_type.dogma_attributes.all().delete()
+        self._make_stale(EveType, 40, id=603)
+        # when
+        result = EveType.objects.update_stale_esi(use_etag=False)
+        # then
+        self.assertEqual(result, 1)
+        eve_type.refresh_from_db()
+        self.assertTrue(eve_type.enabled_sections.dogmas)
+        self.assertTrue(eve_type.dogma_attributes.exists())
+
+    def test_should_skip_objects_which_no_longer_exist(self, mock_esi):
+        # given
+        esi_client_stub = EsiClientStub()
+        mock_esi.client = esi_client_stub
+        for id in [2, 3]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        EveCategoryFactory(id=999)
+        self._make_stale(EveCategory, 40)
+        original_endpoint = esi_client_stub.Universe.get_universe_categories_category_id
+
+        def endpoint(category_id, **kwargs):
+            if category_id == 999:
+                raise HTTPNotFound(Mock(status_code=404))
+            return original_endpoint(category_id=category_id, **kwargs)
+
+        # when
+        with patch.object(
+            esi_client_stub.Universe, "get_universe_categories_category_id", endpoint
+        ):
+            result = EveCategory.objects.update_stale_esi(use_etag=False)
+        # then
+        self.assertEqual(result, 2)
+        self.assertFalse(EveCategory.objects.stale().exists())
+
+    def test_should_move_past_objects_which_no_longer_exist(self, mock_esi):
+        # given
+        esi_client_stub = EsiClientStub()
+        mock_esi.client = esi_client_stub
+        for id in [2, 3]:
+            EveCategory.objects.update_or_create_esi(id=id)
+        EveCategoryFactory(id=998)
+        EveCategoryFactory(id=999)
+        self._make_stale(EveCategory, 40)
+        self._make_stale(EveCategory, 50, id__in=[998, 999])
+        original_endpoint = esi_client_stub.Universe.get_universe_categories_category_id
+
+        def endpoint(category_id, **kwargs):
+            if category_id in {998, 999}:
+                raise HTTPNotFound(Mock(status_code=404))
+            return original_endpoint(category_id=category_id, **kwargs)
+
+        with patch.object(
+            esi_client_stub.Universe, "get_universe_categories_category_id", endpoint
+        ):
+            result_1 = EveCategory.objects.update_stale_esi(
+                max_objects=2, use_etag=False
+            )
+            # when
+            result_2 = EveCategory.objects.update_stale_esi(
+                max_objects=2, use_etag=False
+            )
+        # then
+        self.assertEqual(result_1, 0)
+        self.assertEqual(result_2, 2)
+        self.assertFalse(EveCategory.objects.stale().exists())
+
+    def test_should_mark_unchanged_objects_as_updated(self, mock_esi):
+        # given
+        endpoint = _ConditionalCategoryEndpoint()
+        mock_esi.client.Universe.get_universe_categories_category_id = endpoint
+        obj, _ = EveCategory.objects.update_or_create_esi(id=2, use_etag=True)
+        EveUniverseEtag.objects.update(expires=now() - dt.timedelta(minutes=1))
+        self._make_stale(EveCategory, 40)
+        # when
+        result = EveCategory.objects.update_stale_esi()
+        # then
+        self.assertEqual(result, 1)
+        self.assertEqual(endpoint.calls[1], {"headers": {"If-None-Match": '"abc"'}})
+        self.assertFalse(EveCategory.objects.stale().exists())
+
 
 @patch(MANAGERS_PATH + ".esi")
 class TestEveMoon(NoSocketsTestCase):
@@ -1007,6 +1501,63 @@ class TestEveSolarSystemDistanceTo(NoSocketsTestCase):
         self.assertIsNone(result)
 
 
+@patch(MANAGERS_PATH + ".esi")
+class TestEveSolarSystemSpatialQueries(NoSocketsTestCase):
+    def setUp(self) -> None:
+        EveSolarSystem.objects.clear_spatial_index()
+
+    def test_should_return_systems_within_distance(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        enaluri, _ = EveSolarSystem.objects.get_or_create_esi(id=30045339)
+        akidagi, _ = EveSolarSystem.objects.get_or_create_esi(id=30045342)
+        EveSolarSystem.objects.get_or_create_esi(id=30000142)  # Jita
+        # when
+        result = EveSolarSystem.objects.systems_within_ly(enaluri.id, 5)
+        # then
+        self.assertSetEqual(set(result.keys()), {akidagi.id})
+        self.assertAlmostEqual(result[akidagi.id], 1.947802326920925)
+
+    def test_should_exclude_wh_and_trig_space(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        enaluri, _ = EveSolarSystem.objects.get_or_create_esi(id=30045339)
+        thera, _ = EveSolarSystem.objects.get_or_create_esi(id=31000005)
+        otela, _ = EveSolarSystem.objects.get_or_create_esi(id=30000157)
+        # when
+        result = EveSolarSystem.objects.distance_matrix(
+            [enaluri.id, thera.id, otela.id]
+        )
+        # then
+        self.assertEqual(result[0][0], 0.0)
+        self.assertTrue(all(math.isnan(value) for value in result[0][1:]))
+        self.assertTrue(all(math.isnan(value) for value in result[1]))
+        self.assertTrue(all(math.isnan(value) for value in result[2]))
+        self.assertDictEqual(
+            EveSolarSystem.objects.systems_within_ly(otela.id, 100), {}
+        )
+
+    def test_should_return_jump_route(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        enaluri, _ = EveSolarSystem.objects.get_or_create_esi(id=30045339)
+        akidagi, _ = EveSolarSystem.objects.get_or_create_esi(id=30045342)
+        # when
+        result = EveSolarSystem.objects.jump_route(enaluri.id, akidagi.id, 2)
+        # then
+        self.assertListEqual(result, [enaluri.id, akidagi.id])
+
+    def test_should_return_same_distances_as_distance_to(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        enaluri, _ = EveSolarSystem.objects.get_or_create_esi(id=30045339)
+        akidagi, _ = EveSolarSystem.objects.get_or_create_esi(id=30045342)
+        # when
+        result = EveSolarSystem.objects.distance_matrix([enaluri.id, akidagi.id])
+        # then
+        self.assertAlmostEqual(result[0][1], meters_to_ly(enaluri.distance_to(akidagi)))
+
+
 @patch(MANAGERS_PATH + ".esi")
 @patch("eveuniverse.models.universe_2.esi")
 class TestEveSolarSystemJumpsTo(NoSocketsTestCase):
@@ -1187,6 +1738,102 @@ class TestEveSolarSystemRouteTo(NoSocketsTestCase):
         self.assertIsNone(result)
 
 
+@patch("eveuniverse.models.universe_2.esi")
+class TestEveSolarSystemLocalRoutes(NoSocketsTestCase):
+    def setUp(self) -> None:
+        EveSolarSystem.objects.clear_stargate_graph()
+
+    @staticmethod
+    def _create_solar_systems(count: int, with_stargates: bool = True) -> list:
+        enabled_sections = 2 if with_stargates else 0  # stargates flag
+        return [
+            EveSolarSystemFactory(
+                security_status=0.9, enabled_sections=enabled_sections
+            )
+            for _ in range(count)
+        ]
+
+    @staticmethod
+    def _connect(system_a, system_b):
+        EveStargateFactory(
+            eve_solar_system=system_a, destination_eve_solar_system=system_b
+        )
+        EveStargateFactory(
+            eve_solar_system=system_b, destination_eve_solar_system=system_a
+        )
+
+    def test_should_calculate_jumps_from_local_map(self, mock_esi):
+        # given
+        system_1, system_2, system_3 = self._create_solar_systems(3)
+        self._connect(system_1, system_2)
+        self._connect(system_2, system_3)
+        # when
+        result = system_1.jumps_to(system_3)
+        # then
+        self.assertEqual(result, 2)
+        self.assertFalse(mock_esi.client.Routes.get_route_origin_destination.called)
+
+    def test_should_calculate_route_from_local_map(self, mock_esi):
+        # given
+        system_1, system_2, system_3 = self._create_solar_systems(3)
+        self._connect(system_1, system_2)
+        self._connect(system_2, system_3)
+        # when
+        result = system_3.route_to(system_1)
+        # then
+        self.assertListEqual(
+            result, [(system_3, False), (system_2, False), (system_1, False)]
+        )
+        self.assertFalse(mock_esi.client.Routes.get_route_origin_destination.called)
+
+    def test_should_fall_back_to_esi_when_map_is_incomplete(self, mock_esi):
+        # given
+        system_1, system_2 = self._create_solar_systems(2, with_stargates=False)
+        mock_esi.client.Routes.get_route_origin_destination.return_value = (
+            BravadoOperationStub([system_1.id, system_2.id])
+        )
+        # when
+        result = system_1.jumps_to(system_2, flag="secure", avoid=[30000142])
+        # then
+        self.assertEqual(result, 1)
+        _, kwargs = mock_esi.client.Routes.get_route_origin_destination.call_args
+        self.assertEqual(kwargs["flag"], "secure")
+        self.assertEqual(kwargs["avoid"], [30000142])
+
+    def test_should_calculate_jumps_matrix(self, mock_esi):
+        # given
+        system_1, system_2, system_3, system_4 = self._create_solar_systems(4)
+        self._connect(system_1, system_2)
+        self._connect(system_2, system_3)
+        # when
+        result = EveSolarSystem.objects.jumps_matrix(
+            [system_1.id, system_2.id], [system_3.id, system_4.id]
+        )
+        # then
+        self.assertListEqual([list(row) for row in result], [[2, -1], [1, -1]])
+
+    def test_should_calculate_jumps_within(self, mock_esi):
+        # given
+        system_1, system_2, system_3 = self._create_solar_systems(3)
+        self._connect(system_1, system_2)
+        self._connect(system_2, system_3)
+        # when
+        result = EveSolarSystem.objects.jumps_within(system_1.id, max_jumps=1)
+        # then
+        self.assertDictEqual(result, {system_1.id: 0, system_2.id: 1})
+
+    def test_should_rebuild_graph_after_clearing(self, mock_esi):
+        # given
+        system_1, system_2 = self._create_solar_systems(2)
+        graph = EveSolarSystem.objects.stargate_graph()
+        self._connect(system_1, system_2)
+        # when
+        EveSolarSystem.objects.clear_stargate_graph()
+        # then
+        self.assertIsNot(EveSolarSystem.objects.stargate_graph(), graph)
+        self.assertEqual(system_1.jumps_to(system_2), 1)
+
+
 @patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_DOGMAS", False)
 @patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
 @patch(MANAGERS_PATH + ".esi")
@@ -1247,6 +1894,25 @@ class TestEveStargate(NoSocketsTestCase):
             EveSolarSystem.objects.get(id=30045342),
         )
 
+    def test_should_clear_stargate_graph_after_bulk_create(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        graph = EveSolarSystem.objects.stargate_graph()
+        # when
+        EveStargate.objects.bulk_get_or_create_esi(ids=[50016284, 50016283])
+        # then
+        self.assertIsNot(EveSolarSystem.objects.stargate_graph(), graph)
+
+    def test_should_clear_stargate_graph_after_update(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveStargate.objects.get_or_create_esi(id=50016284)
+        graph = EveSolarSystem.objects.stargate_graph()
+        # when
+        EveStargate.objects.update_or_create_esi(id=50016284)
+        # then
+        self.assertIsNot(EveSolarSystem.objects.stargate_graph(), graph)
+
 
 @patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_DOGMAS", False)
 @patch(MODELS_PATH + ".EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
@@ -1294,3 +1960,13 @@ class TestEveStation(NoSocketsTestCase):
                 ]
             ),
         )
+
+    def test_should_reuse_existing_services(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        market = EveStationService.objects.create(name="market")
+        # when
+        obj, _ = EveStation.objects.update_or_create_esi(id=60015068)
+        # then
+        self.assertIn(market, obj.services.all())
+        self.assertEqual(EveStationService.objects.count(), 14)
@@ -1,7 +1,9 @@
+import time
 import unittest
 from unittest.mock import patch
 
-from django.test.utils import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from eveuniverse.constants import EveCategoryId
 from eveuniverse.models import (
@@ -17,6 +19,7 @@ from eveuniverse.models import (
     EveMarketGroup,
     EveRegion,
     EveType,
+    EveTypeDogmaAttribute,
     EveTypeDogmaEffect,
     EveUnit,
 )
@@ -90,6 +93,136 @@ class TestEveType(NoSocketsTestCase):
         ).first()
         self.assertTrue(dogma_effect_2.is_default)
 
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_sync_dogmas_when_updating_type(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        stale_attribute, _ = EveDogmaAttribute.objects.get_or_create_esi(id=271)
+        EveTypeDogmaAttribute.objects.create(
+            eve_type=eve_type, eve_dogma_attribute=stale_attribute, value=1
+        )
+        eve_type.dogma_attributes.filter(eve_dogma_attribute_id=588).update(value=99)
+        # when
+        with CaptureQueriesContext(connection) as context:
+            EveType.objects.update_or_create_esi(id=603)
+        # then
+        dogma_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if "eveuniverse_evetypedogmaattribute" in query["sql"]
+        ]
+        self.assertEqual(len(dogma_queries), 2)  # one DELETE and one INSERT
+        self.assertEqual(
+            dict(
+                eve_type.dogma_attributes.values_list("eve_dogma_attribute_id", "value")
+            ),
+            {588: 5, 129: 12},
+        )
+        self.assertEqual(
+            dict(
+                eve_type.dogma_effects.values_list("eve_dogma_effect_id", "is_default")
+            ),
+            {1816: False, 1817: True},
+        )
+
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_delete_dogmas_of_type_which_has_none_anymore(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        eve_type_1, _ = EveType.objects.get_or_create_esi(id=603)
+        eve_type_2, _ = EveType.objects.get_or_create_esi(id=608)
+        # when
+        EveType._update_or_create_inline_objects_for_parents(
+            parent_objs={
+                603: {},
+                608: {"dogma_attributes": [{"attribute_id": 588, "value": 7}]},
+            },
+            enabled_sections={EveType.Section.DOGMAS},
+        )
+        # then
+        self.assertFalse(eve_type_1.dogma_attributes.exists())
+        self.assertFalse(eve_type_1.dogma_effects.exists())
+        self.assertEqual(
+            dict(
+                eve_type_2.dogma_attributes.values_list(
+                    "eve_dogma_attribute_id", "value"
+                )
+            ),
+            {588: 7},
+        )
+
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_skip_inline_objects_without_id(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        # when
+        EveType._update_or_create_inline_objects_for_parents(
+            parent_objs={
+                603: {
+                    "dogma_attributes": [
+                        {"attribute_id": 588, "value": 7},
+                        {"attribute_id": None, "value": 8},
+                        {"value": 9},
+                    ]
+                }
+            },
+            enabled_sections={EveType.Section.DOGMAS},
+        )
+        # then
+        self.assertEqual(
+            dict(
+                eve_type.dogma_attributes.values_list("eve_dogma_attribute_id", "value")
+            ),
+            {588: 7},
+        )
+
+    @patch("eveuniverse.tasks.update_or_create_inline_objects")
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_start_one_task_for_all_dogmas_when_async(self, mock_task, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        EveType.objects.update_or_create_esi(id=603, wait_for_children=False)
+        # then
+        self.assertEqual(mock_task.apply_async.call_count, 1)
+        kwargs = mock_task.apply_async.call_args[1]["kwargs"]
+        self.assertEqual(kwargs["parent_model_name"], "EveType")
+        parent_id, inline_eve_data = kwargs["parent_objs"][0]
+        self.assertEqual(parent_id, 603)
+        self.assertEqual(len(inline_eve_data["dogma_attributes"]), 2)
+        self.assertEqual(len(inline_eve_data["dogma_effects"]), 2)
+
+    @patch("eveuniverse.helpers.connections")
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_create_dogmas_without_upsert_support(
+        self, mock_connections, mock_esi
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        features = mock_connections.__getitem__.return_value.features
+        features.supports_update_conflicts = False
+        # when
+        eve_type, _ = EveType.objects.get_or_create_esi(id=603)
+        # then
+        self.assertEqual(
+            dict(
+                eve_type.dogma_attributes.values_list("eve_dogma_attribute_id", "value")
+            ),
+            {588: 5, 129: 12},
+        )
+
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", True)
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_DOGMAS", False)
     def test_when_disabled_can_create_type_from_esi_excluding_dogmas(self, mock_esi):
@@ -412,6 +545,57 @@ class TestEveUnit(NoSocketsTestCase):
         self.assertEqual(obj.name, "Speed")
 
 
+class TestEveUnitManager(NoSocketsTestCase):
+    def setUp(self) -> None:
+        EveUnit.objects.clear_cache()
+        self.addCleanup(EveUnit.objects.clear_cache)
+
+    def test_should_return_object_from_cache_without_queries(self):
+        # given
+        EveUnit.objects.get_cached(10)
+        # when
+        with self.assertNumQueries(0):
+            obj = EveUnit.objects.get_cached(1)
+        # then
+        self.assertEqual(obj.name, "Length")
+
+    def test_should_fetch_object_missing_in_cache(self):
+        # given
+        EveUnit.objects.all_cached()
+        EveUnit.objects.create(id=999, name="Dummy")
+        # when
+        obj = EveUnit.objects.get_cached(999)
+        # then
+        self.assertEqual(obj.name, "Dummy")
+
+    def test_should_raise_error_when_object_does_not_exist(self):
+        with self.assertRaises(EveUnit.DoesNotExist):
+            EveUnit.objects.get_cached(999)
+
+    def test_should_reload_cache_after_clear(self):
+        # given
+        EveUnit.objects.get_cached(10)
+        EveUnit.objects.filter(id=10).update(name="Dummy")
+        # when
+        EveUnit.objects.clear_cache()
+        obj = EveUnit.objects.get_cached(10)
+        # then
+        self.assertEqual(obj.name, "Dummy")
+
+    def test_should_reload_cache_when_stale(self):
+        # given
+        EveUnit.objects.get_cached(10)
+        EveUnit.objects.filter(id=10).update(name="Dummy")
+        # when
+        with patch(
+            "eveuniverse.helpers.time.monotonic",
+            return_value=time.monotonic() + 3601,
+        ):
+            obj = EveUnit.objects.get_cached(10)
+        # then
+        self.assertEqual(obj.name, "Dummy")
+
+
 class TestEsiMapping(NoSocketsTestCase):
     maxDiff = None
 
@@ -690,6 +874,39 @@ class TestEsiMapping(NoSocketsTestCase):
             },
         )
 
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MARKET_GROUPS", False)
+    def test_should_reuse_mapping_for_same_sections(self):
+        # when
+        mapping_1 = EveType._esi_field_mappings({EveType.Section.GRAPHICS})
+        mapping_2 = EveType._esi_field_mappings({EveType.Section.GRAPHICS})
+        mapping_3 = EveType._esi_field_mappings()
+        # then
+        self.assertIs(mapping_1, mapping_2)
+        self.assertIn("eve_graphic", mapping_1)
+        self.assertNotIn("eve_graphic", mapping_3)
+
+    def test_should_respect_current_settings_for_mapping(self):
+        # when
+        with patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", True):
+            mapping_1 = EveType._esi_field_mappings()
+        with patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_GRAPHICS", False):
+            mapping_2 = EveType._esi_field_mappings()
+        # then
+        self.assertIn("eve_graphic", mapping_1)
+        self.assertNotIn("eve_graphic", mapping_2)
+
+    def test_should_get_values_from_esi_data(self):
+        # given
+        getter_1 = EveType._esi_value_getter("name")
+        getter_2 = EveType._esi_value_getter(("position", "x"))
+        # when/then
+        self.assertEqual(getter_1({"name": "alpha"}), "alpha")
+        self.assertIsNone(getter_1({}))
+        self.assertEqual(getter_2({"position": {"x": 1.5}}), 1.5)
+        self.assertIsNone(getter_2({"position": {}}))
+        self.assertIsNone(getter_2({}))
+
 
 class TestDetermineEnabledSections(NoSocketsTestCase):
     def test_should_return_empty_1(self):
@@ -1,11 +1,15 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
 
 from eveuniverse.constants import EveGroupId
 from eveuniverse.core import evesdeapi
 from eveuniverse.models import (
     EveAsteroidBelt,
+    EveConstellation,
     EveMoon,
     EvePlanet,
+    EveRegion,
     EveSolarSystem,
     EveStar,
     EveStargate,
@@ -110,6 +114,36 @@ class TestEveSolarSystemWithSections(NoSocketsTestCase):
     #         set(obj.eve_planets.values_list("id", flat=True)), {40349467, 40349471}
     #     )
 
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_ASTEROID_BELTS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MOONS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", True)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STATIONS", False)
+    def test_should_fetch_solar_system_only_once_when_loading_children(self, mock_esi):
+        # given
+        cache.clear()
+        self.addCleanup(cache.clear)
+        mock_esi.client = EsiClientStub()
+        endpoint = Mock(wraps=mock_esi.client.Universe.get_universe_systems_system_id)
+        # when
+        with patch.object(
+            mock_esi.client.Universe, "get_universe_systems_system_id", endpoint
+        ):
+            obj, _ = EveSolarSystem.objects.update_or_create_esi(
+                id=30045339, include_children=True
+            )
+        # then
+        self.assertEqual(endpoint.call_count, 1)
+        self.assertEqual(
+            set(EveMoon.objects.values_list("id", flat=True)),
+            {40349468, 40349472, 40349473},
+        )
+        self.assertEqual(
+            set(EveAsteroidBelt.objects.values_list("eve_planet_id", flat=True)),
+            {40349471},
+        )
+
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", True)
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARS", False)
@@ -275,6 +309,92 @@ class TestEveSolarSystemWithSections(NoSocketsTestCase):
         )
 
 
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_ASTEROID_BELTS", False)
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_MOONS", False)
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARS", False)
+@patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STATIONS", False)
+@patch(MANAGERS_PATH + ".esi")
+class TestEveRegionUpdateOrCreateTree(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_should_load_region_with_all_children(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = EveRegion.objects.update_or_create_tree_esi(ids=[10000069])
+        # then
+        self.assertDictEqual(
+            result, {"EveRegion": 1, "EveConstellation": 1, "EveSolarSystem": 1}
+        )
+        self.assertEqual(
+            EveConstellation.objects.get(id=20000785).eve_region_id, 10000069
+        )
+        solar_system = EveSolarSystem.objects.get(id=30045339)
+        self.assertEqual(solar_system.eve_constellation_id, 20000785)
+        self.assertFalse(solar_system.enabled_sections.planets)
+        self.assertFalse(EvePlanet.objects.exists())
+
+    def test_should_load_region_with_planets_and_moons(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        endpoint = Mock(wraps=mock_esi.client.Universe.get_universe_systems_system_id)
+        # when
+        with patch.object(
+            mock_esi.client.Universe, "get_universe_systems_system_id", endpoint
+        ):
+            result = EveRegion.objects.update_or_create_tree_esi(
+                ids=[10000069],
+                enabled_sections=[
+                    EveSolarSystem.Section.PLANETS,
+                    EvePlanet.Section.MOONS,
+                    EvePlanet.Section.ASTEROID_BELTS,
+                ],
+            )
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                "EveRegion": 1,
+                "EveConstellation": 1,
+                "EveSolarSystem": 1,
+                "EvePlanet": 2,
+                "EveMoon": 3,
+                "EveAsteroidBelt": 1,
+            },
+        )
+        self.assertEqual(endpoint.call_count, 1)
+        solar_system = EveSolarSystem.objects.get(id=30045339)
+        self.assertTrue(solar_system.enabled_sections.planets)
+        planet = EvePlanet.objects.get(id=40349471)
+        self.assertTrue(planet.enabled_sections.moons)
+        self.assertTrue(planet.enabled_sections.asteroid_belts)
+        self.assertEqual(
+            set(planet.eve_moons.values_list("id", flat=True)), {40349472, 40349473}
+        )
+        self.assertEqual(
+            set(planet.eve_asteroid_belts.values_list("id", flat=True)), {40349487}
+        )
+
+    def test_should_keep_existing_sections(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveSolarSystem.objects.update_or_create_esi(
+            id=30045339, enabled_sections=[EveSolarSystem.Section.STARS]
+        )
+        # when
+        EveRegion.objects.update_or_create_tree_esi(
+            ids=[10000069], enabled_sections=[EveSolarSystem.Section.PLANETS]
+        )
+        # then
+        solar_system = EveSolarSystem.objects.get(id=30045339)
+        self.assertTrue(solar_system.enabled_sections.stars)
+        self.assertTrue(solar_system.enabled_sections.planets)
+
+
 @patch(MANAGERS_PATH + ".esi")
 class TestEveSolarSystemBulkWithSection(NoSocketsTestCase):
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", True)
@@ -380,8 +500,9 @@ class TestEveSolarSystemBulkWithSection(NoSocketsTestCase):
         )
 
     @patch(
-        MODELS_PATH + ".universe_2.EveSolarSystem.objects.update_or_create_esi",
-        wraps=EveSolarSystem.objects.update_or_create_esi,
+        MODELS_PATH
+        + ".universe_2.EveSolarSystem.objects._update_or_create_related_objects",
+        wraps=EveSolarSystem.objects._update_or_create_related_objects,
     )
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
@@ -415,8 +536,9 @@ class TestEveSolarSystemBulkWithSection(NoSocketsTestCase):
         self.assertEqual(spy_manager.call_count, 3)
 
     @patch(
-        MODELS_PATH + ".universe_2.EveSolarSystem.objects.update_or_create_esi",
-        wraps=EveSolarSystem.objects.update_or_create_esi,
+        MODELS_PATH
+        + ".universe_2.EveSolarSystem.objects._update_or_create_related_objects",
+        wraps=EveSolarSystem.objects._update_or_create_related_objects,
     )
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
     @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
@@ -453,6 +575,66 @@ class TestEveSolarSystemBulkWithSection(NoSocketsTestCase):
         )
         self.assertEqual(spy_manager.call_count, 2)
 
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STATIONS", False)
+    def test_should_keep_existing_sections_when_updating_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        EveSolarSystem.objects.get_or_create_esi(
+            id=30045339,
+            include_children=True,
+            enabled_sections=[EveSolarSystem.Section.STARS],
+        )
+        # when
+        EveSolarSystem.objects.bulk_get_or_create_esi(
+            ids=[30000142, 30045339],
+            include_children=True,
+            enabled_sections=[EveSolarSystem.Section.PLANETS],
+        )
+        # then
+        obj = EveSolarSystem.objects.get(id=30045339)
+        self.assertTrue(obj.enabled_sections.stars)
+        self.assertTrue(obj.enabled_sections.planets)
+        obj = EveSolarSystem.objects.get(id=30000142)
+        self.assertFalse(obj.enabled_sections.stars)
+        self.assertTrue(obj.enabled_sections.planets)
+
+    @patch("eveuniverse.helpers.connections")
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_PLANETS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARGATES", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STARS", False)
+    @patch(MODELS_PATH + ".base.EVEUNIVERSE_LOAD_STATIONS", False)
+    def test_should_update_in_bulk_without_upsert_support(
+        self, mock_connections, mock_esi
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        features = mock_connections.__getitem__.return_value.features
+        features.supports_update_conflicts = False
+        features.supports_update_conflicts_with_target = False
+        EveSolarSystem.objects.get_or_create_esi(
+            id=30045339, enabled_sections=[EveSolarSystem.Section.STARS]
+        )
+        EveSolarSystem.objects.filter(id=30045339).update(name="dummy")
+        # when
+        EveSolarSystem.objects.bulk_get_or_create_esi(
+            ids=[30000142, 30045339],
+            include_children=True,
+            enabled_sections=[EveSolarSystem.Section.PLANETS],
+        )
+        # then
+        obj = EveSolarSystem.objects.get(id=30045339)
+        self.assertEqual(obj.name, "Enaluri")
+        self.assertTrue(obj.enabled_sections.stars)
+        self.assertTrue(obj.enabled_sections.planets)
+        self.assertTrue(EveSolarSystem.objects.filter(id=30000142).exists())
+        self.assertEqual(
+            set(EvePlanet.objects.values_list("id", flat=True)),
+            {40009077, 40349467, 40349471},
+        )
+
 
 @patch(MANAGERS_PATH + ".esi")
 class TestEvePlanetWithSections(NoSocketsTestCase):
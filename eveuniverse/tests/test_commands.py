@@ -1,10 +1,20 @@
+import datetime as dt
 from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test.utils import override_settings
-
-from eveuniverse.models import EveCategory, EveGroup, EveType
+from django.utils.timezone import now
+
+from eveuniverse.models import (
+    EveCategory,
+    EveGroup,
+    EveSolarSystem,
+    EveStargate,
+    EveType,
+)
 from eveuniverse.utils import NoSocketsTestCase
 
 from .testdata.esi import EsiClientStub
@@ -13,6 +23,7 @@ from .testdata.factories_2 import (
     EvePlanetFactory,
     EveSolarSystemFactory,
 )
+from .testdata.sde import create_sde_dump
 
 MODELS_PATH = "eveuniverse.models.base"
 PACKAGE_PATH = "eveuniverse.management.commands"
@@ -345,3 +356,112 @@ class TestFixSections(NoSocketsTestCase):
         # then
         obj.refresh_from_db()
         self.assertTrue(obj.enabled_sections.moons)
+
+
+@patch(PACKAGE_PATH + ".eveuniverse_load_sde.get_input")
+class TestLoadSdeCommand(NoSocketsTestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+        create_sde_dump(self.path)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_should_load_types_and_map(self, mock_get_input):
+        # given
+        mock_get_input.return_value = "y"
+        # when
+        call_command(
+            "eveuniverse_load_sde", str(self.path), "types", "map", stdout=StringIO()
+        )
+        # then
+        self.assertTrue(EveType.objects.filter(id=29624).exists())
+        self.assertTrue(EveSolarSystem.objects.filter(id=30000142).exists())
+        self.assertEqual(EveStargate.objects.count(), 2)
+
+    def test_should_load_types_only(self, mock_get_input):
+        # when
+        call_command(
+            "eveuniverse_load_sde",
+            str(self.path),
+            "types",
+            "--noinput",
+            stdout=StringIO(),
+        )
+        # then
+        self.assertTrue(EveType.objects.filter(id=29624).exists())
+        self.assertFalse(EveSolarSystem.objects.exists())
+        self.assertFalse(mock_get_input.called)
+
+    def test_should_abort_when_user_declines(self, mock_get_input):
+        # given
+        mock_get_input.return_value = "n"
+        # when
+        call_command("eveuniverse_load_sde", str(self.path), "types", stdout=StringIO())
+        # then
+        self.assertFalse(EveType.objects.exists())
+
+    def test_should_raise_error_when_path_not_found(self, mock_get_input):
+        # when/then
+        with self.assertRaises(CommandError):
+            call_command(
+                "eveuniverse_load_sde",
+                str(self.path / "unknown"),
+                "types",
+                "--noinput",
+                stdout=StringIO(),
+            )
+        self.assertFalse(mock_get_input.called)
+
+
+@patch(PACKAGE_PATH + ".eveuniverse_update_stale.is_esi_online", lambda: True)
+@patch(PACKAGE_PATH + ".eveuniverse_update_stale.get_input")
+@patch("eveuniverse.managers.universe.esi")
+class TestUpdateStaleCommand(NoSocketsTestCase):
+    def setUp(self) -> None:
+        with patch("eveuniverse.managers.universe.esi") as mock_esi:
+            mock_esi.client = EsiClientStub()
+            for id in [2, 3]:
+                EveCategory.objects.update_or_create_esi(id=id)
+        EveCategory.objects.update(
+            name="Dummy", last_updated=now() - dt.timedelta(days=40)
+        )
+
+    def test_should_update_stale_objects(self, mock_esi, mock_get_input):
+        # given
+        mock_esi.client = EsiClientStub()
+        mock_get_input.return_value = "y"
+        out = StringIO()
+        # when
+        call_command("eveuniverse_update_stale", stdout=out)
+        # then
+        self.assertFalse(EveCategory.objects.filter(name="Dummy").exists())
+        self.assertIn("EveCategory: 2 of 2", out.getvalue())
+
+    def test_should_update_stale_objects_up_to_max_objects(
+        self, mock_esi, mock_get_input
+    ):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        call_command(
+            "eveuniverse_update_stale",
+            "--model",
+            "EveCategory",
+            "--max_objects",
+            "1",
+            "--noinput",
+            stdout=StringIO(),
+        )
+        # then
+        self.assertEqual(EveCategory.objects.filter(name="Dummy").count(), 1)
+        self.assertFalse(mock_get_input.called)
+
+    def test_can_abort(self, mock_esi, mock_get_input):
+        # given
+        mock_get_input.return_value = "n"
+        # when
+        call_command("eveuniverse_update_stale", stdout=StringIO())
+        # then
+        self.assertEqual(EveCategory.objects.filter(name="Dummy").count(), 2)
@@ -1,3 +1,10 @@
+import bz2
+import json
+import math
+import sqlite3
+from array import array
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest.mock import Mock, patch
 
 import requests_mock
@@ -17,8 +24,13 @@ from eveuniverse.core import (
     eveskinserver,
     evewho,
     evexml,
+    industry,
+    routes,
+    sdefiles,
+    spatial,
     zkillboard,
 )
+from eveuniverse.helpers import meters_to_ly
 from eveuniverse.models import EveEntity
 from eveuniverse.utils import NoSocketsTestCase
 
@@ -630,3 +642,472 @@ class TestEveSdeApiNearestCelestial(TestCase):
         )
         # then
         self.assertEqual(result.id, 40170699)
+
+
+class TestBillOfMaterials(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # product 10 from blueprint 1: 2x 20 + 3x 30
+        # product 20 from blueprint 2 (2 per run): 5x 100 + 1x 30
+        # product 30 from blueprint 3: 4x 100 + 1x 101
+        cls.bom = industry.BillOfMaterials(
+            products=[(1, 10, 1), (2, 20, 2), (3, 30, 1), (4, 30, 1)],
+            materials=[
+                (1, 20, 2),
+                (1, 30, 3),
+                (2, 100, 5),
+                (2, 30, 1),
+                (3, 100, 4),
+                (3, 101, 1),
+                (4, 102, 1),
+            ],
+        )
+
+    def test_should_have_buildable_products(self):
+        self.assertEqual(len(self.bom), 3)
+        self.assertIn(20, self.bom)
+        self.assertNotIn(100, self.bom)
+
+    def test_should_use_blueprint_with_lowest_id(self):
+        self.assertEqual(self.bom.blueprint_id(30), 3)
+        self.assertIsNone(self.bom.blueprint_id(100))
+
+    def test_should_return_materials_for_one_run(self):
+        self.assertDictEqual(self.bom.materials(20), {30: 1, 100: 5})
+        self.assertDictEqual(self.bom.materials(100), {})
+
+    def test_should_expand_build_tree_into_raw_materials(self):
+        # when
+        result = self.bom.raw_materials({10: 1})
+        # then
+        # 2x 20 = 1 run = 5x 100 + 1x 30 => 4x 30 in total = 16x 100 + 4x 101
+        self.assertDictEqual(result, {100: 21, 101: 4})
+
+    def test_should_aggregate_several_products(self):
+        # when
+        result = self.bom.raw_materials({10: 2, 30: 1, 100: 3})
+        # then
+        self.assertDictEqual(result, {100: 49, 101: 9})
+
+    def test_should_round_up_totals(self):
+        # when
+        result = self.bom.raw_materials({20: 1})
+        # then
+        # 2.5x 100 + 0.5x 30 = 4.5x 100 + 0.5x 101
+        self.assertDictEqual(result, {100: 5, 101: 1})
+
+    def test_should_return_raw_material_itself(self):
+        self.assertDictEqual(self.bom.raw_materials({100: 7}), {100: 7})
+
+    def test_should_stop_at_circular_build_trees(self):
+        # given
+        bom = industry.BillOfMaterials(
+            products=[(1, 10, 1), (2, 20, 1)],
+            materials=[(1, 20, 1), (1, 100, 1), (2, 10, 1)],
+        )
+        # when
+        result = bom.raw_materials({10: 1})
+        # then
+        self.assertDictEqual(result, {10: 1, 100: 1})
+
+    def test_should_expand_circular_build_trees_from_both_ends(self):
+        # given
+        products = [(1, 10, 1), (2, 20, 1)]
+        materials = [(1, 20, 1), (1, 100, 1), (2, 10, 1), (2, 101, 1)]
+        bom_1 = industry.BillOfMaterials(products=products, materials=materials)
+        bom_2 = industry.BillOfMaterials(products=products, materials=materials)
+        # when
+        result_1 = [bom_1.raw_materials({10: 1}), bom_1.raw_materials({20: 1})]
+        result_2 = [bom_2.raw_materials({20: 1}), bom_2.raw_materials({10: 1})]
+        # then
+        self.assertDictEqual(result_1[0], {10: 1, 100: 1, 101: 1})
+        self.assertDictEqual(result_1[1], {20: 1, 100: 1, 101: 1})
+        self.assertDictEqual(result_1[0], result_2[1])
+        self.assertDictEqual(result_1[1], result_2[0])
+
+
+class TestMaterialMatrix(TestCase):
+    def setUp(self) -> None:
+        self.matrix = industry.MaterialMatrix(
+            [(1, 10, 2), (1, 20, 3), (2, 20, 1), (2, 30, 5)]
+        )
+
+    def test_should_have_types_and_materials(self):
+        self.assertEqual(len(self.matrix), 2)
+        self.assertIn(1, self.matrix)
+        self.assertNotIn(10, self.matrix)
+        self.assertTupleEqual(self.matrix.material_ids, (10, 20, 30))
+
+    def test_should_calculate_values(self):
+        # when
+        result = self.matrix.values({10: 5.0, 20: 7.0})
+        # then
+        self.assertDictEqual(result, {1: 31.0, 2: 7.0})
+
+    def test_should_handle_empty_matrix(self):
+        # given
+        matrix = industry.MaterialMatrix([])
+        # when/then
+        self.assertEqual(len(matrix), 0)
+        self.assertDictEqual(matrix.values({10: 5.0}), {})
+
+
+class TestStargateGraph(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 1 - 2 - 3 - 4
+        #  \         /
+        #   5 ----- 6
+        cls.graph = routes.StargateGraph(
+            connections=[(1, 2), (2, 3), (3, 4), (1, 5), (5, 6), (6, 4)],
+            security_status={1: 0.9, 2: 0.1, 3: 0.2, 4: 0.8, 5: 0.7, 6: 0.5},
+            complete_ids=[1, 2, 3, 4, 5, 6],
+        )
+
+    def test_should_return_shortest_route(self):
+        # when
+        result = self.graph.route(2, 4)
+        # then
+        self.assertListEqual(result, [2, 3, 4])
+
+    def test_should_return_route_in_reverse_direction(self):
+        # when
+        result = self.graph.route(4, 2)
+        # then
+        self.assertListEqual(result, [4, 3, 2])
+
+    def test_should_return_route_to_itself(self):
+        # when
+        result = self.graph.route(1, 1)
+        # then
+        self.assertListEqual(result, [1])
+
+    def test_should_return_jumps(self):
+        # when
+        result = self.graph.jumps(1, 3)
+        # then
+        self.assertEqual(result, 2)
+
+    def test_should_avoid_systems(self):
+        # when
+        result = self.graph.route(2, 4, avoid=[3])
+        # then
+        self.assertListEqual(result, [2, 1, 5, 6, 4])
+
+    def test_should_return_none_when_destination_is_avoided(self):
+        # when
+        result = self.graph.route(2, 4, avoid=[4])
+        # then
+        self.assertIsNone(result)
+
+    def test_should_prefer_high_sec_for_secure_routes(self):
+        # when
+        result = self.graph.route(1, 4, flag="secure")
+        # then
+        self.assertListEqual(result, [1, 5, 6, 4])
+
+    def test_should_prefer_low_sec_for_insecure_routes(self):
+        # when
+        result = self.graph.route(1, 4, flag=routes.RouteFlag.INSECURE)
+        # then
+        self.assertListEqual(result, [1, 2, 3, 4])
+
+    def test_should_return_none_when_no_route_exists(self):
+        # given
+        graph = routes.StargateGraph(
+            connections=[(1, 2), (3, 4)], security_status={}, complete_ids=[1, 2, 3, 4]
+        )
+        # when
+        result = graph.route(1, 4)
+        # then
+        self.assertIsNone(result)
+
+    def test_should_raise_error_when_endpoint_is_incomplete(self):
+        # given
+        graph = routes.StargateGraph(
+            connections=[(1, 2)], security_status={}, complete_ids=[1]
+        )
+        # when/then
+        with self.assertRaises(routes.IncompleteMapError):
+            graph.route(1, 3)
+
+    def test_should_raise_error_when_route_passes_incomplete_system(self):
+        # given
+        graph = routes.StargateGraph(
+            connections=[(1, 2), (2, 3)], security_status={}, complete_ids=[1, 3]
+        )
+        # when/then
+        with self.assertRaises(routes.IncompleteMapError):
+            graph.route(1, 3)
+
+    def test_should_return_jumps_to_all_reachable_systems(self):
+        # when
+        result = self.graph.jumps_from(1)
+        # then
+        self.assertDictEqual(result, {1: 0, 2: 1, 5: 1, 3: 2, 6: 2, 4: 3})
+
+    def test_should_return_jumps_within_max_jumps(self):
+        # when
+        result = self.graph.jumps_from(1, max_jumps=1)
+        # then
+        self.assertDictEqual(result, {1: 0, 2: 1, 5: 1})
+
+    def test_should_return_jumps_matrix(self):
+        # given
+        graph = routes.StargateGraph(
+            connections=[(1, 2), (2, 3), (4, 5)],
+            security_status={},
+            complete_ids=[1, 2, 3, 4, 5],
+        )
+        # when
+        result = graph.jumps_matrix([1, 3], [3, 1, 5])
+        # then
+        self.assertListEqual([list(row) for row in result], [[2, 0, -1], [0, 2, -1]])
+        self.assertTrue(all(row.typecode == "i" for row in result))
+
+    def test_should_reuse_jumps_of_earlier_origins_for_symmetric_matrix(self):
+        # given
+        graph = routes.StargateGraph(
+            connections=[(1, 2), (2, 3), (3, 4)],
+            security_status={},
+            complete_ids=[1, 2, 3, 4],
+        )
+        ids = [1, 2, 3, 4]
+        # when
+        with patch.object(graph, "jumps_from", wraps=graph.jumps_from) as spy:
+            result = graph.jumps_matrix(ids, ids)
+        # then
+        self.assertListEqual(
+            [list(row) for row in result],
+            [[0, 1, 2, 3], [1, 0, 1, 2], [2, 1, 0, 1], [3, 2, 1, 0]],
+        )
+        self.assertEqual(spy.call_count, 3)
+        self.assertSetEqual(set(spy.call_args_list[1].kwargs["targets"]), {3, 4})
+
+    def test_should_raise_error_for_invalid_flag(self):
+        # when/then
+        with self.assertRaises(ValueError):
+            self.graph.route(1, 4, flag="invalid")
+
+
+class TestSpatialIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        light_year = 1 / meters_to_ly(1)
+        cls.index = spatial.SpatialIndex(
+            [
+                (1, 0, 0, 0, 0.9, 10),
+                (2, 3 * light_year, 0, 0, 0.4, 10),
+                (3, 0, 4 * light_year, 0, -0.2, 11),
+                (4, -10 * light_year, 0, 0, 0.5, 11),
+            ]
+        )
+
+    def test_should_return_distance(self):
+        # when
+        result = self.index.distance(2, 3)
+        # then
+        self.assertAlmostEqual(result, 5)
+
+    def test_should_return_none_as_distance_for_unknown_systems(self):
+        # when
+        result = self.index.distance(1, 99)
+        # then
+        self.assertIsNone(result)
+
+    def test_should_return_systems_within_distance(self):
+        # when
+        result = self.index.systems_within(1, 4)
+        # then
+        self.assertSetEqual(set(result.keys()), {2, 3})
+        self.assertAlmostEqual(result[2], 3)
+        self.assertAlmostEqual(result[3], 4)
+
+    def test_should_return_systems_within_distance_spanning_many_cells(self):
+        # when
+        result = self.index.systems_within(2, 13)
+        # then
+        self.assertSetEqual(set(result.keys()), {1, 3, 4})
+
+    def test_should_return_empty_dict_for_unknown_origin(self):
+        # when
+        result = self.index.systems_within(99, 10)
+        # then
+        self.assertDictEqual(result, {})
+
+    def test_should_return_distance_matrix(self):
+        # when
+        result = self.index.distance_matrix([1, 2, 99])
+        # then
+        self.assertEqual(result[0][0], 0)
+        self.assertAlmostEqual(result[0][1], 3)
+        self.assertAlmostEqual(result[1][0], 3)
+        self.assertAlmostEqual(result.distance(1, 0), 3)
+        self.assertTrue(math.isnan(result[0][2]))
+        self.assertTrue(math.isnan(result[2][2]))
+
+    def test_should_return_distance_matrix_as_compact_rows(self):
+        # when
+        result = self.index.distance_matrix([1, 2, 3, 99])
+        # then
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result.shape, (4, 4))
+        self.assertTupleEqual(result.ids, (1, 2, 3, 99))
+        rows = list(result)
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertIsInstance(row, array)
+            self.assertEqual(row.typecode, "d")
+            self.assertEqual(len(row), 4)
+        self.assertAlmostEqual(result[-2][0], 4)
+
+    def test_should_return_position_with_properties(self):
+        # when
+        result = self.index.position(4)
+        # then
+        self.assertAlmostEqual(result.x, -10)
+        self.assertTrue(result.is_high_sec)
+        self.assertEqual(result.region_id, 11)
+
+
+class TestSpatialIndexJumpRoute(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        light_year = 1 / meters_to_ly(1)
+        cls.index = spatial.SpatialIndex(
+            [
+                (1, 0, 0, 0, 0.2, 10),
+                (2, 4 * light_year, 0, 0, 0.3, 10),
+                (3, 4 * light_year, 3 * light_year, 0, -0.1, 10),
+                (4, 8 * light_year, 0, 0, 0.1, 10),
+                (5, 6 * light_year, 0, 0, 0.9, 10),  # high sec
+                (6, 12 * light_year, 0, 0, 0.9, 10),  # high sec
+                (7, 50 * light_year, 0, 0, -0.5, 10),
+            ]
+        )
+
+    def test_should_return_route_with_least_jumps(self):
+        # when
+        result = self.index.jump_route(1, 4, 5)
+        # then
+        self.assertListEqual(result, [1, 2, 4])
+
+    def test_should_return_direct_jump_when_in_range(self):
+        # when
+        result = self.index.jump_route(1, 4, 8)
+        # then
+        self.assertListEqual(result, [1, 4])
+
+    def test_should_prefer_shorter_total_distance_for_same_jumps(self):
+        # when
+        result = self.index.jump_route(1, 3, 4)
+        # then
+        self.assertListEqual(result, [1, 2, 3])
+
+    def test_should_not_jump_through_high_sec(self):
+        # when
+        result = self.index.jump_route(2, 4, 2.5)
+        # then
+        self.assertIsNone(result)
+
+    def test_should_not_jump_into_high_sec(self):
+        # when
+        result = self.index.jump_route(1, 6, 10)
+        # then
+        self.assertIsNone(result)
+
+    def test_should_return_none_when_out_of_range(self):
+        # when
+        result = self.index.jump_route(1, 7, 10)
+        # then
+        self.assertIsNone(result)
+
+    def test_should_return_none_for_unknown_systems(self):
+        # when
+        result = self.index.jump_route(1, 99, 10)
+        # then
+        self.assertIsNone(result)
+
+
+class TestSdeSource(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_should_read_rows_from_csv_file(self):
+        # given
+        (self.path / "invCategories.csv").write_text(
+            "categoryID,categoryName,iconID\n6,Ship,None\n"
+        )
+        source = sdefiles.SdeSource(self.path)
+        # when
+        result = list(source.iter_rows("invCategories"))
+        # then
+        self.assertListEqual(
+            result, [{"categoryID": "6", "categoryName": "Ship", "iconID": None}]
+        )
+
+    def test_should_read_rows_from_compressed_csv_file(self):
+        # given
+        with bz2.open(self.path / "invCategories.csv.bz2", "wt") as file:
+            file.write("categoryID,categoryName\n6,Ship\n")
+        source = sdefiles.SdeSource(self.path)
+        # when
+        result = list(source.iter_rows("invCategories"))
+        # then
+        self.assertListEqual(result, [{"categoryID": "6", "categoryName": "Ship"}])
+
+    def test_should_read_rows_from_json_file(self):
+        # given
+        (self.path / "invCategories.json").write_text(
+            json.dumps([{"categoryID": 6, "categoryName": "Ship"}])
+        )
+        source = sdefiles.SdeSource(self.path)
+        # when
+        result = list(source.iter_rows("invCategories"))
+        # then
+        self.assertListEqual(result, [{"categoryID": 6, "categoryName": "Ship"}])
+
+    def test_should_read_rows_from_sqlite_file(self):
+        # given
+        path = self.path / "sde.sqlite"
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE "invCategories" (categoryID INTEGER, categoryName TEXT)'
+        )
+        connection.execute("INSERT INTO invCategories VALUES (6, 'Ship')")
+        connection.commit()
+        connection.close()
+        source = sdefiles.SdeSource(path)
+        # when
+        result = list(source.iter_rows("invCategories"))
+        # then
+        self.assertTrue(source.is_sqlite)
+        self.assertListEqual(result, [{"categoryID": 6, "categoryName": "Ship"}])
+
+    def test_should_report_existing_tables(self):
+        # given
+        (self.path / "invCategories.csv").write_text("categoryID\n6\n")
+        source = sdefiles.SdeSource(self.path)
+        # when/then
+        self.assertTrue(source.has_table("invCategories"))
+        self.assertFalse(source.has_table("invGroups"))
+
+    def test_should_raise_error_when_table_not_found(self):
+        # given
+        source = sdefiles.SdeSource(self.path)
+        # when/then
+        with self.assertRaises(sdefiles.SdeTableNotFound):
+            list(source.iter_rows("invGroups"))
+
+    def test_should_raise_error_when_path_not_found(self):
+        # when/then
+        with self.assertRaises(FileNotFoundError):
+            sdefiles.SdeSource(self.path / "unknown")
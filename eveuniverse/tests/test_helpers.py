@@ -1,11 +1,25 @@
+import datetime as dt
+import json
+import time
+from array import array
+from unittest.mock import Mock, patch
+
+from django.utils.timezone import now
+
 from eveuniverse.helpers import (
     EveEntityNameResolver,
+    InMemoryCache,
+    bulk_upsert,
     dict_hash,
     get_or_create_esi_or_none,
+    is_high_sec,
+    iter_json_array,
     meters_to_au,
     meters_to_ly,
+    pack_array,
+    unpack_array,
 )
-from eveuniverse.models import EveEntity
+from eveuniverse.models import EveEntity, EveUniverseEtag
 from eveuniverse.utils import NoSocketsTestCase
 
 from .testdata.factories import create_eve_entity
@@ -24,6 +38,12 @@ class TestHelpers(NoSocketsTestCase):
         with self.assertRaises(ValueError):
             meters_to_au("invalid")
 
+    def test_is_high_sec(self):
+        self.assertTrue(is_high_sec(1.0))
+        self.assertTrue(is_high_sec(0.45))
+        self.assertFalse(is_high_sec(0.44))
+        self.assertFalse(is_high_sec(-0.5))
+
 
 class TestGetOrCreateEsiOrNone(NoSocketsTestCase):
     def test_return_obj_when_property_found(self):
@@ -53,6 +73,23 @@ class TestEveEntityNameResolver(NoSocketsTestCase):
         self.assertEqual(resolver.to_name(2), "bravo")
         self.assertEqual(resolver.to_name(4), "")
 
+    def test_to_names(self):
+        # given
+        resolver = EveEntityNameResolver({1: "alpha", 2: "bravo", 3: "charlie"})
+        # when
+        result = resolver.to_names([1, 3, 4])
+        # then
+        self.assertDictEqual(result, {1: "alpha", 3: "charlie", 4: ""})
+
+    def test_to_category(self):
+        # given
+        resolver = EveEntityNameResolver(
+            {1: "alpha", 2: "bravo"}, {1: "character", 2: "corporation"}
+        )
+        # when/then
+        self.assertEqual(resolver.to_category(2), "corporation")
+        self.assertEqual(resolver.to_category(3), "")
+
 
 class TestDictHash(NoSocketsTestCase):
     def test_should_create_string(self):
@@ -67,3 +104,167 @@ class TestDictHash(NoSocketsTestCase):
         self.assertIsInstance(hash_1a, str)
         self.assertEqual(hash_1a, hash_1b)
         self.assertNotEqual(hash_1a, hash_2)
+
+
+class TestIterJsonArray(NoSocketsTestCase):
+    def test_should_return_items_from_chunks(self):
+        # given
+        data = [{"typeID": 1, "name": "Alpha ]["}, 12345, 1.5e-10, None, [1, [2]]]
+        text = json.dumps(data)
+        for chunk_size in [1, 2, 7, len(text)]:
+            with self.subTest(chunk_size=chunk_size):
+                chunks = (
+                    text[i : i + chunk_size] for i in range(0, len(text), chunk_size)
+                )
+                # when
+                result = list(iter_json_array(chunks))
+                # then
+                self.assertListEqual(result, data)
+
+    def test_should_return_no_items_for_empty_array(self):
+        # when
+        result = list(iter_json_array([" [", " ] "]))
+        # then
+        self.assertListEqual(result, [])
+
+    def test_should_raise_error_for_invalid_arrays(self):
+        for text in ["", "{}", "[1 2]", "[1,]", "[1, 2"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array([text]))
+
+
+class TestPackArray(NoSocketsTestCase):
+    def test_should_pack_and_unpack_array(self):
+        # given
+        values = array("d", [1.5, -2.0, 3.25])
+        # when
+        result = unpack_array("d", pack_array(values))
+        # then
+        self.assertEqual(result, values)
+
+    def test_should_pack_in_little_endian_byte_order(self):
+        # when
+        result = pack_array(array("q", [1]))
+        # then
+        self.assertEqual(result, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+
+
+class TestBulkUpsert(NoSocketsTestCase):
+    def _run_with_and_without_upsert_support(self, test_func):
+        with self.subTest(upsert_support=True):
+            test_func()
+        with self.subTest(upsert_support=False):
+            with patch("eveuniverse.helpers.connections") as mock_connections:
+                features = mock_connections.__getitem__.return_value.features
+                features.supports_update_conflicts = False
+                test_func()
+
+    def test_should_create_new_and_update_existing_objs(self):
+        def test_func():
+            # given
+            EveEntity.objects.all().delete()
+            create_eve_entity(id=1001, name="alpha")
+            EveEntity.objects.filter(id=1001).update(
+                last_updated=now() - dt.timedelta(days=1)
+            )
+            # when
+            bulk_upsert(
+                EveEntity.objects,
+                [EveEntity(id=1001, name="bravo"), EveEntity(id=1002, name="charlie")],
+                unique_fields=["id"],
+                update_fields=["name", "last_updated"],
+            )
+            # then
+            obj = EveEntity.objects.get(id=1001)
+            self.assertEqual(obj.name, "bravo")
+            self.assertGreater(obj.last_updated, now() - dt.timedelta(hours=1))
+            self.assertEqual(EveEntity.objects.get(id=1002).name, "charlie")
+
+        self._run_with_and_without_upsert_support(test_func)
+
+    def test_should_match_objs_by_multiple_unique_fields(self):
+        def test_func():
+            # given
+            EveUniverseEtag.objects.all().delete()
+            EveUniverseEtag.objects.create(model_name="A", object_id=1, etag="x")
+            EveUniverseEtag.objects.create(model_name="B", object_id=1, etag="y")
+            # when
+            bulk_upsert(
+                EveUniverseEtag.objects,
+                [
+                    EveUniverseEtag(model_name="A", object_id=1, etag="z"),
+                    EveUniverseEtag(model_name="A", object_id=2, etag="w"),
+                ],
+                unique_fields=["model_name", "object_id"],
+                update_fields=["etag"],
+            )
+            # then
+            self.assertSetEqual(
+                set(
+                    EveUniverseEtag.objects.values_list(
+                        "model_name", "object_id", "etag"
+                    )
+                ),
+                {("A", 1, "z"), ("A", 2, "w"), ("B", 1, "y")},
+            )
+
+        self._run_with_and_without_upsert_support(test_func)
+
+    def test_should_keep_existing_objs_without_update_fields(self):
+        def test_func():
+            # given
+            EveEntity.objects.all().delete()
+            create_eve_entity(id=1001, name="alpha")
+            # when
+            bulk_upsert(
+                EveEntity.objects,
+                [EveEntity(id=1001, name="bravo"), EveEntity(id=1002, name="charlie")],
+                unique_fields=["id"],
+                update_fields=[],
+            )
+            # then
+            self.assertEqual(EveEntity.objects.get(id=1001).name, "alpha")
+            self.assertEqual(EveEntity.objects.get(id=1002).name, "charlie")
+
+        self._run_with_and_without_upsert_support(test_func)
+
+
+class TestInMemoryCache(NoSocketsTestCase):
+    def test_should_build_object_once(self):
+        # given
+        cache = InMemoryCache()
+        builder = Mock(return_value="alpha")
+        # when
+        cache.get_or_build("a", builder)
+        result = cache.get_or_build("a", builder)
+        # then
+        self.assertEqual(result, "alpha")
+        self.assertEqual(builder.call_count, 1)
+
+    def test_should_rebuild_object_after_timeout(self):
+        # given
+        cache = InMemoryCache(timeout=60)
+        builder = Mock(side_effect=["alpha", "bravo"])
+        cache.get_or_build("a", builder)
+        # when
+        with patch(
+            "eveuniverse.helpers.time.monotonic", return_value=time.monotonic() + 61
+        ):
+            result = cache.get_or_build("a", builder)
+        # then
+        self.assertEqual(result, "bravo")
+
+    def test_should_rebuild_object_after_clear(self):
+        # given
+        cache = InMemoryCache()
+        builder_a = Mock(side_effect=["alpha", "bravo"])
+        builder_b = Mock(return_value="charlie")
+        cache.get_or_build("a", builder_a)
+        cache.get_or_build("b", builder_b)
+        # when
+        cache.clear("a")
+        # then
+        self.assertEqual(cache.get_or_build("a", builder_a), "bravo")
+        self.assertEqual(cache.get_or_build("b", builder_b), "charlie")
+        self.assertEqual(builder_b.call_count, 1)
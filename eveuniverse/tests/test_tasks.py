@@ -1,7 +1,10 @@
+import datetime as dt
 from unittest.mock import patch
 
+from django.db.utils import OperationalError
 from django.test import TestCase
 from django.test.utils import override_settings
+from django.utils.timezone import now
 
 from eveuniverse.constants import EveCategoryId, EveGroupId
 from eveuniverse.models import (
@@ -10,9 +13,11 @@ from eveuniverse.models import (
     EveDogmaAttribute,
     EveEntity,
     EveGroup,
+    EveMarketPriceHistory,
     EveRegion,
     EveSolarSystem,
     EveType,
+    EveTypeDogmaAttribute,
 )
 from eveuniverse.tasks import (
     create_eve_entities,
@@ -20,11 +25,15 @@ from eveuniverse.tasks import (
     load_eve_object,
     load_eve_types,
     load_map,
+    load_region,
     load_ship_types,
     load_structure_types,
+    stale_update_models,
     update_market_prices,
     update_or_create_eve_object,
     update_or_create_inline_object,
+    update_or_create_inline_objects,
+    update_stale_eve_objects,
     update_unresolved_eve_entities,
 )
 from eveuniverse.utils import NoSocketsTestCase
@@ -60,6 +69,15 @@ class TestTasks(NoSocketsTestCase):
         obj.refresh_from_db()
         self.assertNotEqual(obj.name, "Dummy")
 
+    @patch(MANAGERS_PATH + ".entities.esi")
+    def test_update_or_create_eve_object_for_eve_entity(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        update_or_create_eve_object("EveEntity", 1001)
+        # then
+        self.assertEqual(EveEntity.objects.get(id=1001).name, "Bruce Wayne")
+
     @patch(MANAGERS_PATH + ".universe.esi")
     def test_update_or_create_inline_object(self, mock_esi):
         mock_esi.client = EsiClientStub()
@@ -83,6 +101,54 @@ class TestTasks(NoSocketsTestCase):
         ).first()
         self.assertEqual(dogma_attribute_1.value, 5)
 
+    @patch(MANAGERS_PATH + ".universe.esi")
+    def test_update_or_create_inline_objects(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        eve_type_1, _ = EveType.objects.update_or_create_esi(id=603)
+        eve_type_2, _ = EveType.objects.update_or_create_esi(id=608)
+        # when
+        update_or_create_inline_objects(
+            parent_model_name="EveType",
+            parent_objs=[
+                [
+                    eve_type_1.id,
+                    {"dogma_attributes": [{"attribute_id": 588, "value": 5}]},
+                ],
+                [
+                    eve_type_2.id,
+                    {
+                        "dogma_attributes": [{"attribute_id": 129, "value": 12}],
+                        "dogma_effects": [{"effect_id": 1816, "is_default": True}],
+                    },
+                ],
+            ],
+            enabled_sections=[EveType.Section.DOGMAS],
+        )
+        # then
+        self.assertEqual(
+            dict(
+                eve_type_1.dogma_attributes.values_list(
+                    "eve_dogma_attribute_id", "value"
+                )
+            ),
+            {588: 5},
+        )
+        self.assertEqual(
+            dict(
+                eve_type_2.dogma_attributes.values_list(
+                    "eve_dogma_attribute_id", "value"
+                )
+            ),
+            {129: 12},
+        )
+        self.assertEqual(
+            list(
+                eve_type_2.dogma_effects.values_list("eve_dogma_effect_id", flat=True)
+            ),
+            [1816],
+        )
+
     @patch(MANAGERS_PATH + ".entities.esi")
     def test_create_eve_entities(self, mock_esi):
         # given
@@ -105,6 +171,36 @@ class TestTasks(NoSocketsTestCase):
         update_market_prices()
         self.assertTrue(mock_update_from_esi.called)
 
+    @patch(TASKS_PATH + ".EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED", True)
+    @patch(TASKS_PATH + ".EveMarketPrice.objects.update_from_esi")
+    def test_should_store_price_history_when_enabled(self, mock_update_from_esi):
+        # given
+        mock_update_from_esi.return_value = 1
+        # when
+        update_market_prices()
+        # then
+        self.assertEqual(EveMarketPriceHistory.objects.count(), 1)
+
+    @patch(TASKS_PATH + ".EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED", True)
+    @patch(TASKS_PATH + ".EveMarketPrice.objects.update_from_esi")
+    def test_should_not_store_price_history_when_unchanged(self, mock_update_from_esi):
+        # given
+        mock_update_from_esi.return_value = 0
+        # when
+        update_market_prices()
+        # then
+        self.assertFalse(EveMarketPriceHistory.objects.exists())
+
+    @patch(TASKS_PATH + ".EVEUNIVERSE_MARKET_PRICE_HISTORY_ENABLED", False)
+    @patch(TASKS_PATH + ".EveMarketPrice.objects.update_from_esi")
+    def test_should_not_store_price_history_when_disabled(self, mock_update_from_esi):
+        # given
+        mock_update_from_esi.return_value = 1
+        # when
+        update_market_prices()
+        # then
+        self.assertFalse(EveMarketPriceHistory.objects.exists())
+
 
 @override_settings(CELERY_ALWAYS_EAGER=True, CELERY_EAGER_PROPAGATES_EXCEPTIONS=True)
 @patch(MANAGERS_PATH + ".entities.esi")
@@ -144,6 +240,121 @@ class TestLoadData(TestCase):
         for id in [30001161, 30045339, 31000005]:
             self.assertTrue(EveSolarSystem.objects.filter(id=id).exists())
 
+    def test_should_load_region(self, mock_esi_1, mock_esi_2):
+        # given
+        mock_esi_1.client = EsiClientStub()
+        mock_esi_2.client = EsiClientStub()
+        # when
+        load_region(10000069)
+        # then
+        self.assertTrue(EveRegion.objects.filter(id=10000069).exists())
+        self.assertTrue(EveConstellation.objects.filter(id=20000785).exists())
+        self.assertTrue(EveSolarSystem.objects.filter(id=30045339).exists())
+        self.assertFalse(EveRegion.objects.filter(id=10000002).exists())
+
+    @patch(TASKS_PATH + ".EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS", 3)
+    @patch(TASKS_PATH + "._load_map_lane")
+    def test_should_load_regions_in_parallel_lanes(
+        self, mock_load_map_lane, mock_esi_1, mock_esi_2
+    ):
+        # given
+        mock_esi_1.client = EsiClientStub()
+        mock_esi_2.client = EsiClientStub()
+        # when
+        load_map()
+        # then
+        self.assertEqual(mock_load_map_lane.apply_async.call_count, 3)
+        lanes = [
+            kwargs["args"][0]
+            for _, kwargs in mock_load_map_lane.apply_async.call_args_list
+        ]
+        self.assertListEqual(
+            lanes,
+            [[10000002, 10000070], [10000014, 11000031], [10000069, 12000001]],
+        )
+
+    @patch(TASKS_PATH + ".EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS", 1)
+    def test_should_continue_lane_when_a_region_fails(self, mock_esi_1, mock_esi_2):
+        # given
+        mock_esi_1.client = EsiClientStub()
+        mock_esi_2.client = EsiClientStub()
+        update_or_create_tree_esi = EveRegion.objects.update_or_create_tree_esi
+
+        def my_update_or_create_tree_esi(*, ids, **kwargs):
+            if ids == [10000002]:
+                raise RuntimeError("Test exception")
+            return update_or_create_tree_esi(ids=ids, **kwargs)
+
+        # when
+        with patch.object(
+            EveRegion.objects,
+            "update_or_create_tree_esi",
+            side_effect=my_update_or_create_tree_esi,
+        ):
+            load_map()
+        # then
+        self.assertFalse(EveRegion.objects.filter(id=10000002).exists())
+        for id in [10000014, 10000069, 11000031]:
+            self.assertTrue(EveRegion.objects.filter(id=id).exists())
+
+    @override_settings(CELERY_EAGER_PROPAGATES_EXCEPTIONS=False)
+    @patch(TASKS_PATH + ".EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS", 1)
+    def test_should_retry_region_after_database_error(self, mock_esi_1, mock_esi_2):
+        # given
+        mock_esi_1.client = EsiClientStub()
+        mock_esi_2.client = EsiClientStub()
+        update_or_create_tree_esi = EveRegion.objects.update_or_create_tree_esi
+        failed_ids = []
+
+        def my_update_or_create_tree_esi(*, ids, **kwargs):
+            if ids == [10000002] and not failed_ids:
+                failed_ids.append(ids[0])
+                raise OperationalError("Test exception")
+            return update_or_create_tree_esi(ids=ids, **kwargs)
+
+        # when
+        with patch.object(
+            EveRegion.objects,
+            "update_or_create_tree_esi",
+            side_effect=my_update_or_create_tree_esi,
+        ):
+            load_map()
+        # then
+        self.assertListEqual(failed_ids, [10000002])
+        for id in [10000002, 10000014, 10000069, 11000031]:
+            self.assertTrue(EveRegion.objects.filter(id=id).exists())
+
+    @override_settings(CELERY_EAGER_PROPAGATES_EXCEPTIONS=False)
+    @patch(TASKS_PATH + ".EVEUNIVERSE_LOAD_MAP_CONCURRENT_REGIONS", 1)
+    def test_should_continue_lane_when_database_errors_persist(
+        self, mock_esi_1, mock_esi_2
+    ):
+        # given
+        mock_esi_1.client = EsiClientStub()
+        mock_esi_2.client = EsiClientStub()
+        update_or_create_tree_esi = EveRegion.objects.update_or_create_tree_esi
+
+        def my_update_or_create_tree_esi(*, ids, **kwargs):
+            if ids == [10000002]:
+                raise OperationalError("Test exception")
+            return update_or_create_tree_esi(ids=ids, **kwargs)
+
+        # when
+        with patch.object(
+            EveRegion.objects,
+            "update_or_create_tree_esi",
+            side_effect=my_update_or_create_tree_esi,
+        ) as spy:
+            load_map()
+        # then
+        self.assertEqual(
+            sum(1 for _, kwargs in spy.call_args_list if kwargs["ids"] == [10000002]),
+            4,
+        )
+        self.assertFalse(EveRegion.objects.filter(id=10000002).exists())
+        for id in [10000014, 10000069, 11000031]:
+            self.assertTrue(EveRegion.objects.filter(id=id).exists())
+
     def test_load_ship_types(self, mock_esi_1, mock_esi_2):
         mock_esi_1.client = EsiClientStub()
         mock_esi_2.client = EsiClientStub()
@@ -226,3 +437,74 @@ class TestLoadEveTypes(TestCase):
         self.assertTrue(EveCategory.objects.filter(id=EveCategoryId.STRUCTURE).exists())
         self.assertTrue(EveGroup.objects.filter(id=EveGroupId.PLANET).exists())
         self.assertTrue(EveType.objects.filter(id=603).exists())
+
+
+@patch(MANAGERS_PATH + ".universe.esi")
+class TestUpdateStaleEveObjects(NoSocketsTestCase):
+    def setUp(self) -> None:
+        with patch(MANAGERS_PATH + ".universe.esi") as mock_esi:
+            mock_esi.client = EsiClientStub()
+            for id in [2, 3, 4]:
+                EveCategory.objects.update_or_create_esi(id=id)
+            EveGroup.objects.update_or_create_esi(id=10)
+        stale_time = now() - dt.timedelta(days=40)
+        EveCategory.objects.update(last_updated=stale_time)
+        EveGroup.objects.update(last_updated=stale_time)
+
+    def test_should_return_models_which_can_be_updated(self, mock_esi):
+        # when
+        result = stale_update_models()
+        # then
+        self.assertIn(EveCategory, result)
+        self.assertIn(EveEntity, result)
+        self.assertNotIn(EveTypeDogmaAttribute, result)
+
+    def test_should_update_stale_objects_of_all_models(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = update_stale_eve_objects()
+        # then
+        self.assertDictEqual(result, {"EveCategory": 3, "EveGroup": 1})
+        self.assertFalse(EveCategory.objects.stale().exists())
+        self.assertFalse(EveGroup.objects.stale().exists())
+
+    def test_should_update_stale_objects_of_given_models_only(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = update_stale_eve_objects(model_names=["EveGroup"])
+        # then
+        self.assertDictEqual(result, {"EveGroup": 1})
+        self.assertEqual(EveCategory.objects.stale().count(), 3)
+
+    def test_should_not_update_more_then_max_objects(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = update_stale_eve_objects(max_objects=2)
+        # then
+        self.assertEqual(sum(result.values()), 2)
+        self.assertEqual(
+            EveCategory.objects.stale().count() + EveGroup.objects.stale().count(), 2
+        )
+
+    def test_should_share_max_objects_between_models(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = update_stale_eve_objects(max_objects=2)
+        # then
+        self.assertDictEqual(result, {"EveCategory": 1, "EveGroup": 1})
+        self.assertEqual(EveCategory.objects.stale().count(), 2)
+        self.assertFalse(EveGroup.objects.stale().exists())
+
+    def test_should_give_unused_budget_to_other_models(self, mock_esi):
+        # given
+        mock_esi.client = EsiClientStub()
+        # when
+        result = update_stale_eve_objects(max_objects=3)
+        # then
+        self.assertDictEqual(result, {"EveCategory": 2, "EveGroup": 1})
+        self.assertEqual(EveCategory.objects.stale().count(), 1)
+        self.assertFalse(EveGroup.objects.stale().exists())
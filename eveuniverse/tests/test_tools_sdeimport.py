@@ -0,0 +1,164 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from eveuniverse.core.sdefiles import SdeSource, SdeTableNotFound
+from eveuniverse.models import (
+    EveAsteroidBelt,
+    EveCategory,
+    EveConstellation,
+    EveGroup,
+    EveMoon,
+    EvePlanet,
+    EveRegion,
+    EveSolarSystem,
+    EveStar,
+    EveStargate,
+    EveType,
+)
+from eveuniverse.tools.sdeimport import (
+    SDE_MAP_MODELS,
+    SDE_TYPE_MODELS,
+    import_order,
+    import_sde,
+)
+from eveuniverse.utils import NoSocketsTestCase
+
+from .testdata.factories_2 import EveSolarSystemFactory
+from .testdata.sde import create_sde_dump
+
+
+class TestImportSde(NoSocketsTestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_should_import_types_and_map(self):
+        # given
+        create_sde_dump(self.path)
+        source = SdeSource(self.path)
+        # when
+        result = import_sde(source, SDE_TYPE_MODELS + SDE_MAP_MODELS)
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                "EveCategory": 1,
+                "EveGroup": 2,
+                "EveType": 2,
+                "EveRegion": 1,
+                "EveConstellation": 1,
+                "EveSolarSystem": 2,
+                "EvePlanet": 1,
+                "EveAsteroidBelt": 1,
+                "EveMoon": 1,
+                "EveStargate": 2,
+            },
+        )
+        eve_type = EveType.objects.get(id=29624)
+        self.assertEqual(eve_type.name, "Stargate (Caldari System)")
+        self.assertEqual(eve_type.eve_group_id, 10)
+        self.assertEqual(eve_type.volume, 1e8)
+        self.assertFalse(eve_type.published)
+        self.assertEqual(EveType.objects.get(id=11).icon_id, 10136)
+        self.assertEqual(EveRegion.objects.get(id=10000002).name, "The Forge")
+        self.assertEqual(
+            EveConstellation.objects.get(id=20000020).eve_region_id, 10000002
+        )
+        jita = EveSolarSystem.objects.get(id=30000142)
+        self.assertEqual(jita.name, "Jita")
+        self.assertAlmostEqual(jita.security_status, 0.945913116664839)
+        self.assertEqual(jita.position_x, -1.29e17)
+        self.assertTrue(jita.enabled_sections.planets)
+        self.assertTrue(jita.enabled_sections.stargates)
+        self.assertFalse(jita.enabled_sections.stars)
+        planet = EvePlanet.objects.get(id=40009077)
+        self.assertEqual(planet.eve_solar_system, jita)
+        self.assertEqual(planet.eve_type_id, 11)
+        self.assertTrue(planet.enabled_sections.moons)
+        self.assertTrue(planet.enabled_sections.asteroid_belts)
+        self.assertEqual(EveMoon.objects.get(id=40009078).eve_planet, planet)
+        self.assertEqual(EveAsteroidBelt.objects.get(id=40009079).eve_planet, planet)
+        stargate = EveStargate.objects.get(id=50001248)
+        self.assertEqual(stargate.eve_solar_system, jita)
+        self.assertEqual(stargate.destination_eve_stargate_id, 50001249)
+        self.assertEqual(stargate.destination_eve_solar_system_id, 30000144)
+        self.assertFalse(EveStar.objects.exists())
+
+    def test_should_update_existing_objects_and_keep_their_sections(self):
+        # given
+        create_sde_dump(self.path)
+        source = SdeSource(self.path)
+        import_sde(source, SDE_TYPE_MODELS)
+        solar_system = EveSolarSystemFactory(id=30000142, name="Dummy")
+        solar_system.enabled_sections.stars = True
+        solar_system.save()
+        # when
+        import_sde(source, SDE_MAP_MODELS)
+        # then
+        solar_system.refresh_from_db()
+        self.assertEqual(solar_system.name, "Jita")
+        self.assertEqual(solar_system.eve_constellation_id, 20000020)
+        self.assertTrue(solar_system.enabled_sections.stars)
+        self.assertTrue(solar_system.enabled_sections.planets)
+
+    def test_should_clear_stargate_graph_after_import(self):
+        # given
+        create_sde_dump(self.path)
+        source = SdeSource(self.path)
+        graph = EveSolarSystem.objects.stargate_graph()
+        # when
+        import_sde(source, SDE_TYPE_MODELS + SDE_MAP_MODELS)
+        # then
+        self.assertIsNot(EveSolarSystem.objects.stargate_graph(), graph)
+
+    def test_should_import_types_only(self):
+        # given
+        create_sde_dump(self.path, exclude_tables={"mapDenormalize"})
+        source = SdeSource(self.path)
+        # when
+        result = import_sde(source, SDE_TYPE_MODELS)
+        # then
+        self.assertSetEqual(set(result.keys()), {"EveCategory", "EveGroup", "EveType"})
+        self.assertTrue(EveCategory.objects.filter(id=2).exists())
+        self.assertEqual(EveGroup.objects.count(), 2)
+        self.assertFalse(EveRegion.objects.exists())
+
+    def test_should_raise_error_when_table_is_missing(self):
+        # given
+        create_sde_dump(self.path, exclude_tables={"invGroups"})
+        source = SdeSource(self.path)
+        # when/then
+        with self.assertRaises(SdeTableNotFound):
+            import_sde(source, SDE_TYPE_MODELS)
+
+    def test_should_raise_error_for_models_not_in_sde(self):
+        # given
+        source = SdeSource(self.path)
+        # when/then
+        with self.assertRaises(ValueError):
+            import_sde(source, [EveStar])
+
+
+class TestImportOrder(NoSocketsTestCase):
+    def test_should_order_by_load_order_and_dependencies(self):
+        # when
+        result = import_order(SDE_MAP_MODELS + SDE_TYPE_MODELS)
+        # then
+        self.assertListEqual(
+            result,
+            [
+                EveCategory,
+                EveGroup,
+                EveType,
+                EveRegion,
+                EveConstellation,
+                EveSolarSystem,
+                EvePlanet,
+                EveAsteroidBelt,
+                EveMoon,
+                EveStargate,
+            ],
+        )
@@ -13,6 +13,7 @@ from eveuniverse.models import (
     EvePlanet,
     EveRegion,
     EveSolarSystem,
+    EveStargate,
     EveType,
 )
 
@@ -138,3 +139,20 @@ class EveMoonFactory(
     position_x = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
     position_y = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
     position_z = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
+
+
+class EveStargateFactory(
+    factory.django.DjangoModelFactory, metaclass=BaseMetaFactory[EveStargate]
+):
+    class Meta:
+        model = EveStargate
+        django_get_or_create = ("id",)
+
+    id = factory.Sequence(lambda n: 59_000_000 + n)
+    name = factory.Faker("street_name")
+    eve_solar_system = factory.SubFactory(EveSolarSystemFactory)
+    destination_eve_solar_system = factory.SubFactory(EveSolarSystemFactory)
+    eve_type = factory.SubFactory(EveTypeFactory)
+    position_x = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
+    position_y = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
+    position_z = factory.fuzzy.FuzzyFloat(-1_000_000_000, 1_000_000_000)
@@ -1,3 +1,4 @@
+import csv
 import json
 from pathlib import Path
 
@@ -24,3 +25,174 @@ def cache_content(table):
             data_all[type_id] = []
         data_all[type_id].append(row)
     return data_all
+
+
+_sde_dump_tables = {
+    "invCategories": [
+        {"categoryID": 2, "categoryName": "Celestial", "published": 1},
+    ],
+    "invGroups": [
+        {"groupID": 7, "categoryID": 2, "groupName": "Planet", "published": 0},
+        {"groupID": 10, "categoryID": 2, "groupName": "Stargate", "published": 0},
+    ],
+    "invTypes": [
+        {
+            "typeID": 11,
+            "groupID": 7,
+            "typeName": "Planet (Temperate)",
+            "description": None,
+            "mass": 1e35,
+            "volume": 1,
+            "capacity": 0,
+            "portionSize": 1,
+            "raceID": None,
+            "basePrice": None,
+            "published": 0,
+            "marketGroupID": None,
+            "iconID": 10136,
+            "soundID": None,
+            "graphicID": 10,
+        },
+        {
+            "typeID": 29624,
+            "groupID": 10,
+            "typeName": "Stargate (Caldari System)",
+            "description": "Caldari stargate",
+            "mass": 1e35,
+            "volume": 1e8,
+            "capacity": 0,
+            "portionSize": 1,
+            "raceID": 1,
+            "basePrice": None,
+            "published": 0,
+            "marketGroupID": None,
+            "iconID": None,
+            "soundID": None,
+            "graphicID": 1174,
+        },
+    ],
+    "mapRegions": [
+        {"regionID": 10000002, "regionName": "The Forge", "x": 1, "y": 2, "z": 3},
+    ],
+    "mapConstellations": [
+        {
+            "regionID": 10000002,
+            "constellationID": 20000020,
+            "constellationName": "Kimotoro",
+            "x": 4,
+            "y": 5,
+            "z": 6,
+        },
+    ],
+    "mapSolarSystems": [
+        {
+            "regionID": 10000002,
+            "constellationID": 20000020,
+            "solarSystemID": 30000142,
+            "solarSystemName": "Jita",
+            "x": -1.29e17,
+            "y": 6.07e16,
+            "z": 1.17e17,
+            "security": 0.945913116664839,
+        },
+        {
+            "regionID": 10000002,
+            "constellationID": 20000020,
+            "solarSystemID": 30000144,
+            "solarSystemName": "Perimeter",
+            "x": -1.29e17,
+            "y": 6.08e16,
+            "z": 1.13e17,
+            "security": 0.953,
+        },
+    ],
+    "mapDenormalize": [
+        {
+            "itemID": 40009076,
+            "typeID": 6,
+            "groupID": 6,
+            "solarSystemID": 30000142,
+            "orbitID": None,
+            "x": 0,
+            "y": 0,
+            "z": 0,
+            "itemName": "Jita - Star",
+        },
+        {
+            "itemID": 40009077,
+            "typeID": 11,
+            "groupID": 7,
+            "solarSystemID": 30000142,
+            "orbitID": 40009076,
+            "x": 161891117336,
+            "y": 21288951986,
+            "z": -73529902200,
+            "itemName": "Jita I",
+        },
+        {
+            "itemID": 40009078,
+            "typeID": 14,
+            "groupID": 8,
+            "solarSystemID": 30000142,
+            "orbitID": 40009077,
+            "x": 161891117337,
+            "y": 21288951987,
+            "z": -73529902201,
+            "itemName": "Jita I - Moon 1",
+        },
+        {
+            "itemID": 40009079,
+            "typeID": 15,
+            "groupID": 9,
+            "solarSystemID": 30000142,
+            "orbitID": 40009077,
+            "x": 161891117338,
+            "y": 21288951988,
+            "z": -73529902202,
+            "itemName": "Jita I - Asteroid Belt 1",
+        },
+        {
+            "itemID": 50001248,
+            "typeID": 29624,
+            "groupID": 10,
+            "solarSystemID": 30000142,
+            "orbitID": 40009076,
+            "x": -1.2e12,
+            "y": 1.1e11,
+            "z": 3.6e11,
+            "itemName": "Stargate (Perimeter)",
+        },
+        {
+            "itemID": 50001249,
+            "typeID": 29624,
+            "groupID": 10,
+            "solarSystemID": 30000144,
+            "orbitID": None,
+            "x": 1.3e12,
+            "y": -1.5e11,
+            "z": -3.2e11,
+            "itemName": "Stargate (Jita)",
+        },
+    ],
+    "mapJumps": [
+        {"stargateID": 50001248, "destinationID": 50001249},
+        {"stargateID": 50001249, "destinationID": 50001248},
+    ],
+}
+
+
+def create_sde_dump(path: Path, exclude_tables=None):
+    """Create a small SDE dump with CSV files in the format of Fuzzwork."""
+    for table, rows in _sde_dump_tables.items():
+        if exclude_tables and table in exclude_tables:
+            continue
+        with (path / f"{table}.csv").open("w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=rows[0].keys())
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(
+                    {
+                        key: "None" if value is None else value
+                        for key, value in row.items()
+                    }
+                )
@@ -0,0 +1,348 @@
+"""Import the static universe from a local dump of the SDE into Eve Universe models.
+
+This is an alternative to loading the map and types from ESI object by object.
+"""
+
+import logging
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Type,
+)
+
+from eveuniverse import __title__
+from eveuniverse.app_settings import EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+from eveuniverse.core.sdefiles import SdeSource
+from eveuniverse.models import (
+    EveAsteroidBelt,
+    EveCategory,
+    EveConstellation,
+    EveGroup,
+    EveMoon,
+    EvePlanet,
+    EveRegion,
+    EveSolarSystem,
+    EveStargate,
+    EveType,
+)
+from eveuniverse.models.base import EveUniverseEntityModel
+from eveuniverse.utils import LoggerAddTag
+
+logger = LoggerAddTag(logging.getLogger(__name__), __title__)
+
+_GROUP_ID_PLANET = 7
+_GROUP_ID_MOON = 8
+_GROUP_ID_ASTEROID_BELT = 9
+_GROUP_ID_STARGATE = 10
+
+
+def _int(value) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _bool(value) -> bool:
+    if isinstance(value, str):
+        return value.lower() in {"1", "true"}
+    return bool(value)
+
+
+def _position(row: dict) -> dict:
+    return {
+        "position_x": _float(row["x"]),
+        "position_y": _float(row["y"]),
+        "position_z": _float(row["z"]),
+    }
+
+
+def _category(row: dict) -> dict:
+    return {
+        "id": int(row["categoryID"]),
+        "name": row["categoryName"] or "",
+        "published": _bool(row["published"]),
+    }
+
+
+def _group(row: dict) -> dict:
+    return {
+        "id": int(row["groupID"]),
+        "name": row["groupName"] or "",
+        "eve_category_id": int(row["categoryID"]),
+        "published": _bool(row["published"]),
+    }
+
+
+def _type(row: dict) -> dict:
+    return {
+        "id": int(row["typeID"]),
+        "name": row["typeName"] or "",
+        "eve_group_id": int(row["groupID"]),
+        "capacity": _float(row["capacity"]),
+        "description": row["description"] or "",
+        "icon_id": _int(row["iconID"]),
+        "mass": _float(row["mass"]),
+        "portion_size": _int(row["portionSize"]),
+        "published": _bool(row["published"]),
+        "volume": _float(row["volume"]),
+    }
+
+
+def _region(row: dict) -> dict:
+    return {"id": int(row["regionID"]), "name": row["regionName"] or ""}
+
+
+def _constellation(row: dict) -> dict:
+    return {
+        "id": int(row["constellationID"]),
+        "name": row["constellationName"] or "",
+        "eve_region_id": int(row["regionID"]),
+        **_position(row),
+    }
+
+
+def _solar_system(row: dict) -> dict:
+    return {
+        "id": int(row["solarSystemID"]),
+        "name": row["solarSystemName"] or "",
+        "eve_constellation_id": int(row["constellationID"]),
+        "security_status": float(row["security"]),
+        **_position(row),
+    }
+
+
+def _celestial(group_id: int, parent_field: str, parent_column: str) -> Callable:
+    """Return converter for rows of a group from the mapDenormalize table."""
+
+    def _convert(row: dict) -> Optional[dict]:
+        if _int(row["groupID"]) != group_id:
+            return None
+        values = {
+            "id": int(row["itemID"]),
+            "name": row["itemName"] or "",
+            parent_field: int(row[parent_column]),
+            **_position(row),
+        }
+        if parent_field == "eve_solar_system_id":
+            values["eve_type_id"] = int(row["typeID"])
+        return values
+
+    return _convert
+
+
+class _SdeTable(NamedTuple):
+    name: str
+    convert: Callable[[dict], Optional[dict]]
+
+
+_TABLES = {
+    EveCategory: _SdeTable("invCategories", _category),
+    EveGroup: _SdeTable("invGroups", _group),
+    EveType: _SdeTable("invTypes", _type),
+    EveRegion: _SdeTable("mapRegions", _region),
+    EveConstellation: _SdeTable("mapConstellations", _constellation),
+    EveSolarSystem: _SdeTable("mapSolarSystems", _solar_system),
+    EvePlanet: _SdeTable(
+        "mapDenormalize",
+        _celestial(_GROUP_ID_PLANET, "eve_solar_system_id", "solarSystemID"),
+    ),
+    EveMoon: _SdeTable(
+        "mapDenormalize",
+        _celestial(_GROUP_ID_MOON, "eve_planet_id", "orbitID"),
+    ),
+    EveAsteroidBelt: _SdeTable(
+        "mapDenormalize",
+        _celestial(_GROUP_ID_ASTEROID_BELT, "eve_planet_id", "orbitID"),
+    ),
+    EveStargate: _SdeTable(
+        "mapDenormalize",
+        _celestial(_GROUP_ID_STARGATE, "eve_solar_system_id", "solarSystemID"),
+    ),
+}
+
+_STARGATE_JUMPS_TABLE = "mapJumps"
+
+SDE_TYPE_MODELS = (EveCategory, EveGroup, EveType)
+"""Models for types which can be imported from the SDE."""
+
+SDE_MAP_MODELS = (
+    EveRegion,
+    EveConstellation,
+    EveSolarSystem,
+    EvePlanet,
+    EveMoon,
+    EveAsteroidBelt,
+    EveStargate,
+)
+"""Models for the map which can be imported from the SDE."""
+
+_CHILD_SECTIONS = {
+    EveSolarSystem: {
+        EvePlanet: EveSolarSystem.Section.PLANETS,
+        EveStargate: EveSolarSystem.Section.STARGATES,
+    },
+    EvePlanet: {
+        EveMoon: EvePlanet.Section.MOONS,
+        EveAsteroidBelt: EvePlanet.Section.ASTEROID_BELTS,
+    },
+}
+
+
+def import_order(models: Iterable[Type[EveUniverseEntityModel]]) -> list:
+    """Return models in the order they need to be imported.
+
+    Models are ordered by their load order, but a model always comes after
+    the other given models it has a foreign key to.
+    """
+    remaining = sorted(
+        set(models), key=lambda obj: obj._eve_universe_meta_attr_strict("load_order")
+    )
+    result = []
+    while remaining:
+        for model in remaining:
+            dependencies = {
+                field.related_model
+                for field in model._meta.fields
+                if field.is_relation and field.related_model is not model
+            }
+            if not dependencies.intersection(remaining):
+                result.append(model)
+                remaining.remove(model)
+                break
+        else:
+            raise ValueError(f"Circular dependencies between models: {remaining}")
+    return result
+
+
+def import_sde(
+    source: SdeSource, models: Iterable[Type[EveUniverseEntityModel]]
+) -> Dict[str, int]:
+    """Import objects for the given models from a local SDE dump.
+
+    Tables are streamed and objects are written in batches with upserts.
+    Existing objects are updated and keep their other enabled sections.
+    Related objects not included in the SDE tables (e.g. stars) are not imported.
+
+    Models which refer to other models (e.g. planets to types)
+    can only be imported when the related objects exist
+    or are imported at the same time.
+
+    Args:
+        source: local SDE dump
+        models: models to import, must be from SDE_TYPE_MODELS or SDE_MAP_MODELS
+
+    Raises:
+        SdeTableNotFound: if a required table does not exist in the dump
+        ValueError: if a model can not be imported from the SDE
+
+    Returns:
+        Number of imported objects for each model name
+    """
+    models = list(models)
+    for model in models:
+        if model not in _TABLES:
+            raise ValueError(f"Can not import {model.__name__} from SDE")
+
+    counts = {}
+    for model in import_order(models):
+        table = _TABLES[model]
+        updated_sections = {
+            section
+            for child_model, section in _CHILD_SECTIONS.get(model, {}).items()
+            if child_model in models
+        }
+        logger.info("Importing %s from table %s", model.__name__, table.name)
+        count = 0
+        for rows in _batched(
+            _converted_rows(source, table), EVEUNIVERSE_BULK_METHODS_BATCH_SIZE
+        ):
+            _write_objs(model, rows, updated_sections)
+            count += len(rows)
+        counts[model.__name__] = count
+        logger.info("Imported %d %s objects", count, model.__name__)
+
+    if EveStargate in models:
+        _link_stargates(source)
+
+    for model in models:
+        model.objects._objs_written()  # type: ignore
+
+    return counts
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield successive lists of given size from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _converted_rows(source: SdeSource, table: _SdeTable) -> Iterable[dict]:
+    for row in source.iter_rows(table.name):
+        values = table.convert(row)
+        if values:
+            yield values
+
+
+def _write_objs(
+    model: Type[EveUniverseEntityModel], rows: List[dict], updated_sections: Set[str]
+) -> None:
+    """Write objects for one batch of rows."""
+    has_sections = any(field.name == "enabled_sections" for field in model._meta.fields)
+    ids = [row["id"] for row in rows]
+    if has_sections:
+        existing_sections = dict(
+            model.objects.filter(id__in=ids).values_list("id", "enabled_sections")
+        )
+    else:
+        existing_sections = {}
+
+    objs = []
+    for row in rows:
+        obj = model(**row)
+        if has_sections:
+            obj.enabled_sections = int(existing_sections.get(obj.id, 0))
+            for section in updated_sections:
+                setattr(obj.enabled_sections, section, True)
+        objs.append(obj)
+
+    field_names = sorted(set(rows[0].keys()) - {"id"})
+    if has_sections:
+        field_names.append("enabled_sections")
+    model.objects._bulk_upsert(objs, field_names)  # type: ignore
+
+
+def _link_stargates(source: SdeSource) -> None:
+    """Set destinations of all stargates from the stargate jumps table."""
+    jumps = (
+        (int(row["stargateID"]), int(row["destinationID"]))
+        for row in source.iter_rows(_STARGATE_JUMPS_TABLE)
+    )
+    for batch in _batched(jumps, EVEUNIVERSE_BULK_METHODS_BATCH_SIZE):
+        destination_ids = {destination_id for _, destination_id in batch}
+        destination_systems = dict(
+            EveStargate.objects.filter(id__in=destination_ids).values_list(
+                "id", "eve_solar_system_id"
+            )
+        )
+        objs = [
+            EveStargate(
+                id=stargate_id,
+                destination_eve_stargate_id=destination_id,
+                destination_eve_solar_system_id=destination_systems[destination_id],
+            )
+            for stargate_id, destination_id in batch
+            if destination_id in destination_systems
+        ]
+        EveStargate.objects.bulk_update(
+            objs, ["destination_eve_stargate", "destination_eve_solar_system"]
+        )